@@ -1,6 +1,8 @@
 # ai_services/chat_processor.py
 import logging
-from typing import Dict, List, Optional
+import re
+from typing import Awaitable, Callable, Dict, List, Optional
+from django.conf import settings
 from django.utils import timezone
 from channels.db import database_sync_to_async
 from chat.models import ChatSession, Message, UploadedFile
@@ -9,9 +11,12 @@ from .database_service import DatabaseService
 from .file_service import FileService
 from .enhanced_llm_service import EnhancedLLMService
 from .rag_service import RAGService
+from . import intent_router
 
 logger = logging.getLogger("ai_services")
 
+_NUMBER_RE = re.compile(r"(\d+)")
+
 
 class ChatProcessor:
     def __init__(self):
@@ -27,8 +32,14 @@ class ChatProcessor:
         message_content: str,
         message_type: str = "user",
         metadata: Optional[Dict] = None,
+        progress_callback: Optional[Callable[[str], Awaitable[None]]] = None,
     ) -> Dict:
-        """Process incoming chat message"""
+        """
+        Process incoming chat message
+
+        progress_callback, if given, is awaited with a status message as each
+        stage of attached-file processing starts.
+        """
         try:
             # Get or create chat session
             session = await self._get_or_create_session(session_id)
@@ -48,7 +59,7 @@ class ChatProcessor:
                     f"Processing message with {len(attached_files)} attached files"
                 )
                 response = await self._process_message_with_attachments(
-                    session, message_content, attached_files, context
+                    session, message_content, attached_files, context, progress_callback
                 )
             else:
                 # Determine message intent and process accordingly
@@ -92,15 +103,12 @@ class ChatProcessor:
 
     @database_sync_to_async
     def _create_message(self, session, message_type, content, metadata):
-        message = Message.objects.create(
+        return Message.objects.create(
             session=session,
             message_type=message_type,
             content=content,
             metadata=metadata or {},
         )
-        message.set_metadata(metadata or {})
-        message.save()
-        return message
 
     async def process_file_upload(
         self, session_id: str, uploaded_file, user_question: str = ""
@@ -204,6 +212,7 @@ class ChatProcessor:
             file_type=file_info["file_type"],
             file_path=file_info["file_path"],
             file_size=file_info["file_size"],
+            content_hash=file_info["content_hash"],
         )
 
     async def process_folder_path(self, session_id: str, folder_path: str) -> Dict:
@@ -232,12 +241,9 @@ Files found:"""
 
             # Get AI response
             # Streaming AI response
-            ai_chunks = []
-            async for chunk in self.llama_service.generate_streaming_response(
+            ai_response = await self.llama_service.generate_response(
                 f"Please analyze this folder structure and suggest how I can help with the data:\n{summary}"
-            ):
-                ai_chunks.append(chunk)
-            ai_response = "".join(ai_chunks)
+            )
             # Save messages
             await self._create_message(
                 session, "user", f"Folder path: {folder_path}", folder_info
@@ -263,7 +269,9 @@ Files found:"""
         """Process database connection request"""
         try:
             # Test connection
-            is_valid, message = self.database_service.test_connection(connection_config)
+            is_valid, message = await database_sync_to_async(
+                self.database_service.test_connection
+            )(connection_config)
 
             if not is_valid:
                 return {
@@ -272,10 +280,14 @@ Files found:"""
                 }
 
             # Create connection
-            connection_id = self.database_service.create_connection(connection_config)
+            connection_id = await database_sync_to_async(
+                self.database_service.create_connection
+            )(connection_config)
 
             # Get schema information
-            schema = self.database_service.get_table_schema(connection_id)
+            schema = await database_sync_to_async(
+                self.database_service.get_table_schema
+            )(connection_id)
 
             session = await self._get_or_create_session(session_id)
 
@@ -290,12 +302,9 @@ Files found:"""
             # Generate schema summary for AI
             schema_summary = self._format_schema_summary(schema)
             # Streaming AI response
-            ai_chunks = []
-            async for chunk in self.llama_service.generate_streaming_response(
+            ai_response = await self.llama_service.generate_response(
                 f"I've connected to a database with the following schema:\n{schema_summary}\n\nHow can I help you query this data?"
-            ):
-                ai_chunks.append(chunk)
-            ai_response = "".join(ai_chunks)
+            )
             await self._create_message(
                 session,
                 "ai",
@@ -327,7 +336,9 @@ Files found:"""
         self, session: ChatSession, limit: int = 10
     ) -> List[Dict]:
         """Get recent conversation context"""
-        messages = session.messages.order_by("-timestamp")[:limit]
+        messages = session.messages.only(
+            "message_type", "content", "timestamp", "metadata"
+        ).order_by("-timestamp")[:limit]
         context = []
 
         for message in reversed(messages):
@@ -336,7 +347,7 @@ Files found:"""
                     "type": message.message_type,
                     "content": message.content,
                     "timestamp": message.timestamp.isoformat(),
-                    "metadata": message.get_metadata(),
+                    "metadata": message.metadata,
                 }
             )
 
@@ -400,7 +411,7 @@ Files found:"""
         # Check if this is a direct SQL query or natural language
         if message.strip().upper().startswith("SELECT"):
             # Direct SQL query
-            result = self.database_service.execute_query(
+            result = await database_sync_to_async(self.database_service.execute_query)(
                 connection_id, message, session.session_id
             )
 
@@ -444,6 +455,7 @@ Files found:"""
         message: str,
         attached_files: List[Dict],
         context: List[Dict],
+        progress_callback: Optional[Callable[[str], Awaitable[None]]] = None,
     ) -> Dict:
         """
         Process message with attached files using enhanced LLM service
@@ -453,6 +465,7 @@ Files found:"""
             message: User message
             attached_files: List of attached file information
             context: Conversation context
+            progress_callback: Optional coroutine called with status messages
 
         Returns:
             Response with file analysis and LLM answer
@@ -462,7 +475,7 @@ Files found:"""
 
             # Use enhanced LLM service to process question with files
             result = await self.enhanced_llm_service.process_question_with_files(
-                message, attached_files
+                message, attached_files, progress_callback
             )
 
             if not result["success"]:
@@ -529,12 +542,7 @@ Files found:"""
                 }
 
             # Streaming AI response
-            response_chunks = []
-            async for chunk in self.llama_service.generate_streaming_response(
-                message, context
-            ):
-                response_chunks.append(chunk)
-            response = "".join(response_chunks)
+            response = await self.llama_service.generate_response(message, context)
 
             # Check if the response indicates an error
             if response.startswith("I'm currently unable to connect to my AI service"):
@@ -662,10 +670,10 @@ Files found:"""
                 }
 
             # Get file information
-            from chat.models import UploadedFile
-
             try:
-                file_obj = UploadedFile.objects.get(id=file_id)
+                file_obj = await database_sync_to_async(UploadedFile.objects.get)(
+                    id=file_id
+                )
             except UploadedFile.DoesNotExist:
                 return {
                     "response": "File not found. Please upload the file again.",
@@ -725,16 +733,15 @@ Files found:"""
                     "metadata": {},
                 }
 
-            # Check if message contains specific file references
-            if "row" in message.lower() and any(char.isdigit() for char in message):
-                # Handle row-specific questions
-                return await self._handle_row_question(message, files[0])
-            elif "column" in message.lower() or "field" in message.lower():
-                # Handle column questions
-                return await self._handle_column_question(message, files[0])
-            elif "how many" in message.lower() and "row" in message.lower():
-                # Handle count questions
+            # Questions answerable from the file data alone skip the LLM
+            _, handler, groups = intent_router.route(message)
+            if handler == "count":
                 return await self._handle_count_question(message, files[0])
+            elif handler == "row":
+                row_number = next(group for group in groups if group)
+                return await self._handle_row_question(message, files[0], row_number)
+            elif handler == "column":
+                return await self._handle_column_question(message, files[0])
             else:
                 # General file question
                 return await self._handle_general_file_question(message, files[0])
@@ -746,23 +753,23 @@ Files found:"""
                 "metadata": {},
             }
 
-    async def _handle_row_question(self, message: str, file_obj) -> Dict:
+    async def _handle_row_question(
+        self, message: str, file_obj, row_number: Optional[str] = None
+    ) -> Dict:
         """Handle questions about specific rows"""
         try:
-            import re
-
-            row_match = re.search(r"(\d+)", message)
-            if not row_match:
-                return {
-                    "response": "Please specify which row number you'd like to see.",
-                    "metadata": {},
-                }
+            if row_number is None:
+                row_match = _NUMBER_RE.search(message)
+                if not row_match:
+                    return {
+                        "response": "Please specify which row number you'd like to see.",
+                        "metadata": {},
+                    }
+                row_number = row_match.group(1)
 
-            row_num = int(row_match.group(1)) - 1  # Convert to 0-based index
+            row_num = int(row_number) - 1  # Convert to 0-based index
 
             # Get file data
-            from django.conf import settings
-
             full_file_path = f"{settings.MEDIA_ROOT}/{file_obj.file_path}"
             processed_file = self.file_service.process_file(
                 full_file_path, file_obj.file_type
@@ -802,8 +809,6 @@ Files found:"""
     async def _handle_column_question(self, message: str, file_obj) -> Dict:
         """Handle questions about columns"""
         try:
-            from django.conf import settings
-
             full_file_path = f"{settings.MEDIA_ROOT}/{file_obj.file_path}"
             processed_file = self.file_service.process_file(
                 full_file_path, file_obj.file_type
@@ -839,8 +844,6 @@ Files found:"""
     async def _handle_count_question(self, message: str, file_obj) -> Dict:
         """Handle questions about counts"""
         try:
-            from django.conf import settings
-
             full_file_path = f"{settings.MEDIA_ROOT}/{file_obj.file_path}"
             processed_file = self.file_service.process_file(
                 full_file_path, file_obj.file_type
@@ -880,8 +883,6 @@ Files found:"""
         """Handle general questions about files"""
         try:
             # Use AI service for complex questions
-            from django.conf import settings
-
             full_file_path = f"{settings.MEDIA_ROOT}/{file_obj.file_path}"
             file_summary = self.file_service.get_file_summary(full_file_path)
 
@@ -926,8 +927,6 @@ Files found:"""
     @database_sync_to_async
     def _get_session_async(self, session_id: str):
         """Get session asynchronously"""
-        from chat.models import ChatSession
-
         try:
             session = ChatSession.objects.get(session_id=session_id)
             logger.info(f"Found existing session: {session_id}")
@@ -940,29 +939,37 @@ Files found:"""
 
     @database_sync_to_async
     def _get_session_files_async(self, session):
-        """Get session files asynchronously"""
-        from chat.models import UploadedFile
-
+        """Get session files asynchronously, newest first"""
+        # The file handlers only read these columns
         return list(
-            UploadedFile.objects.filter(session=session).order_by("-upload_timestamp")
+            UploadedFile.objects.filter(session=session)
+            .only("id", "file_name", "file_path", "file_type", "file_size")
+            .order_by("-upload_timestamp")
         )
 
     @database_sync_to_async
-    def get_session_history(self, session_id: str, limit: int = 50) -> List[Dict]:
-        """Get chat session history"""
+    def get_session_history(
+        self, session_id: str, limit: int = 50, before=None, before_id=None
+    ) -> List[Dict]:
+        """
+        Get chat session history
+
+        Returns up to ``limit`` messages older than the ``(before, before_id)``
+        cursor (all messages when None), in chronological order.
+        """
         try:
             session = ChatSession.objects.get(session_id=session_id)
-            messages = session.messages.order_by("timestamp")[:limit]
+            messages = Message.objects.history(session, before, limit, before_id)
 
             history = []
-            for message in messages:
+            for message in reversed(messages):
                 history.append(
                     {
                         "id": message.id,
                         "type": message.message_type,
                         "content": message.content,
                         "timestamp": message.timestamp.isoformat(),
-                        "metadata": message.get_metadata(),
+                        "metadata": message.metadata,
                     }
                 )
 
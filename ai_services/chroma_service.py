@@ -7,17 +7,19 @@ using ChromaDB as the vector database backend.
 
 import chromadb
 import logging
-import json
 from typing import Dict, List, Optional
 from pathlib import Path
 from datetime import datetime
+import numpy as np
 from sentence_transformers import SentenceTransformer
 from django.conf import settings
+from .chunk_extractors import ChunkExtractor, extract_files
+from .embedding_cache import EmbeddingCache
 
 logger = logging.getLogger("ai_services")
 
 
-class ChromaService:
+class ChromaService(ChunkExtractor):
     """
     ChromaDB service for document storage and retrieval
     """
@@ -25,9 +27,14 @@ class ChromaService:
     def __init__(self):
         self.client = None
         self.embedding_model = None
+        self.model_name = "all-MiniLM-L6-v2"  # Lightweight but effective model
+        self.embedding_batch_size = 128  # Texts per encoder forward pass
+        self.embedding_cache = None
         self.collections = {}
+
         self._initialize_chroma()
         self._initialize_embedding_model()
+        self._initialize_embedding_cache()
 
     def _initialize_chroma(self):
         """Initialize ChromaDB client"""
@@ -47,14 +54,20 @@ class ChromaService:
     def _initialize_embedding_model(self):
         """Initialize sentence transformer model"""
         try:
-            # Use a lightweight but effective model
-            model_name = "all-MiniLM-L6-v2"
-            self.embedding_model = SentenceTransformer(model_name)
-            logger.info(f"Embedding model loaded: {model_name}")
+            self.embedding_model = SentenceTransformer(self.model_name)
+            logger.info(f"Embedding model loaded: {self.model_name}")
         except Exception as e:
             logger.error(f"Failed to load embedding model: {e}")
             self.embedding_model = None
 
+    def _initialize_embedding_cache(self):
+        """Open the persistent embedding cache"""
+        try:
+            self.embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH)
+        except Exception as e:
+            logger.warning(f"Embedding cache unavailable, embedding without it: {e}")
+            self.embedding_cache = None
+
     def get_or_create_collection(self, session_id: str) -> chromadb.Collection:
         """Get or create a collection for a session"""
         collection_name = f"session_{session_id}"
@@ -87,8 +100,35 @@ class ChromaService:
             return []
 
         try:
-            embeddings = self.embedding_model.encode(texts)
-            return embeddings.tolist()
+            if not self.embedding_cache:
+                return self.embedding_model.encode(
+                    texts, batch_size=self.embedding_batch_size
+                ).tolist()
+
+            # Only run the encoder for texts not already in the cache
+            hashes = [
+                EmbeddingCache.content_hash(self.model_name, text) for text in texts
+            ]
+            cached = self.embedding_cache.get_many(set(hashes))
+            misses = {}
+            for key, text in zip(hashes, texts):
+                if key not in cached:
+                    misses.setdefault(key, text)
+
+            if misses:
+                encoded = self.embedding_model.encode(
+                    list(misses.values()), batch_size=self.embedding_batch_size
+                )
+                new_vectors = dict(zip(misses.keys(), encoded))
+                self.embedding_cache.put_many(new_vectors)
+                cached.update(new_vectors)
+
+            logger.debug(
+                f"Embedding cache: {len(texts) - len(misses)} hits, {len(misses)} misses"
+            )
+            return np.asarray(
+                [cached[key] for key in hashes], dtype=np.float32
+            ).tolist()
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
             return []
@@ -117,19 +157,8 @@ class ChromaService:
         try:
             logger.info(f"Processing file for RAG: {file_name} ({file_type})")
 
-            # Get or create collection for this session
-            collection = self.get_or_create_collection(session_id)
-
-            # Extract content based on file type
-            if file_type == "csv":
-                chunks = self._extract_csv_chunks(file_path, file_name)
-            elif file_type in ["xlsx", "xls"]:
-                chunks = self._extract_excel_chunks(file_path, file_name)
-            elif file_type == "txt":
-                chunks = self._extract_text_chunks(file_path, file_name)
-            elif file_type == "json":
-                chunks = self._extract_json_chunks(file_path, file_name)
-            else:
+            chunks = self._extract_chunks(file_path, file_type, file_name)
+            if chunks is None:
                 return {
                     "success": False,
                     "error": f"Unsupported file type: {file_type}",
@@ -147,381 +176,141 @@ class ChromaService:
             chunk_texts = [chunk["content"] for chunk in chunks]
             embeddings = self.generate_embeddings(chunk_texts)
 
-            if not embeddings:
-                return {
-                    "success": False,
-                    "error": "Failed to generate embeddings",
-                    "chunks": [],
-                }
-
-            # Prepare data for ChromaDB
-            ids = [f"{file_id}_{i}" for i in range(len(chunks))]
-            metadatas = []
-            documents = []
-
-            for i, chunk in enumerate(chunks):
-                metadata = {
-                    "file_id": file_id,
-                    "file_name": file_name,
-                    "file_type": file_type,
-                    "chunk_type": chunk["type"],
-                    "chunk_index": i,
-                    "session_id": session_id,
-                    "upload_timestamp": datetime.now().isoformat(),
-                }
-
-                if "additional_metadata" in chunk:
-                    metadata.update(chunk["additional_metadata"])
-
-                metadatas.append(metadata)
-                documents.append(chunk["content"])
-
-            # Add to ChromaDB collection
-            collection.add(
-                ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents
+            return self._store_file_chunks(
+                session_id, file_type, file_name, file_id, chunks, embeddings
             )
 
-            logger.info(f"Added {len(chunks)} chunks to ChromaDB for file: {file_name}")
-
-            return {
-                "success": True,
-                "file_name": file_name,
-                "file_type": file_type,
-                "chunks_created": len(chunks),
-                "total_content_length": sum(len(chunk["content"]) for chunk in chunks),
-                "chunks": chunks,
-            }
-
         except Exception as e:
             logger.error(f"Error processing file for RAG: {e}")
             return {"success": False, "error": str(e), "chunks": []}
 
-    def _extract_csv_chunks(self, file_path: str, file_name: str) -> List[Dict]:
-        """Extract chunks from CSV file"""
-        try:
-            import pandas as pd
+    def ingest_files(self, session_id: str, specs: List[Dict]) -> List[Dict]:
+        """
+        Process several files for RAG, extracting them in parallel
 
-            df = pd.read_csv(file_path)
-            chunks = []
+        Large batches are extracted in a process pool; embedding uses a
+        single batched encoder call across all files in this process.
 
-            # Add column information chunk
-            columns_info = {
-                "type": "columns",
-                "content": f"Columns in {file_name}: {', '.join(df.columns.tolist())}",
-                "additional_metadata": {
-                    "total_columns": len(df.columns),
-                    "total_rows": len(df),
-                },
-            }
-            chunks.append(columns_info)
-
-            # Add data summary chunk
-            summary_info = {
-                "type": "summary",
-                "content": f"Data summary for {file_name}: {len(df)} rows, {len(df.columns)} columns. File contains structured tabular data.",
-                "additional_metadata": {
-                    "total_rows": len(df),
-                    "total_columns": len(df.columns),
-                },
-            }
-            chunks.append(summary_info)
-
-            # Add enhanced data structure chunk with column descriptions
-            column_descriptions = []
-            for col in df.columns:
-                col_lower = col.lower()
-                if "status" in col_lower:
-                    column_descriptions.append(
-                        f"{col}: Contains status information (UP/DOWN)"
-                    )
-                elif "neighbor" in col_lower:
-                    column_descriptions.append(
-                        f"{col}: Contains neighbor/connection information"
-                    )
-                elif "host" in col_lower:
-                    column_descriptions.append(f"{col}: Contains device/host names")
-                elif "interface" in col_lower:
-                    column_descriptions.append(
-                        f"{col}: Contains interface/port information"
-                    )
-                elif "address" in col_lower or "ip" in col_lower:
-                    column_descriptions.append(
-                        f"{col}: Contains address/IP information"
-                    )
-                elif "timestamp" in col_lower or "time" in col_lower:
-                    column_descriptions.append(
-                        f"{col}: Contains timestamp/time information"
-                    )
+        Args:
+            session_id: Chat session ID
+            specs: One dict per file with file_path, file_type, file_name, file_id
 
-            if column_descriptions:
-                structure_info = {
-                    "type": "structure",
-                    "content": f"Data structure in {file_name}:\n"
-                    + "\n".join(column_descriptions),
-                    "additional_metadata": {
-                        "total_rows": len(df),
-                        "total_columns": len(df.columns),
-                    },
-                }
-                chunks.append(structure_info)
-
-            # Add status-specific chunks if status columns exist
-            status_columns = [col for col in df.columns if "status" in col.lower()]
-            if status_columns:
-                for status_col in status_columns:
-                    # Get unique status values
-                    unique_statuses = df[status_col].dropna().unique()
-                    status_values = [str(s) for s in unique_statuses if str(s).strip()]
-
-                    if status_values:
-                        status_info = {
-                            "type": "status_info",
-                            "content": f"Status values in {status_col} column of {file_name}: {', '.join(status_values)}",
-                            "additional_metadata": {
-                                "status_column": status_col,
-                                "status_values": ", ".join(
-                                    status_values
-                                ),  # Convert list to string
-                            },
+        Returns:
+            Processing results in the same order as specs
+        """
+        try:
+            logger.info(f"Ingesting {len(specs)} files for RAG in session {session_id}")
+
+            extracted = extract_files(specs)
+
+            chunk_texts = [
+                chunk["content"] for chunks in extracted if chunks for chunk in chunks
+            ]
+            embeddings = self.generate_embeddings(chunk_texts) if chunk_texts else []
+
+            results = []
+            offset = 0
+            for spec, chunks in zip(specs, extracted):
+                if chunks is None:
+                    results.append(
+                        {
+                            "success": False,
+                            "error": f"Unsupported file type: {spec['file_type']}",
+                            "chunks": [],
                         }
-                        chunks.append(status_info)
-
-                        # Add specific status data chunks
-                        for status_value in ["DOWN", "down", "UP", "up"]:
-                            if status_value in status_values:
-                                status_data = df[df[status_col] == status_value]
-                                if len(status_data) > 0:
-                                    sample_size = min(20, len(status_data))
-                                    sample_data = status_data.head(sample_size).to_dict(
-                                        "records"
-                                    )
-
-                                    status_chunk_content = f"Data with {status_col} = {status_value} in {file_name}:\n"
-                                    status_chunk_content += json.dumps(
-                                        sample_data, indent=2, default=str
-                                    )
-
-                                    status_chunk = {
-                                        "type": "status_data",
-                                        "content": status_chunk_content,
-                                        "additional_metadata": {
-                                            "status_column": status_col,
-                                            "status_value": status_value,
-                                            "sample_size": len(sample_data),
-                                            "total_count": len(status_data),
-                                        },
-                                    }
-                                    chunks.append(status_chunk)
-
-            # Add neighbor-specific chunks if neighbor columns exist
-            neighbor_columns = [col for col in df.columns if "neighbor" in col.lower()]
-            if neighbor_columns:
-                for neighbor_col in neighbor_columns:
-                    # Get non-empty neighbor data
-                    neighbor_data = df[
-                        df[neighbor_col].notna() & (df[neighbor_col] != "")
-                    ]
-                    if len(neighbor_data) > 0:
-                        sample_size = min(20, len(neighbor_data))
-                        sample_data = neighbor_data.head(sample_size).to_dict("records")
-
-                        neighbor_chunk_content = (
-                            f"Data with {neighbor_col} information in {file_name}:\n"
-                        )
-                        neighbor_chunk_content += json.dumps(
-                            sample_data, indent=2, default=str
-                        )
-
-                        neighbor_chunk = {
-                            "type": "neighbor_data",
-                            "content": neighbor_chunk_content,
-                            "additional_metadata": {
-                                "neighbor_column": neighbor_col,
-                                "sample_size": len(sample_data),
-                                "total_count": len(neighbor_data),
-                            },
+                    )
+                    continue
+
+                if not chunks:
+                    results.append(
+                        {
+                            "success": False,
+                            "error": "No content extracted from file",
+                            "chunks": [],
                         }
-                        chunks.append(neighbor_chunk)
-
-            # Add sample data chunks (in batches) - keep this for general data access
-            sample_size = min(100, len(df))  # Limit to 100 rows
-            sample_df = df.head(sample_size)
-
-            # Split into smaller chunks for better search
-            chunk_size = 20
-            for i in range(0, len(sample_df), chunk_size):
-                batch = sample_df.iloc[i : i + chunk_size]
-                batch_data = batch.to_dict("records")
-
-                chunk_content = f"Sample data from {file_name} (rows {i + 1}-{min(i + chunk_size, len(sample_df))}):\n"
-                chunk_content += json.dumps(batch_data, indent=2, default=str)
-
-                chunk_info = {
-                    "type": "sample_data",
-                    "content": chunk_content,
-                    "additional_metadata": {
-                        "row_start": i + 1,
-                        "row_end": min(i + chunk_size, len(sample_df)),
-                        "sample_size": len(batch),
-                    },
-                }
-                chunks.append(chunk_info)
-
-            return chunks
-
-        except Exception as e:
-            logger.error(f"Error extracting CSV chunks: {e}")
-            return []
-
-    def _extract_excel_chunks(self, file_path: str, file_name: str) -> List[Dict]:
-        """Extract chunks from Excel file"""
-        try:
-            import pandas as pd
-
-            excel_file = pd.ExcelFile(file_path)
-            chunks = []
-
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-
-                # Add sheet information chunk
-                sheet_info = {
-                    "type": "sheet_info",
-                    "content": f"Sheet '{sheet_name}' in {file_name}: {len(df)} rows, {len(df.columns)} columns",
-                    "additional_metadata": {
-                        "sheet_name": sheet_name,
-                        "total_rows": len(df),
-                        "total_columns": len(df.columns),
-                    },
-                }
-                chunks.append(sheet_info)
-
-                # Add sample data for this sheet
-                if len(df) > 0:
-                    sample_size = min(50, len(df))
-                    sample_df = df.head(sample_size)
-                    sample_data = sample_df.to_dict("records")
-
-                    sample_content = (
-                        f"Sample data from sheet '{sheet_name}' in {file_name}:\n"
                     )
-                    sample_content += json.dumps(sample_data, indent=2, default=str)
-
-                    sample_info = {
-                        "type": "sample_data",
-                        "content": sample_content,
-                        "additional_metadata": {
-                            "sheet_name": sheet_name,
-                            "sample_size": len(sample_data),
-                        },
-                    }
-                    chunks.append(sample_info)
-
-            return chunks
-
-        except Exception as e:
-            logger.error(f"Error extracting Excel chunks: {e}")
-            return []
-
-    def _extract_text_chunks(self, file_path: str, file_name: str) -> List[Dict]:
-        """Extract chunks from text file"""
-        try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                content = f.read()
+                    continue
+
+                file_embeddings = embeddings[offset : offset + len(chunks)]
+                offset += len(chunks)
+
+                results.append(
+                    self._store_file_chunks(
+                        session_id,
+                        spec["file_type"],
+                        spec["file_name"],
+                        spec["file_id"],
+                        chunks,
+                        file_embeddings,
+                    )
+                )
 
-            # Split content into semantic chunks
-            chunks = self._split_text_into_chunks(content, file_name)
-            return chunks
+            return results
 
         except Exception as e:
-            logger.error(f"Error extracting text chunks: {e}")
-            return []
-
-    def _extract_json_chunks(self, file_path: str, file_name: str) -> List[Dict]:
-        """Extract chunks from JSON file"""
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            chunks = []
-
-            # Add structure information chunk
-            structure_info = {
-                "type": "structure",
-                "content": f"JSON structure in {file_name}: {self._describe_json_structure(data)}",
-                "additional_metadata": {"data_type": type(data).__name__},
-            }
-            chunks.append(structure_info)
-
-            # Add sample data chunk
-            sample_content = f"Sample data from {file_name}:\n"
-            sample_content += json.dumps(data, indent=2, default=str)[:3000] + "..."
+            logger.error(f"Error ingesting files for RAG: {e}")
+            return [{"success": False, "error": str(e), "chunks": []} for _ in specs]
 
-            sample_info = {
-                "type": "sample_data",
-                "content": sample_content,
-                "additional_metadata": {"data_type": type(data).__name__},
+    def _store_file_chunks(
+        self,
+        session_id: str,
+        file_type: str,
+        file_name: str,
+        file_id: str,
+        chunks: List[Dict],
+        embeddings: List[List[float]],
+    ) -> Dict:
+        """Add a file's embedded chunks to the session collection"""
+        if not embeddings:
+            return {
+                "success": False,
+                "error": "Failed to generate embeddings",
+                "chunks": [],
             }
-            chunks.append(sample_info)
 
-            return chunks
+        # Get or create collection for this session
+        collection = self.get_or_create_collection(session_id)
 
-        except Exception as e:
-            logger.error(f"Error extracting JSON chunks: {e}")
-            return []
+        # Prepare data for ChromaDB
+        ids = [f"{file_id}_{i}" for i in range(len(chunks))]
+        metadatas = []
+        documents = []
 
-    def _split_text_into_chunks(
-        self, text: str, file_name: str, chunk_size: int = 1000, overlap: int = 200
-    ) -> List[Dict]:
-        """Split text into overlapping chunks"""
-        chunks = []
-        start = 0
-
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end]
-
-            # Try to break at sentence boundary
-            if end < len(text):
-                last_period = chunk.rfind(".")
-                last_newline = chunk.rfind("\n")
-                break_point = max(last_period, last_newline)
-
-                if break_point > start + chunk_size * 0.5:  # At least 50% of chunk size
-                    chunk = text[start : start + break_point + 1]
-                    end = start + break_point + 1
-
-            chunk_info = {
-                "type": "text_chunk",
-                "content": chunk.strip(),
-                "additional_metadata": {
-                    "chunk_index": len(chunks),
-                    "position_start": start,
-                    "position_end": end,
-                },
+        for i, chunk in enumerate(chunks):
+            metadata = {
+                "file_id": file_id,
+                "file_name": file_name,
+                "file_type": file_type,
+                "chunk_type": chunk["type"],
+                "chunk_index": i,
+                "session_id": session_id,
+                "upload_timestamp": datetime.now().isoformat(),
             }
-            chunks.append(chunk_info)
 
-            start = end - overlap
+            if "additional_metadata" in chunk:
+                metadata.update(chunk["additional_metadata"])
+
+            metadatas.append(metadata)
+            documents.append(chunk["content"])
 
-        return chunks
+        # Add to ChromaDB collection
+        collection.add(
+            ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents
+        )
 
-    def _describe_json_structure(self, obj, max_depth=3, current_depth=0):
-        """Describe JSON structure recursively"""
-        if current_depth >= max_depth:
-            return "..."
+        logger.info(f"Added {len(chunks)} chunks to ChromaDB for file: {file_name}")
 
-        if isinstance(obj, dict):
-            if len(obj) == 0:
-                return "empty object"
-            keys = list(obj.keys())[:5]  # Show first 5 keys
-            return f"object with keys: {', '.join(keys)}"
-        elif isinstance(obj, list):
-            if len(obj) == 0:
-                return "empty array"
-            return f"array with {len(obj)} items"
-        else:
-            return type(obj).__name__
+        return {
+            "success": True,
+            "file_name": file_name,
+            "file_type": file_type,
+            "chunks_created": len(chunks),
+            "total_content_length": sum(len(chunk["content"]) for chunk in chunks),
+            "chunks": chunks,
+            "ids": ids,
+            "embeddings": embeddings,
+            "metadatas": metadatas,
+        }
 
     def search_similar_chunks(
         self,
@@ -588,6 +377,24 @@ class ChromaService:
             logger.error(f"Error searching similar chunks: {e}")
             return []
 
+    def get_session_vectors(self, session_id: str) -> Dict:
+        """Get all stored chunk ids, embeddings, documents and metadata for a session"""
+        try:
+            collection = self.get_or_create_collection(session_id)
+
+            results = collection.get(include=["embeddings", "documents", "metadatas"])
+
+            return {
+                "ids": results["ids"] or [],
+                "embeddings": results["embeddings"] or [],
+                "documents": results["documents"] or [],
+                "metadatas": results["metadatas"] or [],
+            }
+
+        except Exception as e:
+            logger.error(f"Error getting session vectors: {e}")
+            return {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+
     def get_file_chunks(self, session_id: str, file_name: str) -> List[Dict]:
         """Get all chunks for a specific file"""
         try:
@@ -0,0 +1,520 @@
+"""
+Chunk Extractors
+
+Turn uploaded CSV, Excel, text and JSON files into content chunks for RAG.
+Kept apart from ChromaService so ingest worker processes only import pandas
+and numba, not ChromaDB or the embedding model.
+"""
+
+import atexit
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import orjson
+import pandas as pd
+from numba import njit
+
+logger = logging.getLogger("ai_services")
+
+# Rows per pandas chunk when scanning a CSV for RAG chunks
+CSV_CHUNK_ROWS = 50_000
+
+
+@njit(cache=True)
+def _find_breaks(buf: np.ndarray, chunk_size: int, overlap: int) -> np.ndarray:
+    """Find (start, end) pairs of overlapping chunks in a buffer of code units"""
+    n = buf.shape[0]
+    step = max(chunk_size // 2 + 1 - overlap, 1)
+    breaks = np.empty((n // step + 2, 2), dtype=np.int64)
+    count = 0
+    start = 0
+
+    while start < n:
+        end = start + chunk_size
+
+        # Break after the last '.' or '\n' in the back half of the chunk
+        if end < n:
+            for i in range(end - 1, start + chunk_size // 2, -1):
+                if buf[i] == 46 or buf[i] == 10:
+                    end = i + 1
+                    break
+
+        breaks[count, 0] = start
+        breaks[count, 1] = end
+        count += 1
+
+        if end - overlap <= start:
+            break
+        start = end - overlap
+
+    return breaks[:count]
+
+
+def split_text_spans(
+    text: str, chunk_size: int = 1000, overlap: int = 200
+) -> List[Tuple[int, int]]:
+    """Return (start, end) character offsets of overlapping text chunks"""
+    # One array element per character so offsets index straight into the str
+    if text.isascii():
+        buf = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+    else:
+        buf = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+    return _find_breaks(buf, chunk_size, overlap).tolist()
+
+
+def trim_json_sample(obj, max_keys=5, max_items=3, depth=0, max_depth=3):
+    """Trim parsed JSON to a small sample so only that part gets serialized"""
+    if isinstance(obj, dict):
+        if depth >= max_depth:
+            return "{...}"
+        return {
+            key: trim_json_sample(value, max_keys, max_items, depth + 1, max_depth)
+            for key, value in islice(obj.items(), max_keys)
+        }
+    elif isinstance(obj, list):
+        if depth >= max_depth:
+            return "[...]"
+        return [
+            trim_json_sample(item, max_keys, max_items, depth + 1, max_depth)
+            for item in obj[:max_items]
+        ]
+    return obj
+
+
+# Ingest batches smaller than this are extracted in-process; starting
+# workers costs more than parsing a few small files
+INGEST_POOL_MIN_BYTES = 16 * 1024 * 1024
+INGEST_MAX_WORKERS = 4
+
+_ingest_executor = None
+
+
+def _get_ingest_executor() -> ProcessPoolExecutor:
+    """Shared process pool for CPU-bound file extraction"""
+    global _ingest_executor
+    if _ingest_executor is None:
+        # Spawn rather than fork so workers don't inherit Django/DB state.
+        # Workers start on demand, up to one per file in a batch
+        _ingest_executor = ProcessPoolExecutor(
+            max_workers=min(INGEST_MAX_WORKERS, os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        atexit.register(_ingest_executor.shutdown)
+    return _ingest_executor
+
+
+def _batch_bytes(specs: List[Dict]) -> int:
+    """Total on-disk size of the files in an ingest batch"""
+    total = 0
+    for spec in specs:
+        try:
+            total += os.path.getsize(spec["file_path"])
+        except OSError:
+            pass
+    return total
+
+
+def extract_file_chunks(spec: Dict) -> Optional[List[Dict]]:
+    """Extract one file's chunks; None if its type is unsupported"""
+    return ChunkExtractor()._extract_chunks(
+        spec["file_path"], spec["file_type"], spec["file_name"]
+    )
+
+
+def extract_files(specs: List[Dict]) -> List[Optional[List[Dict]]]:
+    """Extract chunks for each spec, in the process pool for large batches"""
+    if len(specs) > 1 and _batch_bytes(specs) >= INGEST_POOL_MIN_BYTES:
+        return list(_get_ingest_executor().map(extract_file_chunks, specs))
+    return [extract_file_chunks(spec) for spec in specs]
+
+
+class ChunkExtractor:
+    """
+    Extract RAG content chunks from files; holds no state
+    """
+
+    # Chunk extractor method names by file type
+    CHUNK_EXTRACTORS = {
+        "csv": "_extract_csv_chunks",
+        "xlsx": "_extract_excel_chunks",
+        "xls": "_extract_excel_chunks",
+        "txt": "_extract_text_chunks",
+        "json": "_extract_json_chunks",
+    }
+
+    def _extract_chunks(
+        self, file_path: str, file_type: str, file_name: str
+    ) -> Optional[List[Dict]]:
+        """Extract content chunks based on file type; None if unsupported"""
+        extractor = self.CHUNK_EXTRACTORS.get(file_type)
+        if extractor is None:
+            return None
+        return getattr(self, extractor)(file_path, file_name)
+
+    def _extract_csv_chunks(self, file_path: str, file_name: str) -> List[Dict]:
+        """
+        Extract chunks from CSV file
+
+        The file is read CSV_CHUNK_ROWS rows at a time and only counts,
+        distinct status values and the first few matching rows are kept, so
+        memory stays bounded however large the file is.
+        """
+        try:
+            columns = pd.read_csv(file_path, nrows=0).columns
+            status_columns = [col for col in columns if "status" in col.lower()]
+            neighbor_columns = [col for col in columns if "neighbor" in col.lower()]
+
+            total_rows = 0
+            head_parts = []  # First 100 rows
+            head_rows = 0
+            status_seen = {col: {} for col in status_columns}  # Ordered sets
+            status_parts = {}  # (column, value) -> frames holding up to 20 rows
+            status_counts = {}
+            neighbor_parts = {col: [] for col in neighbor_columns}
+            neighbor_counts = dict.fromkeys(neighbor_columns, 0)
+
+            # Status columns repeat a handful of values; category dtype stores
+            # them as small integer codes instead of one string per row
+            for part in pd.read_csv(
+                file_path,
+                chunksize=CSV_CHUNK_ROWS,
+                memory_map=True,
+                engine="c",
+                dtype=dict.fromkeys(status_columns, "category"),
+            ):
+                total_rows += len(part)
+                if head_rows < 100:
+                    head_parts.append(part.head(100 - head_rows))
+                    head_rows += len(head_parts[-1])
+
+                for status_col in status_columns:
+                    for status in part[status_col].dropna().unique():
+                        status_seen[status_col].setdefault(status, None)
+                    for status_value in ["DOWN", "down", "UP", "up"]:
+                        matches = part[part[status_col] == status_value]
+                        key = (status_col, status_value)
+                        status_counts[key] = status_counts.get(key, 0) + len(matches)
+                        frames = status_parts.setdefault(key, [])
+                        kept = sum(len(frame) for frame in frames)
+                        if kept < 20 and len(matches):
+                            frames.append(matches.head(20 - kept))
+
+                for neighbor_col in neighbor_columns:
+                    matches = part[
+                        part[neighbor_col].notna() & (part[neighbor_col] != "")
+                    ]
+                    neighbor_counts[neighbor_col] += len(matches)
+                    frames = neighbor_parts[neighbor_col]
+                    kept = sum(len(frame) for frame in frames)
+                    if kept < 20 and len(matches):
+                        frames.append(matches.head(20 - kept))
+
+            def collect(frames):
+                return pd.concat(frames) if frames else pd.DataFrame(columns=columns)
+
+            df_columns = columns.tolist()
+            chunks = []
+
+            # Add column information chunk
+            columns_info = {
+                "type": "columns",
+                "content": f"Columns in {file_name}: {', '.join(df_columns)}",
+                "additional_metadata": {
+                    "total_columns": len(df_columns),
+                    "total_rows": total_rows,
+                },
+            }
+            chunks.append(columns_info)
+
+            # Add data summary chunk
+            summary_info = {
+                "type": "summary",
+                "content": f"Data summary for {file_name}: {total_rows} rows, {len(df_columns)} columns. File contains structured tabular data.",
+                "additional_metadata": {
+                    "total_rows": total_rows,
+                    "total_columns": len(df_columns),
+                },
+            }
+            chunks.append(summary_info)
+
+            # Add enhanced data structure chunk with column descriptions
+            column_descriptions = []
+            for col in df_columns:
+                col_lower = col.lower()
+                if "status" in col_lower:
+                    column_descriptions.append(
+                        f"{col}: Contains status information (UP/DOWN)"
+                    )
+                elif "neighbor" in col_lower:
+                    column_descriptions.append(
+                        f"{col}: Contains neighbor/connection information"
+                    )
+                elif "host" in col_lower:
+                    column_descriptions.append(f"{col}: Contains device/host names")
+                elif "interface" in col_lower:
+                    column_descriptions.append(
+                        f"{col}: Contains interface/port information"
+                    )
+                elif "address" in col_lower or "ip" in col_lower:
+                    column_descriptions.append(
+                        f"{col}: Contains address/IP information"
+                    )
+                elif "timestamp" in col_lower or "time" in col_lower:
+                    column_descriptions.append(
+                        f"{col}: Contains timestamp/time information"
+                    )
+
+            if column_descriptions:
+                structure_info = {
+                    "type": "structure",
+                    "content": f"Data structure in {file_name}:\n"
+                    + "\n".join(column_descriptions),
+                    "additional_metadata": {
+                        "total_rows": total_rows,
+                        "total_columns": len(df_columns),
+                    },
+                }
+                chunks.append(structure_info)
+
+            # Add status-specific chunks if status columns exist
+            if status_columns:
+                for status_col in status_columns:
+                    # Get unique status values
+                    unique_statuses = status_seen[status_col]
+                    status_values = [str(s) for s in unique_statuses if str(s).strip()]
+
+                    if status_values:
+                        status_info = {
+                            "type": "status_info",
+                            "content": f"Status values in {status_col} column of {file_name}: {', '.join(status_values)}",
+                            "additional_metadata": {
+                                "status_column": status_col,
+                                "status_values": ", ".join(
+                                    status_values
+                                ),  # Convert list to string
+                            },
+                        }
+                        chunks.append(status_info)
+
+                        # Add specific status data chunks
+                        for status_value in ["DOWN", "down", "UP", "up"]:
+                            if status_value in status_values:
+                                key = (status_col, status_value)
+                                if status_counts[key] > 0:
+                                    sample_data = collect(status_parts[key]).to_dict(
+                                        "records"
+                                    )
+
+                                    status_chunk_content = f"Data with {status_col} = {status_value} in {file_name}:\n"
+                                    status_chunk_content += json.dumps(
+                                        sample_data, indent=2, default=str
+                                    )
+
+                                    status_chunk = {
+                                        "type": "status_data",
+                                        "content": status_chunk_content,
+                                        "additional_metadata": {
+                                            "status_column": status_col,
+                                            "status_value": status_value,
+                                            "sample_size": len(sample_data),
+                                            "total_count": status_counts[key],
+                                        },
+                                    }
+                                    chunks.append(status_chunk)
+
+            # Add neighbor-specific chunks if neighbor columns exist
+            if neighbor_columns:
+                for neighbor_col in neighbor_columns:
+                    # Non-empty neighbor data
+                    if neighbor_counts[neighbor_col] > 0:
+                        sample_data = collect(neighbor_parts[neighbor_col]).to_dict(
+                            "records"
+                        )
+
+                        neighbor_chunk_content = (
+                            f"Data with {neighbor_col} information in {file_name}:\n"
+                        )
+                        neighbor_chunk_content += json.dumps(
+                            sample_data, indent=2, default=str
+                        )
+
+                        neighbor_chunk = {
+                            "type": "neighbor_data",
+                            "content": neighbor_chunk_content,
+                            "additional_metadata": {
+                                "neighbor_column": neighbor_col,
+                                "sample_size": len(sample_data),
+                                "total_count": neighbor_counts[neighbor_col],
+                            },
+                        }
+                        chunks.append(neighbor_chunk)
+
+            # Add sample data chunks (in batches) - keep this for general data access
+            sample_df = collect(head_parts)  # Limited to 100 rows
+
+            # Split into smaller chunks for better search
+            chunk_size = 20
+            for i in range(0, len(sample_df), chunk_size):
+                batch = sample_df.iloc[i : i + chunk_size]
+                batch_data = batch.to_dict("records")
+
+                chunk_content = f"Sample data from {file_name} (rows {i + 1}-{min(i + chunk_size, len(sample_df))}):\n"
+                chunk_content += json.dumps(batch_data, indent=2, default=str)
+
+                chunk_info = {
+                    "type": "sample_data",
+                    "content": chunk_content,
+                    "additional_metadata": {
+                        "row_start": i + 1,
+                        "row_end": min(i + chunk_size, len(sample_df)),
+                        "sample_size": len(batch),
+                    },
+                }
+                chunks.append(chunk_info)
+
+            return chunks
+
+        except Exception as e:
+            logger.error(f"Error extracting CSV chunks: {e}")
+            return []
+
+    def _extract_excel_chunks(self, file_path: str, file_name: str) -> List[Dict]:
+        """Extract chunks from Excel file"""
+        try:
+            excel_file = pd.ExcelFile(file_path)
+            chunks = []
+
+            for sheet_name in excel_file.sheet_names:
+                df = excel_file.parse(sheet_name)
+
+                # Add sheet information chunk
+                sheet_info = {
+                    "type": "sheet_info",
+                    "content": f"Sheet '{sheet_name}' in {file_name}: {len(df)} rows, {len(df.columns)} columns",
+                    "additional_metadata": {
+                        "sheet_name": sheet_name,
+                        "total_rows": len(df),
+                        "total_columns": len(df.columns),
+                    },
+                }
+                chunks.append(sheet_info)
+
+                # Add sample data for this sheet
+                if len(df) > 0:
+                    sample_size = min(50, len(df))
+                    sample_df = df.head(sample_size)
+                    sample_data = sample_df.to_dict("records")
+
+                    sample_content = (
+                        f"Sample data from sheet '{sheet_name}' in {file_name}:\n"
+                    )
+                    sample_content += json.dumps(sample_data, indent=2, default=str)
+
+                    sample_info = {
+                        "type": "sample_data",
+                        "content": sample_content,
+                        "additional_metadata": {
+                            "sheet_name": sheet_name,
+                            "sample_size": len(sample_data),
+                        },
+                    }
+                    chunks.append(sample_info)
+
+            return chunks
+
+        except Exception as e:
+            logger.error(f"Error extracting Excel chunks: {e}")
+            return []
+
+    def _extract_text_chunks(self, file_path: str, file_name: str) -> List[Dict]:
+        """Extract chunks from text file"""
+        try:
+            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+                content = f.read()
+
+            # Split content into semantic chunks
+            chunks = self._split_text_into_chunks(content, file_name)
+            return chunks
+
+        except Exception as e:
+            logger.error(f"Error extracting text chunks: {e}")
+            return []
+
+    def _extract_json_chunks(self, file_path: str, file_name: str) -> List[Dict]:
+        """Extract chunks from JSON file"""
+        try:
+            with open(file_path, "rb") as f:
+                data = orjson.loads(f.read())
+
+            chunks = []
+
+            # Add structure information chunk
+            structure_info = {
+                "type": "structure",
+                "content": f"JSON structure in {file_name}: {self._describe_json_structure(data)}",
+                "additional_metadata": {"data_type": type(data).__name__},
+            }
+            chunks.append(structure_info)
+
+            # Add sample data chunk
+            sample_content = f"Sample data from {file_name}:\n"
+            sample_json = orjson.dumps(
+                trim_json_sample(data), default=str, option=orjson.OPT_INDENT_2
+            ).decode()
+            sample_content += sample_json[:3000] + "..."
+
+            sample_info = {
+                "type": "sample_data",
+                "content": sample_content,
+                "additional_metadata": {"data_type": type(data).__name__},
+            }
+            chunks.append(sample_info)
+
+            return chunks
+
+        except Exception as e:
+            logger.error(f"Error extracting JSON chunks: {e}")
+            return []
+
+    def _split_text_into_chunks(
+        self, text: str, file_name: str, chunk_size: int = 1000, overlap: int = 200
+    ) -> List[Dict]:
+        """Split text into overlapping chunks"""
+        chunks = []
+
+        for start, end in split_text_spans(text, chunk_size, overlap):
+            chunk_info = {
+                "type": "text_chunk",
+                "content": text[start:end].strip(),
+                "additional_metadata": {
+                    "chunk_index": len(chunks),
+                    "position_start": start,
+                    "position_end": end,
+                },
+            }
+            chunks.append(chunk_info)
+
+        return chunks
+
+    def _describe_json_structure(self, obj, max_depth=3, current_depth=0):
+        """Describe JSON structure recursively"""
+        if current_depth >= max_depth:
+            return "..."
+
+        if isinstance(obj, dict):
+            if len(obj) == 0:
+                return "empty object"
+            keys = list(obj.keys())[:5]  # Show first 5 keys
+            return f"object with keys: {', '.join(keys)}"
+        elif isinstance(obj, list):
+            if len(obj) == 0:
+                return "empty array"
+            return f"array with {len(obj)} items"
+        else:
+            return type(obj).__name__
@@ -3,7 +3,8 @@ import pyodbc
 import pandas as pd
 import logging
 from typing import Dict, List, Tuple
-from chat.models import DatabaseConnection, QueryHistory
+from django.core.cache import cache
+from chat.models import ChatSession, DatabaseConnection, QueryHistory
 
 logger = logging.getLogger("ai_services")
 
@@ -11,6 +12,8 @@ logger = logging.getLogger("ai_services")
 class DatabaseService:
     def __init__(self):
         self.connections = {}
+        self.configs = {}  # connection_id -> config, for reconnecting
+        self.health_ttl = 30  # Seconds a successful ping is trusted
 
     def create_connection(self, connection_config: Dict) -> str:
         """Create a database connection"""
@@ -27,6 +30,7 @@ class DatabaseService:
                 f"{connection_config['server']}_{connection_config['database']}"
             )
             self.connections[connection_id] = connection
+            self.configs[connection_id] = connection_config
 
             logger.info(f"Database connection created: {connection_id}")
             return connection_id
@@ -56,12 +60,8 @@ class DatabaseService:
             connection = self.connections[connection_id]
 
             # Test with a simple query
-            cursor = connection.cursor()
-            cursor.execute("SELECT 1 as test")
-            result = cursor.fetchone()
-            cursor.close()
-
-            if result:
+            if self._ping(connection):
+                cache.set(self._health_key(connection_id), True, self.health_ttl)
                 return True, "Connection successful"
             else:
                 return False, "Connection test failed"
@@ -69,6 +69,50 @@ class DatabaseService:
         except Exception as e:
             return False, str(e)
 
+    def _ping(self, connection) -> bool:
+        """Run a trivial query on an open connection"""
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT 1 as test")
+            return cursor.fetchone() is not None
+        finally:
+            cursor.close()
+
+    def _health_key(self, connection_id: str) -> str:
+        return f"db_conn_ok:{connection_id}"
+
+    def is_healthy(self, connection_id: str) -> bool:
+        """
+        Check a connection, pinging at most once per health_ttl seconds
+
+        A successful ping is remembered in the Django cache, so queries in
+        between skip the round trip.
+        """
+        key = self._health_key(connection_id)
+        if cache.get(key):
+            return True
+
+        try:
+            healthy = self._ping(self.connections[connection_id])
+        except Exception as e:
+            logger.warning(f"Ping failed for {connection_id}: {e}")
+            healthy = False
+
+        if healthy:
+            cache.set(key, True, self.health_ttl)
+        return healthy
+
+    def _live_connection(self, connection_id: str):
+        """Return an open connection, reconnecting it if the health check fails"""
+        if connection_id not in self.connections:
+            raise ValueError(f"Connection {connection_id} not found")
+
+        if not self.is_healthy(connection_id):
+            logger.info(f"Reconnecting stale connection {connection_id}")
+            self.create_connection(self.configs[connection_id])
+
+        return self.connections[connection_id]
+
     def execute_query(
         self, connection_id: str, query: str, session_id: str = None
     ) -> Dict:
@@ -76,10 +120,7 @@ class DatabaseService:
         start_time = pd.Timestamp.now()
 
         try:
-            if connection_id not in self.connections:
-                raise ValueError(f"Connection {connection_id} not found")
-
-            connection = self.connections[connection_id]
+            connection = self._live_connection(connection_id)
 
             # Use pandas for better data handling
             df = pd.read_sql(query, connection)
@@ -128,6 +169,112 @@ class DatabaseService:
                 "query": query,
             }
 
+    def stream_query(
+        self,
+        connection_id: str,
+        query: str,
+        session_id: str = None,
+        head_rows: int = 200,
+        batch_size: int = 5000,
+    ) -> Dict:
+        """
+        Execute SQL query and return its first rows plus a batch iterator
+
+        Rows are fetched from the cursor batch_size at a time, so the full
+        result set is never held in memory. "batches" yields lists of row
+        dicts starting with "head". Once it is exhausted, fails or is closed,
+        even before its first batch, the cursor is closed, "stats" holds the
+        row count and the execution time including fetches, and the query is
+        logged.
+        """
+        start_time = pd.Timestamp.now()
+        cursor = None
+
+        try:
+            cursor = self._live_connection(connection_id).cursor()
+            cursor.arraysize = batch_size
+            cursor.execute(query)
+            # Statements that return no result set have no description
+            columns = [column[0] for column in cursor.description or ()]
+            head = (
+                [dict(zip(columns, row)) for row in cursor.fetchmany(head_rows)]
+                if columns
+                else []
+            )
+
+        except Exception as e:
+            if cursor is not None:
+                cursor.close()
+            execution_time = (pd.Timestamp.now() - start_time).total_seconds()
+            error_msg = str(e)
+
+            if session_id:
+                self._log_query_execution(
+                    session_id,
+                    connection_id,
+                    query,
+                    0,
+                    execution_time,
+                    False,
+                    error_msg,
+                )
+
+            logger.error(f"Query execution failed: {error_msg}")
+            return {
+                "success": False,
+                "error": error_msg,
+                "execution_time": execution_time,
+                "query": query,
+            }
+
+        stats = {"row_count": len(head), "execution_time": None}
+
+        def batches():
+            error_msg = ""
+            try:
+                # Started below, so close() runs the cleanup even if the
+                # caller never asks for a batch
+                yield
+                if head:
+                    yield head
+                while columns:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    stats["row_count"] += len(rows)
+                    yield [dict(zip(columns, row)) for row in rows]
+            except Exception as e:
+                error_msg = str(e)
+                logger.error(f"Query fetch failed: {error_msg}")
+                raise
+            finally:
+                cursor.close()
+                stats["execution_time"] = (
+                    pd.Timestamp.now() - start_time
+                ).total_seconds()
+                if session_id:
+                    self._log_query_execution(
+                        session_id,
+                        connection_id,
+                        query,
+                        stats["row_count"],
+                        stats["execution_time"],
+                        not error_msg,
+                        error_msg,
+                    )
+
+        row_batches = batches()
+        next(row_batches)
+
+        return {
+            "success": True,
+            "head": head,
+            "batches": row_batches,
+            "columns": columns,
+            "stats": stats,
+            "query": query,
+        }
+
     def get_table_schema(self, connection_id: str, table_name: str = None) -> Dict:
         """Get database schema information"""
         try:
@@ -215,8 +362,6 @@ class DatabaseService:
     ):
         """Log query execution to database"""
         try:
-            from chat.models import ChatSession
-
             session = ChatSession.objects.get(session_id=session_id)
             # Find the database connection - this is simplified
             # You might need to adjust based on your connection management
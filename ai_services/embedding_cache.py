@@ -0,0 +1,79 @@
+"""
+Embedding Cache
+
+Persistent on-disk cache of embedding vectors keyed by a hash of the model
+name and the embedded text, so re-ingesting identical content skips the
+encoder and survives process restarts.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable
+
+import numpy as np
+
+logger = logging.getLogger("ai_services")
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed store of float16 embedding vectors
+    """
+
+    # Keep IN (...) lookups under SQLite's bound-variable limit
+    _LOOKUP_BATCH_SIZE = 500
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(hash BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._connection.commit()
+        logger.info(f"Embedding cache opened at {path}")
+
+    @staticmethod
+    def content_hash(model_name: str, content: str) -> bytes:
+        """Cache key for a piece of text embedded by a given model"""
+        return hashlib.sha256(f"{model_name}|{content}".encode("utf-8")).digest()
+
+    def get_many(self, hashes: Iterable[bytes]) -> Dict[bytes, np.ndarray]:
+        """Look up cached vectors, returning only the hashes that were found"""
+        hashes = list(hashes)
+        found = {}
+
+        with self._lock:
+            for i in range(0, len(hashes), self._LOOKUP_BATCH_SIZE):
+                batch = hashes[i : i + self._LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE hash IN ({placeholders})",
+                    batch,
+                ).fetchall()
+
+                for key, vector in rows:
+                    found[bytes(key)] = np.frombuffer(vector, dtype=np.float16)
+
+        return found
+
+    def put_many(self, hash_to_vec: Dict[bytes, np.ndarray]):
+        """Store vectors as float16 bytes"""
+        rows = [
+            (key, np.asarray(vector, dtype=np.float16).tobytes())
+            for key, vector in hash_to_vec.items()
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, vector) VALUES (?, ?)", rows
+            )
+            self._connection.commit()
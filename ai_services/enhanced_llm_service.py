@@ -7,7 +7,8 @@ data-not-found scenarios with appropriate LLM responses.
 """
 
 import logging
-from typing import Dict, List, AsyncGenerator
+from asgiref.sync import sync_to_async
+from typing import Awaitable, Callable, Dict, List, AsyncGenerator, Optional
 from .foundry_service import FoundryService
 from .file_analyzer import FileAnalyzer
 from .rag_service import RAGService
@@ -31,7 +32,10 @@ class EnhancedLLMService:
         self.rag_service = RAGService()
 
     async def process_question_with_files(
-        self, question: str, attached_files: List[Dict]
+        self,
+        question: str,
+        attached_files: List[Dict],
+        progress_callback: Optional[Callable[[str], Awaitable[None]]] = None,
     ) -> Dict:
         """
         Process a user question with attached files using intelligent analysis
@@ -39,6 +43,8 @@ class EnhancedLLMService:
         Args:
             question: User's question
             attached_files: List of attached file information
+            progress_callback: Optional coroutine awaited with a status message
+                as each processing step starts
 
         Returns:
             Dict containing the complete response with analysis and LLM answer
@@ -53,6 +59,7 @@ class EnhancedLLMService:
 
             # Step 2: Analyze files for relevant data (legacy + RAG enhanced)
             # This will also process files for RAG system
+            await self._report_progress(progress_callback, "analyzing")
             file_analysis = await self.file_analyzer.analyze_question_with_files_async(
                 question, attached_files
             )
@@ -71,11 +78,14 @@ class EnhancedLLMService:
                 # Try to get session_id from file metadata or use a default
                 session_id = attached_files[0].get("session_id", "default_session")
 
-            rag_context = self.rag_service.get_context_for_question(
-                session_id, question, file_names
-            )
+            await self._report_progress(progress_callback, "searching")
+            # Embedding + index search is CPU-bound; keep it off the event loop
+            rag_context = await sync_to_async(
+                self.rag_service.get_context_for_question, thread_sensitive=False
+            )(session_id, question, file_names)
 
             # Step 2: Generate LLM response based on analysis and RAG context
+            await self._report_progress(progress_callback, "generating")
             llm_response = await self._generate_llm_response(
                 question, file_analysis, rag_context
             )
@@ -181,11 +191,7 @@ class EnhancedLLMService:
             """
 
             # Generate response using LLM
-            response_chunks = []
-            async for chunk in self.llm_service.generate_streaming_response(prompt):
-                response_chunks.append(chunk)
-
-            return "".join(response_chunks)
+            return await self.llm_service.generate_response(prompt)
 
         except Exception as e:
             logger.error(f"Error generating no-data response: {e}")
@@ -209,11 +215,7 @@ class EnhancedLLMService:
             prompt = self._build_data_driven_prompt(question, file_analysis)
 
             # Generate response using LLM
-            response_chunks = []
-            async for chunk in self.llm_service.generate_streaming_response(prompt):
-                response_chunks.append(chunk)
-
-            return "".join(response_chunks)
+            return await self.llm_service.generate_response(prompt)
 
         except Exception as e:
             logger.error(f"Error generating data-driven response: {e}")
@@ -271,11 +273,7 @@ class EnhancedLLMService:
             )
 
             # Generate response using LLM
-            response_chunks = []
-            async for chunk in self.llm_service.generate_streaming_response(prompt):
-                response_chunks.append(chunk)
-
-            return "".join(response_chunks)
+            return await self.llm_service.generate_response(prompt)
 
         except Exception as e:
             logger.error(f"Error generating RAG-enhanced response: {e}")
@@ -415,6 +413,13 @@ Please provide your answer:
             logger.error(f"Error in streaming response: {e}")
             yield f"❌ **Error:** Sorry, I encountered an error processing your request: {str(e)}"
 
+    async def _report_progress(
+        self, progress_callback: Optional[Callable[[str], Awaitable[None]]], step: str
+    ):
+        """Send the status message for a processing step, if anyone is listening"""
+        if progress_callback:
+            await progress_callback(self.get_processing_status(step))
+
     def get_processing_status(self, step: str) -> str:
         """
         Get status message for different processing steps
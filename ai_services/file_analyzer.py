@@ -7,6 +7,8 @@ for AI model integration.
 """
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import json
 import logging
 import re
@@ -18,6 +20,82 @@ from .rag_service import RAGService
 
 logger = logging.getLogger("ai_services")
 
+# Common words dropped when extracting search terms from a question
+_STOP_WORDS = frozenset(
+    {
+        "the",
+        "a",
+        "an",
+        "and",
+        "or",
+        "but",
+        "in",
+        "on",
+        "at",
+        "to",
+        "for",
+        "of",
+        "with",
+        "by",
+        "is",
+        "are",
+        "was",
+        "were",
+        "be",
+        "been",
+        "being",
+        "have",
+        "has",
+        "had",
+        "do",
+        "does",
+        "did",
+        "will",
+        "would",
+        "could",
+        "should",
+        "may",
+        "might",
+        "can",
+        "what",
+        "which",
+        "where",
+        "when",
+        "why",
+        "how",
+        "who",
+        "this",
+        "that",
+        "these",
+        "those",
+        "i",
+        "you",
+        "he",
+        "she",
+        "it",
+        "we",
+        "they",
+        "me",
+        "him",
+        "her",
+        "us",
+        "them",
+        "my",
+        "your",
+        "his",
+        "its",
+        "our",
+        "their",
+        "mine",
+        "yours",
+        "hers",
+        "ours",
+        "theirs",
+        "am",
+    }
+)
+_WORD_RE = re.compile(r"\b\w+\b")
+
 
 class FileAnalyzer:
     """Generic file analysis service for AI-driven data retrieval"""
@@ -26,6 +104,15 @@ class FileAnalyzer:
         self.search_cache = {}
         self.rag_service = RAGService()
 
+        # Analyzers by file type
+        self.analyzers = {
+            "csv": self._analyze_csv,
+            "xlsx": self._analyze_excel,
+            "xls": self._analyze_excel,
+            "json": self._analyze_json,
+            "txt": self._analyze_text,
+        }
+
     def analyze_question_with_files(
         self, question: str, attached_files: List[Dict]
     ) -> Dict:
@@ -53,25 +140,18 @@ class FileAnalyzer:
             all_found_data = []
             files_analyzed = 0
 
+            resolved_files = []
             for file_info in attached_files:
                 file_path = self._resolve_file_path(file_info)
                 if not file_path:
                     logger.warning(f"Could not resolve path for: {file_info}")
                     continue
+                resolved_files.append((file_info, file_path))
 
-                # Process file for RAG system
-                # We need session_id and file_id for RAG processing
-                session_id = file_info.get("session_id", "default_session")
-                file_id = file_info.get("id", f"temp_{file_info.get('name')}")
-
-                rag_result = self.rag_service.process_file_for_rag(
-                    session_id,
-                    file_path,
-                    file_info.get("type"),
-                    file_info.get("name"),
-                    file_id,
-                )
+            # Process all files for RAG system in one batch
+            rag_results = self._process_files_for_rag(resolved_files)
 
+            for (file_info, file_path), rag_result in zip(resolved_files, rag_results):
                 # Analyze file content (legacy + RAG enhanced)
                 analysis = self._analyze_file(
                     file_path, file_info, search_terms, question
@@ -158,25 +238,18 @@ class FileAnalyzer:
             all_found_data = []
             files_analyzed = 0
 
+            resolved_files = []
             for file_info in attached_files:
                 file_path = await self._resolve_file_path_async(file_info)
                 if not file_path:
                     logger.warning(f"Could not resolve path for: {file_info}")
                     continue
+                resolved_files.append((file_info, file_path))
 
-                # Process file for RAG system
-                # We need session_id and file_id for RAG processing
-                session_id = file_info.get("session_id", "default_session")
-                file_id = file_info.get("id", f"temp_{file_info.get('name')}")
-
-                rag_result = self.rag_service.process_file_for_rag(
-                    session_id,
-                    file_path,
-                    file_info.get("type"),
-                    file_info.get("name"),
-                    file_id,
-                )
+            # Process all files for RAG system in one batch
+            rag_results = self._process_files_for_rag(resolved_files)
 
+            for (file_info, file_path), rag_result in zip(resolved_files, rag_results):
                 # Analyze file content (legacy + RAG enhanced)
                 analysis = self._analyze_file(
                     file_path, file_info, search_terms, question
@@ -241,90 +314,11 @@ class FileAnalyzer:
         question_lower = question.lower()
 
         # Basic keyword extraction
-        words = re.findall(r"\b\w+\b", question_lower)
-
-        # Remove common stop words
-        stop_words = {
-            "the",
-            "a",
-            "an",
-            "and",
-            "or",
-            "but",
-            "in",
-            "on",
-            "at",
-            "to",
-            "for",
-            "of",
-            "with",
-            "by",
-            "is",
-            "are",
-            "was",
-            "were",
-            "be",
-            "been",
-            "being",
-            "have",
-            "has",
-            "had",
-            "do",
-            "does",
-            "did",
-            "will",
-            "would",
-            "could",
-            "should",
-            "may",
-            "might",
-            "can",
-            "what",
-            "which",
-            "where",
-            "when",
-            "why",
-            "how",
-            "who",
-            "this",
-            "that",
-            "these",
-            "those",
-            "i",
-            "you",
-            "he",
-            "she",
-            "it",
-            "we",
-            "they",
-            "me",
-            "him",
-            "her",
-            "us",
-            "them",
-            "my",
-            "your",
-            "his",
-            "her",
-            "its",
-            "our",
-            "their",
-            "mine",
-            "yours",
-            "his",
-            "hers",
-            "ours",
-            "theirs",
-            "am",
-            "is",
-            "are",
-            "was",
-            "were",
-        }
+        words = _WORD_RE.findall(question_lower)
 
         # Filter out stop words and short words
         filtered_words = [
-            word for word in words if word not in stop_words and len(word) > 2
+            word for word in words if word not in _STOP_WORDS and len(word) > 2
         ]
 
         # Add semantic variations for common data analysis terms
@@ -370,11 +364,37 @@ class FileAnalyzer:
         logger.info(f"Extracted search terms: {unique_terms}")
         return unique_terms
 
+    def _process_files_for_rag(self, resolved_files: List[tuple]) -> List[Dict]:
+        """Ingest (file_info, file_path) pairs for RAG, batching files per session"""
+        rag_results = [None] * len(resolved_files)
+        specs_by_session = {}
+
+        for position, (file_info, file_path) in enumerate(resolved_files):
+            # We need session_id and file_id for RAG processing
+            session_id = file_info.get("session_id", "default_session")
+            spec = {
+                "file_path": file_path,
+                "file_type": file_info.get("type"),
+                "file_name": file_info.get("name"),
+                "file_id": file_info.get("id", f"temp_{file_info.get('name')}"),
+            }
+            specs_by_session.setdefault(session_id, []).append((position, spec))
+
+        for session_id, entries in specs_by_session.items():
+            results = self.rag_service.ingest_files(
+                session_id, [spec for _, spec in entries]
+            )
+            for (position, _), result in zip(entries, results):
+                rag_results[position] = result
+
+        return rag_results
+
     def _resolve_file_path(self, file_info: Dict) -> Optional[str]:
         """Resolve file path from file info (synchronous version)"""
         try:
             file_id = file_info.get("id")
             file_name = file_info.get("name")
+            media_root = Path(settings.MEDIA_ROOT)
 
             # Check for direct path first (for testing)
             if "path" in file_info:
@@ -385,13 +405,14 @@ class FileAnalyzer:
 
             # Try Django model lookup (synchronous)
             try:
+                # Imported here so this module can load before django.setup()
                 from chat.models import UploadedFile
 
                 # Try by ID first
                 if file_id and str(file_id).isdigit():
                     try:
                         file_obj = UploadedFile.objects.get(id=file_id)
-                        full_path = Path(settings.MEDIA_ROOT) / file_obj.file_path
+                        full_path = media_root / file_obj.file_path
                         if full_path.exists():
                             return str(full_path)
                     except UploadedFile.DoesNotExist:
@@ -401,7 +422,7 @@ class FileAnalyzer:
                 if file_name:
                     file_obj = UploadedFile.objects.filter(file_name=file_name).first()
                     if file_obj:
-                        full_path = Path(settings.MEDIA_ROOT) / file_obj.file_path
+                        full_path = media_root / file_obj.file_path
                         if full_path.exists():
                             return str(full_path)
 
@@ -410,17 +431,7 @@ class FileAnalyzer:
 
             # Fallback: search filesystem
             if file_name:
-                media_root = Path(settings.MEDIA_ROOT)
-                if media_root.exists():
-                    # Exact match
-                    for path in media_root.rglob(file_name):
-                        if path.is_file():
-                            return str(path)
-
-                    # Case insensitive
-                    for path in media_root.rglob("*"):
-                        if path.is_file() and path.name.lower() == file_name.lower():
-                            return str(path)
+                return self._search_media_root(media_root, file_name)
 
             return None
 
@@ -428,11 +439,32 @@ class FileAnalyzer:
             logger.error(f"Error resolving file path: {e}")
             return None
 
+    def _search_media_root(self, media_root: Path, file_name: str) -> Optional[str]:
+        """
+        Find a file under media_root by name, preferring an exact match
+
+        A single directory walk covers both the exact and the
+        case-insensitive match, and each candidate is stat'ed at most once.
+        """
+        if not media_root.exists():
+            return None
+
+        lowered = file_name.lower()
+        fallback = None
+        for path in media_root.rglob("*"):
+            if path.name == file_name:
+                if path.is_file():
+                    return str(path)
+            elif fallback is None and path.name.lower() == lowered and path.is_file():
+                fallback = str(path)
+        return fallback
+
     async def _resolve_file_path_async(self, file_info: Dict) -> Optional[str]:
         """Resolve file path from file info (async version)"""
         try:
             file_id = file_info.get("id")
             file_name = file_info.get("name")
+            media_root = Path(settings.MEDIA_ROOT)
 
             # Check for direct path first (for testing)
             if "path" in file_info:
@@ -451,7 +483,7 @@ class FileAnalyzer:
                         file_obj = await sync_to_async(UploadedFile.objects.get)(
                             id=file_id
                         )
-                        full_path = Path(settings.MEDIA_ROOT) / file_obj.file_path
+                        full_path = media_root / file_obj.file_path
                         if full_path.exists():
                             return str(full_path)
                     except UploadedFile.DoesNotExist:
@@ -463,7 +495,7 @@ class FileAnalyzer:
                         UploadedFile.objects.filter(file_name=file_name).first
                     )()
                     if file_obj:
-                        full_path = Path(settings.MEDIA_ROOT) / file_obj.file_path
+                        full_path = media_root / file_obj.file_path
                         if full_path.exists():
                             return str(full_path)
 
@@ -472,17 +504,7 @@ class FileAnalyzer:
 
             # Fallback: search filesystem
             if file_name:
-                media_root = Path(settings.MEDIA_ROOT)
-                if media_root.exists():
-                    # Exact match
-                    for path in media_root.rglob(file_name):
-                        if path.is_file():
-                            return str(path)
-
-                    # Case insensitive
-                    for path in media_root.rglob("*"):
-                        if path.is_file() and path.name.lower() == file_name.lower():
-                            return str(path)
+                return self._search_media_root(media_root, file_name)
 
             return None
 
@@ -497,15 +519,8 @@ class FileAnalyzer:
         try:
             file_type = file_info.get("type", "").lower()
 
-            if file_type == "csv":
-                return self._analyze_csv(file_path, search_terms, question)
-            elif file_type in ["xlsx", "xls"]:
-                return self._analyze_excel(file_path, search_terms, question)
-            elif file_type == "json":
-                return self._analyze_json(file_path, search_terms, question)
-            elif file_type == "txt":
-                return self._analyze_text(file_path, search_terms, question)
-            else:
+            analyzer = self.analyzers.get(file_type)
+            if analyzer is None:
                 return {
                     "found_data": {},
                     "relevance_score": 0,
@@ -513,6 +528,8 @@ class FileAnalyzer:
                     "file_path": file_path,
                 }
 
+            return analyzer(file_path, search_terms, question)
+
         except Exception as e:
             logger.error(f"Error analyzing file {file_path}: {e}")
             return {
@@ -527,7 +544,7 @@ class FileAnalyzer:
     ) -> Dict:
         """Analyze CSV file"""
         try:
-            df = pd.read_csv(file_path)
+            df = pd.read_csv(file_path, memory_map=True)
             logger.info(f"CSV loaded: {len(df)} rows, {len(df.columns)} columns")
 
             relevance_score = 0
@@ -551,12 +568,10 @@ class FileAnalyzer:
                         break
 
             # 2. Search data content
+            text_columns = self._text_columns(df)
             for term in search_terms:
-                term_lower = term.lower()
-                for col in df.columns:
-                    # Convert column to string and search
-                    col_str = df[col].astype(str).str.lower()
-                    mask = col_str.str.contains(term_lower, na=False, regex=False)
+                for col, values in text_columns.items():
+                    mask = self._term_mask(values, term)
 
                     if mask.any():
                         matching_rows = df[mask]
@@ -571,7 +586,9 @@ class FileAnalyzer:
                         relevance_score += len(matching_rows)
 
             # 3. Apply intelligent filtering based on question
-            filtered_df = self._apply_intelligent_filter(df, question, search_terms)
+            filtered_df = self._apply_intelligent_filter(
+                df, question, search_terms, text_columns
+            )
             if not filtered_df.empty and len(filtered_df) < len(df):
                 found_data["filtered_data"] = filtered_df.head(20).to_dict("records")
                 found_data["filtered_count"] = len(filtered_df)
@@ -597,9 +614,18 @@ class FileAnalyzer:
             }
 
     def _apply_intelligent_filter(
-        self, df: pd.DataFrame, question: str, search_terms: List[str]
+        self,
+        df: pd.DataFrame,
+        question: str,
+        search_terms: List[str],
+        text_columns: Dict[str, pa.Array],
     ) -> pd.DataFrame:
-        """Apply intelligent filtering based on question context"""
+        """
+        Apply intelligent filtering based on question context
+
+        text_columns are the Arrow string columns already built for the content
+        search, so the state filter is one regex scan over an existing array.
+        """
         try:
             question_lower = question.lower()
 
@@ -616,13 +642,9 @@ class FileAnalyzer:
             if state_columns:
                 state_col = state_columns[0]
                 # Check if any search terms match state values
-                patterns = [term.lower() for term in search_terms]
-                mask = (
-                    df[state_col]
-                    .astype(str)
-                    .str.lower()
-                    .str.contains("|".join(patterns), na=False)
-                )
+                mask = pc.match_substring_regex(
+                    text_columns[state_col], "|".join(search_terms), ignore_case=True
+                ).to_numpy(zero_copy_only=False)
                 if mask.any():
                     return df[mask]
 
@@ -672,7 +694,7 @@ class FileAnalyzer:
             relevance_score = 0
 
             for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
+                df = excel_file.parse(sheet_name)
                 # Reuse CSV analysis logic
                 sheet_analysis = self._analyze_csv_dataframe(df, search_terms, question)
                 if sheet_analysis["relevance_score"] > 0:
@@ -724,10 +746,10 @@ class FileAnalyzer:
                     break
 
         # Data matching
+        text_columns = self._text_columns(df)
         for term in search_terms:
-            for col in df.columns:
-                col_str = df[col].astype(str).str.lower()
-                mask = col_str.str.contains(term.lower(), na=False, regex=False)
+            for col, values in text_columns.items():
+                mask = self._term_mask(values, term)
                 if mask.any():
                     matching_rows = df[mask]
                     found_data["matching_data"].append(
@@ -746,6 +768,18 @@ class FileAnalyzer:
             "summary": self._generate_csv_summary(found_data, relevance_score),
         }
 
+    def _text_columns(self, df: pd.DataFrame) -> Dict[str, pa.Array]:
+        """Convert each column to an Arrow string array once, for all search terms"""
+        return {
+            col: pa.array(df[col].astype(str), type=pa.string()) for col in df.columns
+        }
+
+    def _term_mask(self, values: pa.Array, term: str):
+        """Case-insensitive substring match over an Arrow string column"""
+        return pc.match_substring(values, term, ignore_case=True).to_numpy(
+            zero_copy_only=False
+        )
+
     def _analyze_json(
         self, file_path: str, search_terms: List[str], question: str
     ) -> Dict:
@@ -1,12 +1,13 @@
 # ai_services/file_service.py
 import pandas as pd
+import hashlib
 import json
 import logging
 from pathlib import Path
 from typing import Dict
 from django.conf import settings
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from .rag_service import RAGService
 
 logger = logging.getLogger("ai_services")
 
@@ -26,57 +27,27 @@ class FileService:
             ".pdf": self._process_pdf,
         }
 
-    def _clean_data_for_json(self, data):
-        """Clean data to ensure JSON serialization"""
-        try:
-            if isinstance(data, dict):
-                return {str(k): self._clean_data_for_json(v) for k, v in data.items()}
-            elif isinstance(data, list):
-                return [self._clean_data_for_json(item) for item in data]
-            elif isinstance(data, (int, float, str, bool, type(None))):
-                # Handle NaN and infinity values
-                if isinstance(data, float):
-                    if pd.isna(data) or pd.isinf(data):
-                        return None
-                return data
-            elif hasattr(data, "dtype"):  # numpy/pandas types
-                if pd.isna(data) or pd.isinf(data):
-                    return None
-                if hasattr(data, "item"):  # numpy scalar
-                    return data.item()
-                return str(data)
-            elif hasattr(data, "to_dict"):  # pandas objects
-                try:
-                    return self._clean_data_for_json(data.to_dict())
-                except (AttributeError, TypeError, ValueError) as e:
-                    logger.debug(f"Failed to convert pandas object to dict: {e}")
-                    return str(data)
-            elif hasattr(data, "tolist"):  # numpy arrays
-                return self._clean_data_for_json(data.tolist())
-            else:
-                return str(data)
-        except Exception as e:
-            logger.error(f"Error cleaning data for JSON: {e}")
-            return str(data)
-
     def save_uploaded_file(self, file, session_id: str) -> Dict:
         """Save uploaded file and return file info"""
         try:
-            # Generate unique filename
             file_extension = Path(file.name).suffix.lower()
-            timestamp = pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{session_id}_{timestamp}_{file.name}"
 
-            # Save file
-            file_path = default_storage.save(
-                f"uploads/{filename}", ContentFile(file.read())
-            )
+            # Content-addressed storage: identical uploads share one copy
+            content_hash = self._content_hash(file)
+            filename = f"{content_hash}{file_extension}"
+            file_path = f"by-hash/{content_hash[:2]}/{filename}"
+
+            if default_storage.exists(file_path):
+                logger.info(f"Reusing stored copy of {file.name}: {file_path}")
+            else:
+                file_path = default_storage.save(file_path, file)
             full_path = default_storage.path(file_path)
 
             return {
                 "success": True,
                 "filename": file.name,
                 "saved_filename": filename,
+                "content_hash": content_hash,
                 "file_path": file_path,
                 "full_path": full_path,
                 "file_size": file.size,
@@ -88,6 +59,13 @@ class FileService:
             logger.error(f"Failed to save file: {e}")
             return {"success": False, "error": str(e)}
 
+    def _content_hash(self, file) -> str:
+        """Hash an uploaded file in 1 MB chunks without reading it into memory"""
+        digest = hashlib.blake2b(digest_size=32)
+        for chunk in file.chunks(chunk_size=1 << 20):
+            digest.update(chunk)
+        return digest.hexdigest()
+
     def process_file(self, file_path: str, file_type: str) -> Dict:
         """Process uploaded file and extract content"""
         try:
@@ -113,9 +91,9 @@ class FileService:
     def _process_csv(self, file_path: str) -> Dict:
         """Process CSV file"""
         try:
-            logger.info(f"Processing CSV file: {file_path}")
-            df = pd.read_csv(file_path)
-            logger.info(f"CSV loaded: {len(df)} rows, {len(df.columns)} columns")
+            logger.info("Processing CSV file: %s", file_path)
+            df = pd.read_csv(file_path, memory_map=True)
+            logger.info("CSV loaded: %d rows, %d columns", len(df), len(df.columns))
 
             # Basic analysis
             logger.info("Creating basic analysis...")
@@ -129,7 +107,7 @@ class FileService:
                 },
                 "memory_usage": int(df.memory_usage(deep=True).sum()),
             }
-            logger.info(f"Analysis created: {analysis}")
+            logger.debug("Analysis created: %s", analysis)
 
             # Sample data
             sample = df.head(10).to_dict("records")
@@ -152,51 +130,21 @@ class FileService:
             else:
                 numeric_summary = {}
 
-            # Clean the data for JSON serialization
-            # Handle NaN values in the DataFrame before conversion
-            df_clean = df.fillna("N/A")  # Replace NaN with 'N/A' string
-
-            clean_sample = self._clean_data_for_json(sample)
-            clean_full_data = self._clean_data_for_json(
-                df_clean.head(100).to_dict("records")
-            )  # Limit to first 100 rows
-
+            # Values are left as pandas returns them; the response encoder
+            # handles NaN, timestamps and numpy types in one pass
             result = {
                 "success": True,
                 "file_type": "csv",
                 "content": df.to_string(max_rows=1000),  # Limit for display
-                "data": clean_sample,
+                "data": sample,
                 "analysis": analysis,
                 "numeric_summary": numeric_summary,
-                "full_data": clean_full_data,  # Cleaned data for AI processing
+                # First 100 rows for AI processing, NaN shown as 'N/A'
+                "full_data": df.head(100).fillna("N/A").to_dict("records"),
             }
 
-            # Final validation: ensure the result is JSON serializable
-            try:
-                import json
-
-                json.dumps(result)
-                logger.info("JSON validation passed")
-            except Exception as e:
-                logger.error(f"JSON validation failed: {e}")
-                # If validation fails, create a simplified result
-                result = {
-                    "success": True,
-                    "file_type": "csv",
-                    "content": f"CSV file with {len(df)} rows and {len(df.columns)} columns",
-                    "data": [],  # Empty data to avoid serialization issues
-                    "analysis": {
-                        "rows": len(df),
-                        "columns": len(df.columns),
-                        "column_names": list(df.columns),
-                    },
-                    "message": "File processed successfully (simplified output due to data complexity)",
-                }
-
             logger.info("CSV processing completed successfully")
-            logger.info(f"Result keys: {list(result.keys())}")
-            logger.info(f"Sample data type: {type(result['data'])}")
-            logger.info(f"Analysis type: {type(result['analysis'])}")
+            logger.debug("Result keys: %s", list(result))
 
             return result
 
@@ -211,13 +159,10 @@ class FileService:
             sheets_data = {}
 
             for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-                # Clean the data for JSON serialization
-                clean_sheet_data = self._clean_data_for_json(
-                    df.head(10).to_dict("records")
-                )
+                # Parse from the open workbook rather than reloading the file
+                df = excel_file.parse(sheet_name)
                 sheets_data[sheet_name] = {
-                    "data": clean_sheet_data,
+                    "data": df.head(10).to_dict("records"),
                     "rows": int(len(df)),
                     "columns": int(len(df.columns)),
                     "column_names": list(df.columns),
@@ -231,23 +176,6 @@ class FileService:
                 "content": f"Excel file with {len(excel_file.sheet_names)} sheets: {', '.join(excel_file.sheet_names)}",
             }
 
-            # Final validation: ensure the result is JSON serializable
-            try:
-                import json
-
-                json.dumps(result)
-                logger.info("Excel JSON validation passed")
-            except Exception as e:
-                logger.error(f"Excel JSON validation failed: {e}")
-                # If validation fails, create a simplified result
-                result = {
-                    "success": True,
-                    "file_type": "excel",
-                    "sheet_names": excel_file.sheet_names,
-                    "content": f"Excel file with {len(excel_file.sheet_names)} sheets: {', '.join(excel_file.sheet_names)}",
-                    "message": "File processed successfully (simplified output due to data complexity)",
-                }
-
             return result
 
         except Exception as e:
@@ -286,9 +214,6 @@ class FileService:
             with open(file_path, "r", encoding="utf-8") as f:
                 data = json.load(f)
 
-            # Clean the data for JSON serialization
-            clean_data = self._clean_data_for_json(data)
-
             # Basic JSON analysis
             analysis = {
                 "type": type(data).__name__,
@@ -303,8 +228,8 @@ class FileService:
             return {
                 "success": True,
                 "file_type": "json",
-                "content": json.dumps(clean_data, indent=2)[:5000],  # Limit for display
-                "data": clean_data,
+                "content": json.dumps(data, indent=2)[:5000],  # Limit for display
+                "data": data,
                 "analysis": analysis,
             }
 
@@ -371,7 +296,7 @@ class FileService:
             file_extension = Path(file_path).suffix.lower()
 
             if file_extension == ".csv":
-                df = pd.read_csv(file_path)
+                df = pd.read_csv(file_path, memory_map=True)
                 return f"""CSV File Summary:
 - Rows: {len(df)}
 - Columns: {len(df.columns)}
@@ -447,10 +372,9 @@ class FileService:
             RAG processing results
         """
         try:
-            from .chroma_service import ChromaService
-
-            chroma_service = ChromaService()
-            result = chroma_service.process_file_for_rag(
+            # Go through the shared RAG service so its in-memory search index
+            # picks up the new chunks
+            result = RAGService().process_file_for_rag(
                 session_id, file_path, file_type, file_name, file_id
             )
 
@@ -1,13 +1,59 @@
 import httpx
-import json
 import logging
 import asyncio
+import orjson
+import io
+import weakref
 from typing import Dict, List, Optional, AsyncGenerator
 from django.conf import settings
-from foundry_local import FoundryLocalManager
 
 logger = logging.getLogger("ai_services")
 
+_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+# Pooled clients shared by all FoundryService instances so keep-alive
+# connections survive across requests. An AsyncClient is bound to the loop
+# it first runs on, so there is one per event loop, closed with that loop
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> (client, closer)
+_sync_client: Optional[httpx.Client] = None
+
+
+async def _close_with_loop(client: httpx.AsyncClient):
+    """
+    Started async generator that closes client when its loop is torn down
+
+    The loop finalizes unfinished async generators in shutdown_asyncgens(),
+    which asyncio.run() and async_to_sync() call before closing it, so the
+    clients of short-lived loops don't leak their connections.
+    """
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def _get_client() -> httpx.AsyncClient:
+    """Return the pooled AsyncClient for the running event loop"""
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None or entry[0].is_closed:
+        client = httpx.AsyncClient(timeout=_TIMEOUT, limits=_LIMITS)
+        closer = _close_with_loop(client)
+        await closer.__anext__()
+        # The loop only holds its async generators weakly
+        _async_clients[loop] = (client, closer)
+        return client
+    return entry[0]
+
+
+def _get_sync_client() -> httpx.Client:
+    """Return the pooled Client used by blocking health checks"""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = httpx.Client(timeout=5.0, limits=_LIMITS)
+    return _sync_client
+
 
 class FoundryService:
     def __init__(self):
@@ -17,6 +63,11 @@ class FoundryService:
         self.max_tokens = settings.AI_CONFIG["MAX_TOKENS"]
         self.temperature = settings.AI_CONFIG["TEMPERATURE"]
         self.api_key = settings.AI_CONFIG.get("API_KEY", "")
+        self.response_timeout = settings.AI_CONFIG.get("RESPONSE_TIMEOUT", 120)
+
+        # Generated SQL keyed by (normalized request, schema summary)
+        self.sql_cache = {}
+        self.sql_cache_size = 256
         
         # Get ngrok auth settings if available
         self.ngrok_auth = settings.AI_CONFIG.get("NGROK_AUTH", None)
@@ -29,7 +80,14 @@ class FoundryService:
     async def generate_streaming_response(
         self, prompt: str, context: Optional[List[Dict]] = None
     ) -> AsyncGenerator[str, None]:
-        """Generate a streaming response from AI service"""
+        """
+        Generate a streaming response from AI service
+
+        This must stay a native async generator over async HTTP streams. It is
+        consumed directly on the Channels event loop, so a blocking call or a
+        sync generator here would stall every connection; wrap any unavoidable
+        sync work (ORM included) in sync_to_async.
+        """
         messages = self._build_openai_messages(prompt, context)
 
         # Detect service type
@@ -49,6 +107,26 @@ class FoundryService:
             async for chunk in self._handle_openai_compatible(messages):
                 yield chunk
 
+    async def generate_response(
+        self, prompt: str, context: Optional[List[Dict]] = None
+    ) -> str:
+        """Collect a streamed response into one string, bounded by response_timeout"""
+        buf = io.StringIO()
+
+        async def consume():
+            async for chunk in self.generate_streaming_response(prompt, context):
+                buf.write(chunk)
+
+        try:
+            await asyncio.wait_for(consume(), timeout=self.response_timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"AI response timed out after {self.response_timeout}s")
+            return (
+                f"Error: AI service did not respond within "
+                f"{self.response_timeout} seconds"
+            )
+        return buf.getvalue()
+
     def _detect_service_type(self) -> str:
         """Detect which AI service we're using from the service type"""
         if not self.service_type:
@@ -72,26 +150,25 @@ class FoundryService:
         headers = {"Content-Type": "application/json"}
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(url, json=payload, headers=headers)
-                if response.status_code == 200:
-                    data = response.json()
-                    if "candidates" in data and data["candidates"]:
-                        candidate = data["candidates"][0]
-                        if "content" in candidate and "parts" in candidate["content"]:
-                            for part in candidate["content"]["parts"]:
-                                if "text" in part and part["text"]:
-                                    # Simulate streaming
-                                    text = part["text"]
-                                    chunk_size = 50
-                                    for i in range(0, len(text), chunk_size):
-                                        yield text[i : i + chunk_size]
-                                        await asyncio.sleep(0.01)
-                else:
-                    logger.error(
-                        f"Google AI error: {response.status_code} - {response.text}"
-                    )
-                    yield f"Error: Google AI service returned {response.status_code}"
+            client = await _get_client()
+            response = await client.post(
+                url, content=orjson.dumps(payload), headers=headers
+            )
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                if "candidates" in data and data["candidates"]:
+                    candidate = data["candidates"][0]
+                    if "content" in candidate and "parts" in candidate["content"]:
+                        # The reply is already complete; pass each part straight
+                        # through instead of replaying it in timed chunks
+                        for part in candidate["content"]["parts"]:
+                            if "text" in part and part["text"]:
+                                yield part["text"]
+            else:
+                logger.error(
+                    f"Google AI error: {response.status_code} - {response.text}"
+                )
+                yield f"Error: Google AI service returned {response.status_code}"
         except Exception as e:
             logger.error(f"Google AI exception: {e}")
             yield f"Error connecting to Google AI: {str(e)}"
@@ -163,34 +240,33 @@ class FoundryService:
 
                 for headers in headers_variants:
                     try:
-                        async with httpx.AsyncClient(timeout=30.0) as client:
-                            logger.debug(
-                                f"Trying payload: {json.dumps(payload, indent=2)}"
-                            )
-
-                            async with client.stream(
-                                "POST", endpoint, json=payload, headers=headers
-                            ) as response:
-                                logger.info(
-                                    f"Qwen response status: {response.status_code}"
+                        client = await _get_client()
+                        logger.debug("Trying payload: %s", payload)
+
+                        async with client.stream(
+                            "POST",
+                            endpoint,
+                            content=orjson.dumps(payload),
+                            headers=headers,
+                        ) as response:
+                            logger.info(f"Qwen response status: {response.status_code}")
+
+                            if response.status_code == 200:
+                                # Success! Parse the streaming response
+                                async for chunk in self._parse_qwen_streaming_response(
+                                    response
+                                ):
+                                    yield chunk
+                                return  # Exit after successful response
+                            elif response.status_code == 405:
+                                logger.debug(f"Method not allowed for {endpoint}")
+                                break  # Try next endpoint
+                            else:
+                                error_response = await response.aread()
+                                logger.warning(
+                                    f"Qwen API error {response.status_code}: {error_response.decode()[:200]}"
                                 )
 
-                                if response.status_code == 200:
-                                    # Success! Parse the streaming response
-                                    async for (
-                                        chunk
-                                    ) in self._parse_qwen_streaming_response(response):
-                                        yield chunk
-                                    return  # Exit after successful response
-                                elif response.status_code == 405:
-                                    logger.debug(f"Method not allowed for {endpoint}")
-                                    break  # Try next endpoint
-                                else:
-                                    error_response = await response.aread()
-                                    logger.warning(
-                                        f"Qwen API error {response.status_code}: {error_response.decode()[:200]}"
-                                    )
-
                     except httpx.ConnectError:
                         logger.debug(f"Connection failed for {endpoint}")
                         break  # Try next endpoint
@@ -206,6 +282,9 @@ class FoundryService:
     ) -> AsyncGenerator[str, None]:
         """Handle Foundry Local requests"""
         try:
+            # Imported here so the other backends never load the Foundry SDK
+            from foundry_local import FoundryLocalManager
+
             alias = self.model_name
             manager = FoundryLocalManager(alias)
             url = manager.endpoint + "/chat/completions"
@@ -220,33 +299,33 @@ class FoundryService:
 
             headers = {"Content-Type": "application/json"}
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                async with client.stream(
-                    "POST", url, json=payload, headers=headers
-                ) as response:
-                    if response.status_code == 200:
-                        async for line in response.aiter_lines():
-                            if line.startswith("data: "):
-                                line = line[6:]
-                            if line.strip() and line.strip() != "[DONE]":
-                                try:
-                                    data = json.loads(line)
-                                    if "choices" in data and len(data["choices"]) > 0:
-                                        content = (
-                                            data["choices"][0]
-                                            .get("delta", {})
-                                            .get("content", "")
-                                        )
-                                        if content:
-                                            yield content
-                                except json.JSONDecodeError:
-                                    continue
-                    else:
-                        error_msg = await response.text()
-                        logger.error(
-                            f"Foundry Local error: {response.status_code} - {error_msg}"
-                        )
-                        yield f"Error: Foundry Local service returned {response.status_code}"
+            client = await _get_client()
+            async with client.stream(
+                "POST", url, content=orjson.dumps(payload), headers=headers
+            ) as response:
+                if response.status_code == 200:
+                    async for line in response.aiter_lines():
+                        if line.startswith("data: "):
+                            line = line[6:]
+                        if line.strip() and line.strip() != "[DONE]":
+                            try:
+                                data = orjson.loads(line)
+                                if "choices" in data and len(data["choices"]) > 0:
+                                    content = (
+                                        data["choices"][0]
+                                        .get("delta", {})
+                                        .get("content", "")
+                                    )
+                                    if content:
+                                        yield content
+                            except orjson.JSONDecodeError:
+                                continue
+                else:
+                    error_msg = await response.text()
+                    logger.error(
+                        f"Foundry Local error: {response.status_code} - {error_msg}"
+                    )
+                    yield f"Error: Foundry Local service returned {response.status_code}"
         except Exception as e:
             logger.error(f"Foundry Local exception: {e}")
             yield f"Error connecting to Foundry Local: {str(e)}"
@@ -267,35 +346,35 @@ class FoundryService:
 
             headers = {"Content-Type": "application/json"}
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                try:
-                    async with client.stream(
-                        "POST",
-                        f"{self.api_url}/api/generate",
-                        json=payload,
-                        headers=headers,
-                    ) as response:
-                        await response.aread()  # Read the response first
-                        if response.status_code == 200:
-                            async for line in response.aiter_lines():
-                                if not line.strip():
-                                    continue
-                                try:
-                                    data = json.loads(line)
-                                    if "response" in data:
-                                        yield data["response"]
-                                except json.JSONDecodeError:
-                                    continue
-                        else:
-                            error_content = await response.aread()
-                            error_msg = error_content.decode('utf-8')
-                            logger.error(
-                                f"Llama error: {response.status_code} - {error_msg}"
-                            )
-                            yield f"Error: Llama service returned {response.status_code}"
-                except httpx.ReadError as e:
-                    logger.error(f"Error reading Llama response: {e}")
-                    yield f"Error: Failed to read Llama response: {str(e)}"
+            client = await _get_client()
+            try:
+                async with client.stream(
+                    "POST",
+                    f"{self.api_url}/api/generate",
+                    content=orjson.dumps(payload),
+                    headers=headers,
+                ) as response:
+                    await response.aread()  # Read the response first
+                    if response.status_code == 200:
+                        async for line in response.aiter_lines():
+                            if not line.strip():
+                                continue
+                            try:
+                                data = orjson.loads(line)
+                                if "response" in data:
+                                    yield data["response"]
+                            except orjson.JSONDecodeError:
+                                continue
+                    else:
+                        error_content = await response.aread()
+                        error_msg = error_content.decode('utf-8')
+                        logger.error(
+                            f"Llama error: {response.status_code} - {error_msg}"
+                        )
+                        yield f"Error: Llama service returned {response.status_code}"
+            except httpx.ReadError as e:
+                logger.error(f"Error reading Llama response: {e}")
+                yield f"Error: Failed to read Llama response: {str(e)}"
         except Exception as e:
             logger.error(f"Llama exception: {e}")
             yield f"Error connecting to Llama: {str(e)}"
@@ -333,8 +412,8 @@ class FoundryService:
                 break
 
             try:
-                data = json.loads(line)
-                logger.debug(f"Qwen chunk: {data}")
+                data = orjson.loads(line)
+                logger.debug("Qwen chunk: %s", data)
 
                 # Try different response formats
                 content = None
@@ -361,7 +440,7 @@ class FoundryService:
                 if content:
                     yield content
 
-            except json.JSONDecodeError as e:
+            except orjson.JSONDecodeError as e:
                 logger.error(f"Qwen JSON parse error: {e} | line: {line}")
                 # Sometimes response might not be JSON
                 if line.strip() and not line.startswith("{"):
@@ -398,33 +477,29 @@ class FoundryService:
             headers["Authorization"] = f"Bearer {self.api_key}"
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                async with client.stream(
-                    "POST", self.api_url, json=payload, headers=headers
-                ) as response:
-                    if response.status_code == 200:
-                        async for line in response.aiter_lines():
-                            if line.startswith("data: "):
-                                line = line[6:]
-                            if line.strip() and line.strip() != "[DONE]":
-                                try:
-                                    data = json.loads(line)
-                                    delta = data.get("choices", [{}])[0].get(
-                                        "delta", {}
-                                    )
-                                    content = delta.get("content")
-                                    if content:
-                                        yield content
-                                except Exception as e:
-                                    logger.error(
-                                        f"OpenAI parse error: {e} | line: {line}"
-                                    )
-                    else:
-                        error_response = await response.aread()
-                        logger.error(
-                            f"OpenAI API error: {response.status_code} - {error_response}"
-                        )
-                        yield f"Error: OpenAI-compatible service returned {response.status_code}"
+            client = await _get_client()
+            async with client.stream(
+                "POST", self.api_url, content=orjson.dumps(payload), headers=headers
+            ) as response:
+                if response.status_code == 200:
+                    async for line in response.aiter_lines():
+                        if line.startswith("data: "):
+                            line = line[6:]
+                        if line.strip() and line.strip() != "[DONE]":
+                            try:
+                                data = orjson.loads(line)
+                                delta = data.get("choices", [{}])[0].get("delta", {})
+                                content = delta.get("content")
+                                if content:
+                                    yield content
+                            except Exception as e:
+                                logger.error(f"OpenAI parse error: {e} | line: {line}")
+                else:
+                    error_response = await response.aread()
+                    logger.error(
+                        f"OpenAI API error: {response.status_code} - {error_response}"
+                    )
+                    yield f"Error: OpenAI-compatible service returned {response.status_code}"
         except Exception as e:
             logger.error(f"OpenAI-compatible error: {e}")
             yield f"Error with OpenAI-compatible service: {str(e)}"
@@ -495,14 +570,16 @@ The results are: {results[:10]}
         
 Please explain what this query does and what the results mean."""
 
-        response_chunks = []
-        async for chunk in self.generate_streaming_response(prompt):
-            response_chunks.append(chunk)
-        return "".join(response_chunks)
+        return await self.generate_response(prompt)
 
     async def generate_sql_query(self, natural_language: str, schema: Dict) -> str:
         """Generate SQL query from natural language"""
         schema_summary = self._format_schema_summary(schema)
+        cache_key = (" ".join(natural_language.lower().split()), schema_summary)
+        cached = self.sql_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         prompt = f"""Given this database schema:
 {schema_summary}
 
@@ -510,10 +587,14 @@ Please generate a SQL query for: {natural_language}
 
 Return only the SQL query, no explanations."""
 
-        response_chunks = []
-        async for chunk in self.generate_streaming_response(prompt):
-            response_chunks.append(chunk)
-        return "".join(response_chunks)
+        query = await self.generate_response(prompt)
+
+        # Service failures come back as "Error..." text; don't keep those
+        if query and not query.startswith("Error"):
+            if len(self.sql_cache) >= self.sql_cache_size:
+                self.sql_cache.pop(next(iter(self.sql_cache)))
+            self.sql_cache[cache_key] = query
+        return query
 
     def _format_schema_summary(self, schema: Dict) -> str:
         """Format database schema for display"""
@@ -537,7 +618,7 @@ Return only the SQL query, no explanations."""
                 if not self.api_key:
                     return False
                 test_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-pro?key={self.api_key}"
-                response = httpx.get(test_url, timeout=5.0)
+                response = _get_sync_client().get(test_url)
                 return response.status_code == 200
             else:
                 # For Qwen and OpenAI-compatible APIs
@@ -554,7 +635,7 @@ Return only the SQL query, no explanations."""
 
                 for test_url in test_urls:
                     try:
-                        response = httpx.get(test_url, headers=headers, timeout=5.0)
+                        response = _get_sync_client().get(test_url, headers=headers)
                         if response.status_code in [
                             200,
                             404,
@@ -608,24 +689,24 @@ Return only the SQL query, no explanations."""
                         "stream": False,  # Non-streaming for test
                     }
 
-                    async with httpx.AsyncClient(timeout=10.0) as client:
-                        response = await client.post(
-                            endpoint, json=test_payload, headers=headers
+                    client = await _get_client()
+                    response = await client.post(
+                        endpoint, json=test_payload, headers=headers, timeout=10.0
+                    )
+                    endpoint_result["status"] = response.status_code
+
+                    if response.status_code == 200:
+                        result["connection_ok"] = True
+                        result["successful_endpoint"] = endpoint
+                        endpoint_result["response"] = "Success"
+                        break
+                    elif response.status_code == 405:
+                        endpoint_result["error"] = "Method not allowed"
+                    else:
+                        error_text = response.text[:200]
+                        endpoint_result["error"] = (
+                            f"HTTP {response.status_code}: {error_text}"
                         )
-                        endpoint_result["status"] = response.status_code
-
-                        if response.status_code == 200:
-                            result["connection_ok"] = True
-                            result["successful_endpoint"] = endpoint
-                            endpoint_result["response"] = "Success"
-                            break
-                        elif response.status_code == 405:
-                            endpoint_result["error"] = "Method not allowed"
-                        else:
-                            error_text = response.text[:200]
-                            endpoint_result["error"] = (
-                                f"HTTP {response.status_code}: {error_text}"
-                            )
 
                 except Exception as e:
                     endpoint_result["error"] = str(e)
@@ -700,19 +781,19 @@ Return only the SQL query, no explanations."""
                     for k, v in headers.items()
                 }
 
-                async with httpx.AsyncClient(timeout=15.0) as client:
-                    response = await client.post(
-                        endpoint, json=payload, headers=headers
-                    )
-                    attempt["status_code"] = response.status_code
+                client = await _get_client()
+                response = await client.post(
+                    endpoint, json=payload, headers=headers, timeout=15.0
+                )
+                attempt["status_code"] = response.status_code
 
-                    if response.status_code == 200:
-                        response_json = response.json()
-                        attempt["response"] = "SUCCESS: " + str(response_json)[:200]
-                        debug_info["attempts"].append(attempt)
-                        break
-                    else:
-                        attempt["response"] = response.text[:300]
+                if response.status_code == 200:
+                    response_json = response.json()
+                    attempt["response"] = "SUCCESS: " + str(response_json)[:200]
+                    debug_info["attempts"].append(attempt)
+                    break
+                else:
+                    attempt["response"] = response.text[:300]
 
             except Exception as e:
                 attempt["error"] = str(e)
@@ -0,0 +1,36 @@
+"""
+Intent Router
+
+Rule-based routing for file questions that can be answered straight from
+the file data (a specific row, the column list, the row count) without an
+LLM call. Rules are tried in priority order; anything unmatched is DYNAMIC
+and goes to the LLM.
+"""
+
+import re
+from typing import Optional, Tuple
+
+STATIC = "STATIC"
+DYNAMIC = "DYNAMIC"
+
+ROW_COUNT = re.compile(r"\bhow\s+many\s+(?:rows?|records?|entries)\b", re.I)
+ROW_N = re.compile(
+    r"\b(\d+)(?:st|nd|rd|th)?\s+row\b|\brow\s+(?:number\s+|#)?(\d+)\b", re.I
+)
+COLUMNS = re.compile(r"\b(?:columns?|fields?|headers?)\b", re.I)
+
+# (pattern, handler name), highest priority first
+_RULES = (
+    (ROW_COUNT, "count"),
+    (ROW_N, "row"),
+    (COLUMNS, "column"),
+)
+
+
+def route(question: str) -> Tuple[str, Optional[str], Optional[tuple]]:
+    """Return (STATIC, handler, groups) for the first matching rule, else (DYNAMIC, None, None)"""
+    for pattern, handler in _RULES:
+        match = pattern.search(question)
+        if match:
+            return STATIC, handler, match.groups()
+    return DYNAMIC, None, None
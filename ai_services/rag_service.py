@@ -9,29 +9,52 @@ This service provides a complete RAG implementation with:
 """
 
 import logging
-import json
 import re
+import orjson
+from collections import Counter
 from typing import Dict, List, Optional, Any
 import numpy as np
 import pandas as pd
+import openpyxl
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from dataclasses import dataclass
-from datetime import datetime
 import hashlib
+import threading
+import faiss
 from .chroma_service import ChromaService
+from .chunk_extractors import split_text_spans, trim_json_sample
 
 logger = logging.getLogger("ai_services")
 
+_WORD_RE = re.compile(r"\w+")
+
 
-@dataclass
 class DocumentChunk:
-    """Represents a chunk of document with metadata"""
+    """
+    Represents a chunk of document with metadata
 
-    content: str
-    metadata: Dict[str, Any]
-    embedding: Optional[List[float]] = None
-    chunk_id: Optional[str] = None
-    source_file: Optional[str] = None
-    chunk_index: Optional[int] = None
+    The chunk's embedding is not stored on the object; it lives at index
+    ``row`` of its session's embedding matrix in RAGService.
+    """
+
+    __slots__ = ("content", "metadata", "row", "chunk_id", "source_file", "chunk_index")
+
+    def __init__(
+        self,
+        content: str,
+        metadata: Dict[str, Any],
+        row: Optional[int] = None,
+        chunk_id: Optional[str] = None,
+        source_file: Optional[str] = None,
+        chunk_index: Optional[int] = None,
+    ):
+        self.content = content
+        self.metadata = metadata
+        self.row = row
+        self.chunk_id = chunk_id
+        self.source_file = source_file
+        self.chunk_index = chunk_index
 
 
 @dataclass
@@ -68,6 +91,43 @@ class RAGService:
             # Initialize ChromaDB service
             self.chroma_service = ChromaService()
 
+            # Per-session FAISS indexes over normalized embeddings, built lazily
+            # from ChromaDB. Row i of an index is the chunk id at self._ids[session][i]
+            # and row i of the session's float16 embedding matrix
+            self._faiss_indexes: Dict[str, faiss.Index] = {}
+            self._ids: Dict[str, List[str]] = {}
+            self._emb_matrices: Dict[str, np.ndarray] = {}
+            self.document_chunks: Dict[str, DocumentChunk] = {}
+            self.ivf_threshold = 50_000  # Use IndexIVFFlat above this many vectors
+            self.ivf_nprobe = 16  # Inverted lists scanned per IVF query
+            self.ivfpq_threshold = 1_000_000  # Compress with IndexIVFPQ above this
+            self.ivfpq_nlist = 4096  # Inverted lists for IVF-PQ
+            self.ivfpq_m = 32  # PQ sub-quantizers (bytes per stored vector)
+            self.ivfpq_train_size = 100_000  # Vectors sampled to train IVF-PQ
+
+            # 1-bit-per-dimension copies of each session's vectors, used to
+            # pre-rank large flat (fp16) indexes by Hamming distance. Built on
+            # the first search above binary_threshold, then kept up to date
+            self._binary_indexes: Dict[str, faiss.IndexBinaryFlat] = {}
+            self.binary_threshold = 10_000  # Pre-rank by Hamming above this size
+            self.rerank_candidates = 100  # Binary candidates re-scored exactly
+
+            # Read-only GPU mirrors of large session indexes, when a GPU is
+            # present. Inserts stay on the CPU index; a stale mirror is dropped
+            # and copied again on the next search
+            self._gpu_resources = (
+                faiss.StandardGpuResources() if faiss.get_num_gpus() > 0 else None
+            )
+            self._gpu_indexes: Dict[str, faiss.Index] = {}
+            self.gpu_threshold = 50_000  # Search on GPU above this many vectors
+            self.gpu_max_k = 2048  # Largest k GPU indexes support
+
+            self._index_lock = threading.Lock()
+
+            # Results of files already ingested per session, keyed by
+            # (file_name, content hash), so re-uploads skip extract/chunk/embed
+            self._ingested: Dict[str, Dict[tuple, Dict]] = {}
+
             RAGService._initialized = True
 
     def _initialize_embedding_model(self):
@@ -102,6 +162,12 @@ class RAGService:
             Processing results with chunks and metadata
         """
         try:
+            key = (file_name, self._file_hash(file_path))
+            cached = self._ingested.get(session_id, {}).get(key)
+            if cached is not None:
+                logger.info(f"Skipping unchanged file already ingested: {file_name}")
+                return cached
+
             logger.info(f"Processing file for RAG: {file_name} ({file_type})")
 
             # Use ChromaDB service to process file
@@ -109,16 +175,94 @@ class RAGService:
                 session_id, file_path, file_type, file_name, file_id
             )
 
+            if result.get("success"):
+                self._add_to_index(
+                    session_id,
+                    result["ids"],
+                    result["embeddings"],
+                    [chunk["content"] for chunk in result["chunks"]],
+                    result["metadatas"],
+                )
+                self._remember_ingested(session_id, key, result)
+
             return result
 
         except Exception as e:
             logger.error(f"Error processing file for RAG: {e}")
             return {"success": False, "error": str(e), "chunks": []}
 
+    def ingest_files(self, session_id: str, specs: List[Dict]) -> List[Dict]:
+        """
+        Process several files for RAG in one batch
+
+        Args:
+            session_id: Chat session ID
+            specs: One dict per file with file_path, file_type, file_name, file_id
+
+        Returns:
+            Processing results in the same order as specs
+        """
+        results: List[Optional[Dict]] = [None] * len(specs)
+        keys = []
+        pending = []
+        ingested = self._ingested.get(session_id, {})
+
+        for i, spec in enumerate(specs):
+            try:
+                key = (spec["file_name"], self._file_hash(spec["file_path"]))
+            except OSError as e:
+                results[i] = {"success": False, "error": str(e), "chunks": []}
+                continue
+
+            if key in ingested:
+                logger.info(
+                    f"Skipping unchanged file already ingested: {spec['file_name']}"
+                )
+                results[i] = ingested[key]
+            else:
+                keys.append(key)
+                pending.append(i)
+
+        if pending:
+            processed = self.chroma_service.ingest_files(
+                session_id, [specs[i] for i in pending]
+            )
+
+            for i, key, result in zip(pending, keys, processed):
+                if result.get("success"):
+                    self._add_to_index(
+                        session_id,
+                        result["ids"],
+                        result["embeddings"],
+                        [chunk["content"] for chunk in result["chunks"]],
+                        result["metadatas"],
+                    )
+                    self._remember_ingested(session_id, key, result)
+                results[i] = result
+
+        return results
+
+    def _file_hash(self, file_path: str) -> str:
+        """Hash raw file bytes in 1 MB blocks so large files are never fully read"""
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _remember_ingested(self, session_id: str, key: tuple, result: Dict):
+        """Keep a result without its embeddings to answer repeat ingests"""
+        self._ingested.setdefault(session_id, {})[key] = {
+            k: v for k, v in result.items() if k != "embeddings"
+        }
+
     def _extract_csv_content(self, file_path: str, file_name: str) -> List[Dict]:
         """Extract content from CSV file"""
         try:
-            df = pd.read_csv(file_path)
+            # Only the sample rows are parsed into a DataFrame; the row count
+            # comes from a streaming pass so large files are never fully loaded
+            df = pd.read_csv(file_path, nrows=10)
+            total_rows = self._count_csv_rows(file_path)
 
             content_chunks = []
 
@@ -130,20 +274,19 @@ class RAGService:
                     "file_name": file_name,
                     "file_type": "csv",
                     "total_columns": len(df.columns),
-                    "total_rows": len(df),
+                    "total_rows": total_rows,
                 },
             }
             content_chunks.append(columns_info)
 
             # Add sample data
-            sample_data = df.head(10).to_dict("records")
             sample_info = {
                 "type": "sample_data",
-                "content": f"Sample data from {file_name}:\n{json.dumps(sample_data, indent=2)}",
+                "content": f"Sample data from {file_name}:\n{self._records_json(df)}",
                 "metadata": {
                     "file_name": file_name,
                     "file_type": "csv",
-                    "sample_size": len(sample_data),
+                    "sample_size": len(df),
                 },
             }
             content_chunks.append(sample_info)
@@ -151,11 +294,11 @@ class RAGService:
             # Add data summary
             summary_info = {
                 "type": "summary",
-                "content": f"Data summary for {file_name}: {len(df)} rows, {len(df.columns)} columns",
+                "content": f"Data summary for {file_name}: {total_rows} rows, {len(df.columns)} columns",
                 "metadata": {
                     "file_name": file_name,
                     "file_type": "csv",
-                    "total_rows": len(df),
+                    "total_rows": total_rows,
                     "total_columns": len(df.columns),
                 },
             }
@@ -167,25 +310,61 @@ class RAGService:
             logger.error(f"Error extracting CSV content: {e}")
             return []
 
+    def _records_json(self, df: pd.DataFrame) -> str:
+        """Serialize sample rows as indented JSON records straight from Arrow"""
+        records = pa.Table.from_pandas(df, preserve_index=False).to_pylist()
+        return orjson.dumps(records, default=str, option=orjson.OPT_INDENT_2).decode()
+
+    def _count_csv_rows(self, file_path: str) -> int:
+        """Count CSV data rows by streaming record batches"""
+        reader = pa_csv.open_csv(file_path)
+        total_rows = 0
+        while True:
+            try:
+                total_rows += reader.read_next_batch().num_rows
+            except StopIteration:
+                return total_rows
+
+    def _count_excel_rows(self, file_path: str) -> Dict[str, int]:
+        """Count data rows per sheet without parsing cell values into DataFrames"""
+        try:
+            workbook = openpyxl.load_workbook(file_path, read_only=True)
+        except Exception:
+            # Legacy .xls workbooks are not readable by openpyxl
+            sheets = pd.read_excel(file_path, sheet_name=None)
+            return {name: len(df) for name, df in sheets.items()}
+
+        try:
+            row_counts = {}
+            for sheet in workbook.worksheets:
+                max_row = sheet.max_row
+                if max_row is None:
+                    # Dimensions not recorded in the file; stream the rows
+                    max_row = sum(1 for _ in sheet.iter_rows(values_only=True))
+                row_counts[sheet.title] = max(max_row - 1, 0)  # Minus header row
+            return row_counts
+        finally:
+            workbook.close()
+
     def _extract_excel_content(self, file_path: str, file_name: str) -> List[Dict]:
         """Extract content from Excel file"""
         try:
-            excel_file = pd.ExcelFile(file_path)
+            row_counts = self._count_excel_rows(file_path)
 
             content_chunks = []
 
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
+            for sheet_name, total_rows in row_counts.items():
+                df = pd.read_excel(file_path, sheet_name=sheet_name, nrows=5)
 
                 # Add sheet information
                 sheet_info = {
                     "type": "sheet_info",
-                    "content": f"Sheet '{sheet_name}' in {file_name}: {len(df)} rows, {len(df.columns)} columns",
+                    "content": f"Sheet '{sheet_name}' in {file_name}: {total_rows} rows, {len(df.columns)} columns",
                     "metadata": {
                         "file_name": file_name,
                         "file_type": "excel",
                         "sheet_name": sheet_name,
-                        "total_rows": len(df),
+                        "total_rows": total_rows,
                         "total_columns": len(df.columns),
                     },
                 }
@@ -193,15 +372,14 @@ class RAGService:
 
                 # Add sample data for this sheet
                 if len(df) > 0:
-                    sample_data = df.head(5).to_dict("records")
                     sample_info = {
                         "type": "sample_data",
-                        "content": f"Sample data from sheet '{sheet_name}' in {file_name}:\n{json.dumps(sample_data, indent=2)}",
+                        "content": f"Sample data from sheet '{sheet_name}' in {file_name}:\n{self._records_json(df)}",
                         "metadata": {
                             "file_name": file_name,
                             "file_type": "excel",
                             "sheet_name": sheet_name,
-                            "sample_size": len(sample_data),
+                            "sample_size": len(df),
                         },
                     }
                     content_chunks.append(sample_info)
@@ -244,8 +422,8 @@ class RAGService:
     def _extract_json_content(self, file_path: str, file_name: str) -> List[Dict]:
         """Extract content from JSON file"""
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            with open(file_path, "rb") as f:
+                data = orjson.loads(f.read())
 
             content_chunks = []
 
@@ -262,9 +440,12 @@ class RAGService:
             content_chunks.append(structure_info)
 
             # Add sample data
+            sample_json = orjson.dumps(
+                trim_json_sample(data), option=orjson.OPT_INDENT_2
+            ).decode()
             sample_info = {
                 "type": "sample_data",
-                "content": f"Sample data from {file_name}:\n{json.dumps(data, indent=2)[:2000]}...",
+                "content": f"Sample data from {file_name}:\n{sample_json[:2000]}...",
                 "metadata": {
                     "file_name": file_name,
                     "file_type": "json",
@@ -298,29 +479,12 @@ class RAGService:
 
     def _split_text_into_chunks(self, text: str) -> List[str]:
         """Split text into overlapping chunks"""
-        chunks = []
-        start = 0
-
-        while start < len(text):
-            end = start + self.chunk_size
-            chunk = text[start:end]
-
-            # Try to break at sentence boundary
-            if end < len(text):
-                last_period = chunk.rfind(".")
-                last_newline = chunk.rfind("\n")
-                break_point = max(last_period, last_newline)
-
-                if (
-                    break_point > start + self.chunk_size * 0.5
-                ):  # At least 50% of chunk size
-                    chunk = text[start : start + break_point + 1]
-                    end = start + break_point + 1
-
-            chunks.append(chunk.strip())
-            start = end - self.chunk_overlap
-
-        return chunks
+        return [
+            text[start:end].strip()
+            for start, end in split_text_spans(
+                text, self.chunk_size, self.chunk_overlap
+            )
+        ]
 
     def _create_document_chunks(
         self, content_chunks: List[Dict], file_name: str, file_type: str
@@ -329,7 +493,7 @@ class RAGService:
         document_chunks = []
 
         for i, content_chunk in enumerate(content_chunks):
-            chunk_id = self._generate_chunk_id(file_name, i)
+            chunk_id = self._generate_chunk_id(file_name, i, content_chunk["content"])
 
             chunk = DocumentChunk(
                 content=content_chunk["content"],
@@ -349,48 +513,223 @@ class RAGService:
 
         return document_chunks
 
-    def _generate_chunk_id(self, file_name: str, chunk_index: int) -> str:
-        """Generate unique chunk ID"""
-        content = f"{file_name}_{chunk_index}_{datetime.now().isoformat()}"
-        return hashlib.md5(content.encode()).hexdigest()[:12]
+    def _generate_chunk_id(self, file_name: str, chunk_index: int, content: str) -> str:
+        """Generate a reproducible chunk ID from its file, position and content"""
+        key = f"{file_name}_{chunk_index}_{content[:64]}"
+        return hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
 
-    def _generate_embeddings(
-        self, document_chunks: List[DocumentChunk]
-    ) -> List[DocumentChunk]:
-        """Generate embeddings for document chunks"""
-        for chunk in document_chunks:
-            # Simplified embedding generation (in production, use proper embedding model)
-            chunk.embedding = self._simple_embedding(chunk.content)
+    def _generate_embeddings(self, document_chunks: List[DocumentChunk]) -> np.ndarray:
+        """Generate a unit-normalized (N, d) embedding matrix for document chunks"""
+        texts = [chunk.content for chunk in document_chunks]
 
-        return document_chunks
+        # One batched encoder call for all chunks instead of one per chunk
+        embeddings = self.chroma_service.generate_embeddings(texts)
+        if not embeddings:
+            # Simplified fallback when the embedding model is unavailable
+            embeddings = [self._simple_embedding(text) for text in texts]
 
-    def _simple_embedding(self, text: str) -> List[float]:
+        # Normalize once here so similarity is a plain dot product
+        return self._normalize(embeddings)
+
+    def _simple_embedding(self, text: str) -> np.ndarray:
         """Simple embedding generation using TF-IDF-like approach"""
         # This is a simplified implementation
         # In production, use sentence-transformers or similar
-        words = re.findall(r"\w+", text.lower())
-        word_freq = {}
-
-        for word in words:
-            word_freq[word] = word_freq.get(word, 0) + 1
+        # Lowercase per word rather than copying the whole text first
+        word_freq = Counter(match.group().lower() for match in _WORD_RE.finditer(text))
 
         # Create a simple vector representation
         # In production, this would be a proper embedding
-        vector = [len(word_freq), len(words), len(text)]
+        return np.array(
+            [len(word_freq), sum(word_freq.values()), len(text)], dtype=np.float32
+        )
+
+    def _normalize(self, embeddings) -> np.ndarray:
+        """Stack embeddings into a float32 matrix with unit-length rows"""
+        vectors = np.array(embeddings, dtype=np.float32, ndmin=2)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _binarize(self, vectors: np.ndarray) -> np.ndarray:
+        """Pack the sign bits of each vector into bytes for Hamming search"""
+        return np.packbits(vectors > 0, axis=1)
+
+    def _get_binary_index(self, session_id: str) -> Optional[faiss.IndexBinaryFlat]:
+        """
+        The session's binary index, built from its embedding matrix on first use
 
-        # Normalize
-        norm = np.linalg.norm(vector)
-        if norm > 0:
-            vector = [v / norm for v in vector]
+        None when the dimension is not a multiple of 8, which IndexBinaryFlat
+        requires; such sessions search the float index directly.
+        """
+        binary_index = self._binary_indexes.get(session_id)
+        if binary_index is None:
+            vectors = self._session_matrix(session_id)
+            if vectors.shape[1] % 8:
+                return None
+            binary_index = faiss.IndexBinaryFlat(vectors.shape[1])
+            binary_index.add(self._binarize(vectors))
+            self._binary_indexes[session_id] = binary_index
+        return binary_index
+
+    def _build_index(self, vectors: np.ndarray) -> faiss.Index:
+        """Build a flat fp16 index, or an IVF/IVF-PQ index for large sessions"""
+        n_vectors, dimension = vectors.shape
+
+        if n_vectors > self.ivfpq_threshold:
+            # Product-quantized codes keep very large sessions in RAM
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFPQ(
+                quantizer,
+                dimension,
+                self.ivfpq_nlist,
+                self.ivfpq_m,
+                8,
+                faiss.METRIC_INNER_PRODUCT,
+            )
+            sample = np.random.default_rng().choice(
+                n_vectors, self.ivfpq_train_size, replace=False
+            )
+            index.train(vectors[sample])
+            index.nprobe = self.ivf_nprobe
+        elif n_vectors > self.ivf_threshold:
+            nlist = int(np.sqrt(n_vectors))
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFFlat(
+                quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT
+            )
+            index.train(vectors)
+            index.nprobe = self.ivf_nprobe
+        else:
+            # Exhaustive search over fp16-encoded vectors; FAISS up-casts
+            # inside its SIMD distance kernels
+            index = faiss.IndexScalarQuantizer(
+                dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT
+            )
+
+        index.add(vectors)
+        return index
 
-        return vector
+    def _session_matrix(self, session_id: str) -> np.ndarray:
+        """View of the filled (float16) rows of a session's embedding matrix"""
+        return self._emb_matrices[session_id][: len(self._ids[session_id])]
 
-    def _store_chunks(self, chunks: List[DocumentChunk], file_name: str):
-        """Store chunks in memory (in production, use vector database)"""
-        self.file_embeddings[file_name] = chunks
+    def _store_chunks(
+        self,
+        session_id: str,
+        ids: List[str],
+        vectors: np.ndarray,
+        documents: List[str],
+        metadatas: List[Dict],
+    ):
+        """Append chunks and their embeddings to the session's row store"""
+        session_ids = self._ids.setdefault(session_id, [])
+        first_row = len(session_ids)
+        needed = first_row + len(vectors)
+
+        # Grow the matrix geometrically so appends stay amortized O(1). Rows
+        # are stored as float16 and only up-cast to float32 for scoring
+        matrix = self._emb_matrices.get(session_id)
+        if matrix is None or needed > len(matrix):
+            capacity = needed if matrix is None else max(needed, 2 * len(matrix))
+            grown = np.empty((capacity, vectors.shape[1]), dtype=np.float16)
+            if matrix is not None:
+                grown[:first_row] = matrix[:first_row]
+            matrix = self._emb_matrices[session_id] = grown
+        matrix[first_row:needed] = vectors
+
+        for offset, (chunk_id, document, metadata) in enumerate(
+            zip(ids, documents, metadatas)
+        ):
+            self.document_chunks[chunk_id] = DocumentChunk(
+                content=document,
+                metadata=metadata,
+                row=first_row + offset,
+                chunk_id=chunk_id,
+                source_file=metadata.get("file_name"),
+                chunk_index=metadata.get("chunk_index"),
+            )
+        session_ids.extend(ids)
 
-        for chunk in chunks:
-            self.document_chunks[chunk.chunk_id] = chunk
+    def _add_to_index(
+        self,
+        session_id: str,
+        ids: List[str],
+        embeddings,
+        documents: List[str],
+        metadatas: List[Dict],
+    ):
+        """Append newly stored chunks to a session's index if it is loaded"""
+        with self._index_lock:
+            index = self._faiss_indexes.get(session_id)
+            if index is None:
+                # Not loaded yet; the next search builds it from ChromaDB
+                return
+
+            vectors = self._normalize(embeddings)
+            self._store_chunks(session_id, ids, vectors, documents, metadatas)
+            self._gpu_indexes.pop(session_id, None)
+            binary_index = self._binary_indexes.get(session_id)
+            if binary_index is not None:
+                binary_index.add(self._binarize(vectors))
+
+            total = index.ntotal + len(vectors)
+            flat = isinstance(index, faiss.IndexScalarQuantizer)
+            if (flat and total > self.ivf_threshold) or (
+                not isinstance(index, faiss.IndexIVFPQ) and total > self.ivfpq_threshold
+            ):
+                # Crossed into a larger index tier; rebuild from the matrix
+                self._faiss_indexes[session_id] = self._build_index(
+                    self._session_matrix(session_id).astype(np.float32)
+                )
+            else:
+                index.add(vectors)
+
+    def _get_session_index(self, session_id: str) -> Optional[faiss.Index]:
+        """Return the session's index, loading it from ChromaDB on first use"""
+        index = self._faiss_indexes.get(session_id)
+        if index is not None:
+            return index
+
+        data = self.chroma_service.get_session_vectors(session_id)
+        if not data["ids"]:
+            return None
+
+        vectors = self._normalize(data["embeddings"])
+        index = self._build_index(vectors)
+        self._binary_indexes.pop(session_id, None)
+        self._ids[session_id] = []
+        self._emb_matrices.pop(session_id, None)
+        self._store_chunks(
+            session_id, data["ids"], vectors, data["documents"], data["metadatas"]
+        )
+        self._faiss_indexes[session_id] = index
+
+        logger.info(
+            f"Built {type(index).__name__} with {index.ntotal} vectors for session {session_id}"
+        )
+        return index
+
+    def _drop_session_index(self, session_id: str):
+        """Forget a session's index so it is rebuilt from ChromaDB on next search"""
+        with self._index_lock:
+            self._faiss_indexes.pop(session_id, None)
+            self._binary_indexes.pop(session_id, None)
+            self._emb_matrices.pop(session_id, None)
+            self._gpu_indexes.pop(session_id, None)
+            for chunk_id in self._ids.pop(session_id, []):
+                self.document_chunks.pop(chunk_id, None)
+
+    def _make_search_result(self, chunk: DocumentChunk, score: float) -> SearchResult:
+        """Wrap a chunk and its relevance score as a SearchResult"""
+        return SearchResult(
+            chunk=chunk,
+            score=score,
+            source_file=chunk.source_file,
+            context=chunk.content[:500] + "..."
+            if len(chunk.content) > 500
+            else chunk.content,
+        )
 
     def search_relevant_chunks(
         self,
@@ -414,7 +753,14 @@ class RAGService:
         try:
             logger.info(f"Searching for query: '{query}' in session {session_id}")
 
-            # Use ChromaDB service to search with file filtering
+            with self._index_lock:
+                index = self._get_session_index(session_id)
+                if index is not None:
+                    return self._search_index(
+                        session_id, index, query, file_names, n_results
+                    )
+
+            # Nothing indexed for this session yet - fall back to ChromaDB
             search_results = self.chroma_service.search_similar_chunks(
                 session_id, query, n_results, file_filter=file_names
             )
@@ -428,16 +774,9 @@ class RAGService:
                     chunk_id=result["chunk_id"],
                     source_file=result["source_file"],
                 )
-
-                search_result = SearchResult(
-                    chunk=chunk,
-                    score=result["similarity_score"],
-                    source_file=result["source_file"],
-                    context=result["content"][:500] + "..."
-                    if len(result["content"]) > 500
-                    else result["content"],
+                formatted_results.append(
+                    self._make_search_result(chunk, result["similarity_score"])
                 )
-                formatted_results.append(search_result)
 
             return formatted_results
 
@@ -445,29 +784,140 @@ class RAGService:
             logger.error(f"Error searching chunks: {e}")
             return []
 
-    def _calculate_similarity(
-        self, embedding1: List[float], embedding2: List[float]
-    ) -> float:
-        """Calculate cosine similarity between embeddings"""
-        try:
-            # Ensure embeddings have same length
-            max_len = max(len(embedding1), len(embedding2))
-            emb1 = embedding1 + [0] * (max_len - len(embedding1))
-            emb2 = embedding2 + [0] * (max_len - len(embedding2))
+    def _search_index(
+        self,
+        session_id: str,
+        index: faiss.Index,
+        query: str,
+        file_names: Optional[List[str]],
+        n_results: int,
+    ) -> List[SearchResult]:
+        """Search a session index and map result rows back to chunks"""
+        query_embedding = self.chroma_service.generate_embeddings([query])
+        if not query_embedding:
+            return []
+
+        query_vector = self._normalize(query_embedding)
+
+        # When filtering by file, rank a bounded candidate set and filter
+        # afterwards; it is widened below only if small files were crowded
+        # out of it by larger ones
+        k = min(n_results, index.ntotal)
+        if file_names:
+            k = min(index.ntotal, max(n_results * 8, self.gpu_max_k))
+        gpu_index = self._get_gpu_index(session_id, index)
+        binary_index = None
+        if (
+            gpu_index is None
+            and isinstance(index, faiss.IndexScalarQuantizer)
+            and index.ntotal > self.binary_threshold
+        ):
+            binary_index = self._get_binary_index(session_id)
+
+        ids = self._ids[session_id]
+        while True:
+            if gpu_index is not None and k <= self.gpu_max_k:
+                scores, rows = gpu_index.search(query_vector, k)
+                scores, rows = scores[0], rows[0]
+            elif binary_index is not None:
+                scores, rows = self._binary_search(
+                    session_id, binary_index, query_vector, file_names
+                )
+            else:
+                scores, rows = index.search(query_vector, k)
+                scores, rows = scores[0], rows[0]
+
+            results = []
+            for score, row in zip(scores, rows):
+                if row < 0:
+                    continue
+
+                chunk = self.document_chunks[ids[row]]
+                if file_names and chunk.source_file not in file_names:
+                    continue
+
+                results.append(self._make_search_result(chunk, float(score)))
+                if len(results) >= n_results:
+                    break
+
+            # The binary pre-rank already filters by file over every vector
+            if (
+                binary_index is not None
+                or len(results) >= n_results
+                or k >= index.ntotal
+            ):
+                break
+            k = min(index.ntotal, k * 4)
+
+        logger.info(
+            f"Found {len(results)} similar chunks for query: {query} in files: {file_names}"
+        )
+        return results
+
+    def _get_gpu_index(
+        self, session_id: str, index: faiss.Index
+    ) -> Optional[faiss.Index]:
+        """GPU mirror of a large session index, or None to search on CPU"""
+        if self._gpu_resources is None or index.ntotal <= self.gpu_threshold:
+            return None
+
+        gpu_index = self._gpu_indexes.get(session_id)
+        if gpu_index is None:
+            try:
+                gpu_index = faiss.index_cpu_to_gpu(self._gpu_resources, 0, index)
+            except Exception as e:
+                logger.warning(f"Could not mirror index to GPU, using CPU: {e}")
+                return None
+            self._gpu_indexes[session_id] = gpu_index
+
+        return gpu_index
+
+    def _binary_search(
+        self,
+        session_id: str,
+        binary_index: faiss.IndexBinaryFlat,
+        query_vector: np.ndarray,
+        file_names: Optional[List[str]],
+    ):
+        """Pre-rank by Hamming distance, then re-score candidates with float vectors"""
+        k = (
+            binary_index.ntotal
+            if file_names
+            else min(self.rerank_candidates, binary_index.ntotal)
+        )
+        _, rows = binary_index.search(self._binarize(query_vector), k)
+        rows = rows[0][rows[0] >= 0]
+
+        if file_names:
+            ids = self._ids[session_id]
+            rows = np.array(
+                [
+                    row
+                    for row in rows
+                    if self.document_chunks[ids[row]].source_file in file_names
+                ][: self.rerank_candidates],
+                dtype=np.int64,
+            )
 
-            # Calculate cosine similarity
-            dot_product = sum(a * b for a, b in zip(emb1, emb2))
-            norm1 = np.linalg.norm(emb1)
-            norm2 = np.linalg.norm(emb2)
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.float32), rows
 
-            if norm1 == 0 or norm2 == 0:
-                return 0.0
+        candidates = self._session_matrix(session_id)[rows].astype(np.float32)
+        scores = self._score_batch(query_vector[0], candidates)
+        order = np.argsort(-scores)
+        return scores[order], rows[order]
 
-            return dot_product / (norm1 * norm2)
+    def _calculate_similarity(
+        self, embedding1: np.ndarray, embedding2: np.ndarray
+    ) -> float:
+        """Calculate cosine similarity between pre-normalized embeddings"""
+        return float(np.dot(embedding1, embedding2))
 
-        except Exception as e:
-            logger.error(f"Error calculating similarity: {e}")
-            return 0.0
+    def _score_batch(
+        self, query_embedding: np.ndarray, matrix: np.ndarray
+    ) -> np.ndarray:
+        """Score a query against a stacked (N, d) matrix of normalized embeddings"""
+        return matrix @ query_embedding
 
     def get_context_for_question(
         self, session_id: str, question: str, file_names: List[str]
@@ -578,6 +1028,10 @@ class RAGService:
         try:
             success = self.chroma_service.delete_file_chunks(session_id, file_name)
             if success:
+                self._drop_session_index(session_id)
+                ingested = self._ingested.get(session_id, {})
+                for key in [key for key in ingested if key[0] == file_name]:
+                    del ingested[key]
                 logger.info(
                     f"Cleared chunks for file: {file_name} in session {session_id}"
                 )
@@ -0,0 +1,442 @@
+import asyncio
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import faiss
+import numpy as np
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+
+from . import intent_router
+from .chroma_service import ChromaService
+from .chunk_extractors import ChunkExtractor, extract_files
+from .database_service import DatabaseService
+from .embedding_cache import EmbeddingCache
+from .file_analyzer import FileAnalyzer
+from .file_service import FileService
+from .foundry_service import FoundryService, _get_client
+from .rag_service import DocumentChunk, RAGService
+
+
+def write_file(directory: Path, name: str, content: str) -> str:
+    path = directory / name
+    path.write_text(content)
+    return str(path)
+
+
+class IngestFilesTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+        # Skip ChromaDB, the embedding model and the on-disk cache
+        for name in (
+            "_initialize_chroma",
+            "_initialize_embedding_model",
+            "_initialize_embedding_cache",
+        ):
+            patcher = mock.patch.object(ChromaService, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.service = ChromaService()
+        self.service.generate_embeddings = mock.Mock(
+            side_effect=lambda texts: [[1.0, 0.0]] * len(texts)
+        )
+        self.collection = mock.Mock()
+        self.service.get_or_create_collection = mock.Mock(return_value=self.collection)
+
+    def spec(self, name: str, content: str, file_type: str, file_id: int) -> dict:
+        return {
+            "file_path": write_file(self.tmp, name, content),
+            "file_type": file_type,
+            "file_name": name,
+            "file_id": str(file_id),
+        }
+
+    def test_single_file(self):
+        specs = [self.spec("devices.csv", "device,status\nr1,up\nr2,down\n", "csv", 1)]
+
+        results = self.service.ingest_files("s1", specs)
+
+        self.assertEqual(len(results), 1)
+        self.assertTrue(results[0]["success"], results[0].get("error"))
+        self.assertGreater(results[0]["chunks_created"], 0)
+        self.assertEqual(
+            {m["file_name"] for m in results[0]["metadatas"]}, {"devices.csv"}
+        )
+        self.service.generate_embeddings.assert_called_once()
+
+    def test_several_files_embed_once_and_keep_order(self):
+        specs = [
+            self.spec("devices.csv", "device,status\nr1,up\nr2,down\n", "csv", 1),
+            self.spec("notes.txt", "Router r2 is down. Check the uplink.", "txt", 2),
+            self.spec("data.bin", "ignored", "bin", 3),
+        ]
+
+        results = self.service.ingest_files("s1", specs)
+
+        self.assertEqual(len(results), 3)
+        self.assertTrue(results[0]["success"], results[0].get("error"))
+        self.assertTrue(results[1]["success"], results[1].get("error"))
+        self.assertEqual(results[0]["file_name"], "devices.csv")
+        self.assertEqual(results[1]["file_name"], "notes.txt")
+        self.assertFalse(results[2]["success"])
+        self.assertIn("Unsupported file type", results[2]["error"])
+
+        # One encoder call covers every extracted chunk
+        self.service.generate_embeddings.assert_called_once()
+        (texts,), _ = self.service.generate_embeddings.call_args
+        self.assertEqual(
+            len(texts), results[0]["chunks_created"] + results[1]["chunks_created"]
+        )
+
+    def test_extractor_needs_no_chroma_state(self):
+        path = write_file(self.tmp, "notes.txt", "Just a line of text.")
+
+        chunks = ChunkExtractor()._extract_chunks(path, "txt", "notes.txt")
+
+        self.assertTrue(chunks)
+        self.assertIsNone(ChunkExtractor()._extract_chunks(path, "bin", "notes.txt"))
+
+    def test_small_batches_skip_the_process_pool(self):
+        specs = [
+            self.spec("a.txt", "First file.", "txt", 1),
+            self.spec("b.txt", "Second file.", "txt", 2),
+        ]
+
+        with mock.patch(
+            "ai_services.chunk_extractors._get_ingest_executor"
+        ) as get_executor:
+            extracted = extract_files(specs)
+
+        get_executor.assert_not_called()
+        self.assertEqual([len(chunks) for chunks in extracted], [1, 1])
+
+    def test_large_batches_use_the_process_pool(self):
+        specs = [
+            self.spec("a.txt", "First file.", "txt", 1),
+            self.spec("b.txt", "Second file.", "txt", 2),
+        ]
+
+        with mock.patch("ai_services.chunk_extractors.INGEST_POOL_MIN_BYTES", 1):
+            extracted = extract_files(specs)
+
+        self.assertEqual(
+            [chunks[0]["content"] for chunks in extracted],
+            ["First file.", "Second file."],
+        )
+
+
+class StreamQueryTests(SimpleTestCase):
+    def setUp(self):
+        self.service = DatabaseService()
+        self.cursor = mock.Mock()
+        connection = mock.Mock()
+        connection.cursor.return_value = self.cursor
+        patcher = mock.patch.object(
+            DatabaseService, "_live_connection", return_value=connection
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cursor_closed_when_execute_fails(self):
+        self.cursor.execute.side_effect = RuntimeError("syntax error")
+
+        result = self.service.stream_query("c1", "SELECT nope")
+
+        self.assertFalse(result["success"])
+        self.cursor.close.assert_called_once()
+
+    def test_batches_fill_stats_and_close_cursor(self):
+        self.cursor.description = [("id",), ("name",)]
+        self.cursor.fetchmany.side_effect = [
+            [(1, "a"), (2, "b")],
+            [(3, "c")],
+            [],
+        ]
+
+        result = self.service.stream_query("c1", "SELECT *", head_rows=2)
+        self.assertEqual(
+            result["head"], [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+        )
+        self.assertIsNone(result["stats"]["execution_time"])
+
+        batches = list(result["batches"])
+
+        self.assertEqual(batches[1], [{"id": 3, "name": "c"}])
+        self.assertEqual(result["stats"]["row_count"], 3)
+        self.assertIsNotNone(result["stats"]["execution_time"])
+        self.cursor.close.assert_called_once()
+
+    def test_unconsumed_batches_close_cursor_and_log(self):
+        self.cursor.description = [("id",)]
+        self.cursor.fetchmany.return_value = [(1,)]
+
+        with mock.patch.object(DatabaseService, "_log_query_execution") as log:
+            result = self.service.stream_query("c1", "SELECT id", "s1")
+            result["batches"].close()
+
+        self.cursor.close.assert_called_once()
+        self.assertTrue(log.call_args.args[5])
+
+    def test_fetch_failure_is_logged_as_failed(self):
+        self.cursor.description = [("id",)]
+        self.cursor.fetchmany.side_effect = [[(1,)], RuntimeError("lost link")]
+
+        with mock.patch.object(DatabaseService, "_log_query_execution") as log:
+            result = self.service.stream_query("c1", "SELECT id", "s1")
+            with self.assertRaises(RuntimeError):
+                list(result["batches"])
+
+        self.cursor.close.assert_called_once()
+        self.assertEqual(log.call_args.args[5:], (False, "lost link"))
+
+
+class GenerateResponseTests(SimpleTestCase):
+    def test_timeout_returns_error_message(self):
+        service = FoundryService()
+        service.response_timeout = 0.01
+
+        async def stalled(prompt, context=None):
+            yield "partial"
+            await asyncio.sleep(10)
+
+        service.generate_streaming_response = stalled
+
+        response = asyncio.run(service.generate_response("hello"))
+
+        self.assertTrue(response.startswith("Error"))
+        self.assertIn("0.01 seconds", response)
+
+
+class PooledClientTests(SimpleTestCase):
+    def test_one_client_per_loop_closed_with_the_loop(self):
+        async def fetch_twice():
+            first = await _get_client()
+            self.assertIs(await _get_client(), first)
+            self.assertFalse(first.is_closed)
+            return first
+
+        client = asyncio.run(fetch_twice())
+
+        self.assertTrue(client.is_closed)
+        self.assertIsNot(asyncio.run(fetch_twice()), client)
+
+
+class BinaryIndexTests(SimpleTestCase):
+    def bare_service(self, dimension: int) -> RAGService:
+        service = RAGService.__new__(RAGService)
+        service._binary_indexes = {}
+        service._ids = {"s1": ["a", "b", "c"]}
+        service._emb_matrices = {
+            "s1": np.random.default_rng(0)
+            .standard_normal((3, dimension))
+            .astype(np.float16)
+        }
+        return service
+
+    def test_built_once_on_first_use(self):
+        service = self.bare_service(16)
+
+        binary_index = service._get_binary_index("s1")
+
+        self.assertEqual(binary_index.ntotal, 3)
+        self.assertIs(service._get_binary_index("s1"), binary_index)
+
+    def test_skipped_when_dimension_not_multiple_of_8(self):
+        service = self.bare_service(12)
+
+        self.assertIsNone(service._get_binary_index("s1"))
+        self.assertEqual(service._binary_indexes, {})
+
+
+class SearchIndexTests(SimpleTestCase):
+    def setUp(self):
+        # 3000 vectors from big.csv close to the query, then 10 from small.csv
+        vectors = np.tile(np.float32([1.0, 0.1, 0.0, 0.0]), (3010, 1))
+        vectors[3000:] = [0.1, 1.0, 0.0, 0.0]
+        names = ["big.csv"] * 3000 + ["small.csv"] * 10
+
+        self.service = RAGService.__new__(RAGService)
+        self.service._gpu_resources = None
+        self.service.gpu_threshold = 50_000
+        self.service.gpu_max_k = 2048
+        self.service.binary_threshold = 10_000
+        self.service._ids = {"s1": [f"c{i}" for i in range(len(names))]}
+        self.service.document_chunks = {
+            f"c{i}": DocumentChunk(f"chunk {i}", {}, row=i, source_file=name)
+            for i, name in enumerate(names)
+        }
+        self.service.chroma_service = mock.Mock()
+        self.service.chroma_service.generate_embeddings.return_value = [
+            [1.0, 0.0, 0.0, 0.0]
+        ]
+
+        self.index = faiss.IndexFlatIP(4)
+        self.index.add(self.service._normalize(vectors))
+
+    def search(self, file_names):
+        with mock.patch.object(self.index, "search", wraps=self.index.search) as search:
+            results = self.service._search_index(
+                "s1", self.index, "status", file_names, 5
+            )
+        return results, [call.args[1] for call in search.call_args_list]
+
+    def test_file_filter_searches_a_bounded_k(self):
+        results, ks = self.search(["big.csv"])
+
+        self.assertEqual(ks, [2048])
+        self.assertEqual(len(results), 5)
+
+    def test_file_filter_widens_when_the_file_is_crowded_out(self):
+        results, ks = self.search(["small.csv"])
+
+        self.assertEqual(ks, [2048, 3010])
+        self.assertEqual({r.source_file for r in results}, {"small.csv"})
+        self.assertEqual(len(results), 5)
+
+    def test_unfiltered_search_asks_for_n_results(self):
+        results, ks = self.search(None)
+
+        self.assertEqual(ks, [5])
+        self.assertEqual(len(results), 5)
+
+
+class IntentRouterTests(SimpleTestCase):
+    def test_static_questions(self):
+        cases = {
+            "How many rows are there?": ("count", ()),
+            "how many records does it have": ("count", ()),
+            "show me the 45th row": ("row", ("45", None)),
+            "in file 2, what is in row 5": ("row", (None, "5")),
+            "what is row #7": ("row", (None, "7")),
+            "list the columns": ("column", ()),
+            "which fields are there": ("column", ()),
+        }
+        for question, (handler, groups) in cases.items():
+            with self.subTest(question=question):
+                self.assertEqual(
+                    intent_router.route(question),
+                    (intent_router.STATIC, handler, groups),
+                )
+
+    def test_row_count_wins_over_row_and_columns(self):
+        self.assertEqual(
+            intent_router.route("how many rows have 3 columns")[1], "count"
+        )
+
+    def test_other_questions_are_dynamic(self):
+        for question in ("summarize the data", "row count please", "throw 5 errors"):
+            with self.subTest(question=question):
+                self.assertEqual(
+                    intent_router.route(question), (intent_router.DYNAMIC, None, None)
+                )
+
+
+class EmbeddingCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.path = self.tmp / "nested" / "cache.sqlite3"
+
+    def test_round_trip_as_float16(self):
+        cache = EmbeddingCache(self.path)
+        key = EmbeddingCache.content_hash("model", "text")
+
+        cache.put_many({key: np.array([0.5, -1.25, 2.0], dtype=np.float32)})
+        found = cache.get_many([key, EmbeddingCache.content_hash("model", "other")])
+
+        self.assertEqual(list(found), [key])
+        self.assertEqual(found[key].dtype, np.float16)
+        np.testing.assert_array_equal(found[key], [0.5, -1.25, 2.0])
+
+    def test_persists_and_batches_large_lookups(self):
+        keys = [EmbeddingCache.content_hash("model", str(i)) for i in range(1200)]
+        EmbeddingCache(self.path).put_many({key: np.ones(4) for key in keys})
+
+        found = EmbeddingCache(self.path).get_many(keys)
+
+        self.assertEqual(len(found), len(keys))
+
+    def test_hash_depends_on_model(self):
+        self.assertNotEqual(
+            EmbeddingCache.content_hash("a", "text"),
+            EmbeddingCache.content_hash("b", "text"),
+        )
+
+
+class ArrowTermMaskTests(SimpleTestCase):
+    def setUp(self):
+        self.analyzer = FileAnalyzer.__new__(FileAnalyzer)
+        self.df = pd.DataFrame(
+            {
+                "device": ["R1", "r2", None],
+                "bgp_state": ["Established", "DOWN", "Idle"],
+                "uptime": [10, 0, None],
+            }
+        )
+
+    def test_case_insensitive_substring_on_every_column(self):
+        columns = self.analyzer._text_columns(self.df)
+
+        self.assertEqual(
+            list(self.analyzer._term_mask(columns["device"], "r")), [True, True, False]
+        )
+        self.assertEqual(
+            list(self.analyzer._term_mask(columns["bgp_state"], "down")),
+            [False, True, False],
+        )
+        self.assertEqual(
+            list(self.analyzer._term_mask(columns["uptime"], "10")),
+            [True, False, False],
+        )
+
+    def test_state_filter_matches_any_term(self):
+        columns = self.analyzer._text_columns(self.df)
+
+        filtered = self.analyzer._apply_intelligent_filter(
+            self.df, "which peers are down or idle", ["down", "idle"], columns
+        )
+
+        self.assertEqual(filtered["device"].tolist(), ["r2", None])
+
+
+class ContentAddressedUploadTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(MEDIA_ROOT=self.tmp)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.service = FileService()
+
+    def test_identical_uploads_share_one_copy(self):
+        first = self.service.save_uploaded_file(
+            SimpleUploadedFile("a.csv", b"x,y\n1,2\n"), "s1"
+        )
+        second = self.service.save_uploaded_file(
+            SimpleUploadedFile("B.CSV", b"x,y\n1,2\n"), "s2"
+        )
+
+        self.assertTrue(first["success"], first.get("error"))
+        self.assertEqual(first["file_path"], second["file_path"])
+        self.assertEqual(first["filename"], "a.csv")
+        self.assertEqual(second["filename"], "B.CSV")
+        self.assertTrue(
+            first["file_path"].startswith(f"by-hash/{first['content_hash'][:2]}/")
+        )
+        self.assertEqual(Path(first["full_path"]).read_bytes(), b"x,y\n1,2\n")
+        self.assertEqual(len(list((self.tmp / "by-hash").rglob("*.csv"))), 1)
+
+    def test_different_content_gets_its_own_path(self):
+        first = self.service.save_uploaded_file(SimpleUploadedFile("a.csv", b"1"), "s1")
+        second = self.service.save_uploaded_file(
+            SimpleUploadedFile("a.csv", b"2"), "s1"
+        )
+
+        self.assertNotEqual(first["content_hash"], second["content_hash"])
+        self.assertNotEqual(first["file_path"], second["file_path"])
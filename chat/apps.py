@@ -1,6 +1,27 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+# WAL lets readers run alongside a writer; NORMAL sync is safe under WAL.
+# Django 4.2 has no SQLite init_command option, so these run per connection
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+def _tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
 
 
 class ChatConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "chat"
+
+    def ready(self):
+        connection_created.connect(_tune_sqlite)
@@ -1,13 +1,20 @@
 # chat/consumers.py
-import json
 import asyncio
 import logging
+import uuid
+import orjson
+from django.utils import timezone
 from channels.generic.websocket import AsyncWebsocketConsumer
 from ai_services.chat_processor import ChatProcessor
 
 logger = logging.getLogger("ai_services")
 
 
+def _dumps(data) -> str:
+    """Serialize a frame with orjson; Channels expects text_data as str"""
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
 class ChatConsumer(AsyncWebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -32,7 +39,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         # Send welcome message
         await self.send(
-            text_data=json.dumps(
+            text_data=_dumps(
                 {
                     "type": "system",
                     "message": "Connected to chat. You can upload files, connect to databases, or ask me anything!",
@@ -47,7 +54,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def receive(self, text_data):
         try:
-            text_data_json = json.loads(text_data)
+            text_data_json = orjson.loads(text_data)
             message_type = text_data_json.get("type", "message")
 
             if message_type == "message":
@@ -60,7 +67,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 await self._handle_ping()
             else:
                 await self.send(
-                    text_data=json.dumps(
+                    text_data=_dumps(
                         {
                             "type": "error",
                             "message": f"Unknown message type: {message_type}",
@@ -68,16 +75,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     )
                 )
 
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             await self.send(
-                text_data=json.dumps(
-                    {"type": "error", "message": "Invalid JSON format"}
-                )
+                text_data=_dumps({"type": "error", "message": "Invalid JSON format"})
             )
         except Exception as e:
             logger.error(f"Error in receive: {e}")
             await self.send(
-                text_data=json.dumps(
+                text_data=_dumps(
                     {
                         "type": "error",
                         "message": "An error occurred processing your message",
@@ -100,7 +105,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             user_message += f"\n\n📎 Attached files: {', '.join(file_names)}"
 
         await self.send(
-            text_data=json.dumps(
+            text_data=_dumps(
                 {
                     "type": "user",
                     "message": user_message,
@@ -110,58 +115,29 @@ class ChatConsumer(AsyncWebsocketConsumer):
         )
 
         # Send initial thinking status
-        await self.send(
-            text_data=json.dumps({"type": "typing", "message": "💭 Thinking..."})
-        )
+        await self._send_typing("💭 Thinking...")
 
-        # If there are attached files, send processing status updates
-        if attached_files:
-            # Send analyzing status
-            await self.send(
-                text_data=json.dumps(
-                    {"type": "typing", "message": "🔍 Analyzing attached files..."}
-                )
-            )
-
-            # Small delay to show the status
-            await asyncio.sleep(1)
-
-            # Send RAG processing status
-            await self.send(
-                text_data=json.dumps(
-                    {"type": "typing", "message": "🧠 Processing with RAG system..."}
-                )
-            )
-
-            # Small delay to show the status
-            await asyncio.sleep(1)
-
-            # Send searching status
-            await self.send(
-                text_data=json.dumps(
-                    {"type": "typing", "message": "🔎 Searching for relevant data..."}
-                )
+        # Start processing only now: its progress frames must follow the two above
+        metadata = {"attached_files": attached_files}
+        task = asyncio.create_task(
+            self._process_message_async(
+                message, metadata, progress_callback=self._send_typing
             )
+        )
 
-            # Small delay to show the status
-            await asyncio.sleep(1)
-
-        # Send generating status
-        await self.send(
-            text_data=json.dumps(
-                {"type": "typing", "message": "🤖 Generating AI response..."}
+        # With attached files the pipeline reports its own progress as each
+        # stage actually starts; otherwise go straight to generating
+        if not attached_files:
+            await self._send_while_running(
+                task, {"type": "typing", "message": "🤖 Generating AI response..."}
             )
-        )
 
-        # Process message with attachments
-        metadata = {"attached_files": attached_files}
-        result = await self._process_message_async(message, metadata)
+        # Wait for the message (and any attachments) to finish processing
+        result = await task
 
         # Send AI response (only once)
-        import uuid
-
         await self.send(
-            text_data=json.dumps(
+            text_data=_dumps(
                 {
                     "type": "ai",
                     "message": result["response"],
@@ -180,29 +156,27 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if not message.strip():
             return
 
-        # Echo user message
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": "user",
-                    "message": f"Question about file: {message}",
-                    "timestamp": self._get_timestamp(),
-                }
-            )
-        )
-
-        # Send typing indicator
-        await self.send(
-            text_data=json.dumps({"type": "typing", "message": "Analyzing file..."})
+        # Start processing right away so it overlaps with the frames below
+        metadata = {"file_question": True, "file_id": file_id}
+        task = asyncio.create_task(self._process_message_async(message, metadata))
+
+        # Echo user message and send typing indicator
+        await self._send_while_running(
+            task,
+            {
+                "type": "user",
+                "message": f"Question about file: {message}",
+                "timestamp": self._get_timestamp(),
+            },
+            {"type": "typing", "message": "Analyzing file..."},
         )
 
-        # Process file question
-        metadata = {"file_question": True, "file_id": file_id}
-        result = await self._process_message_async(message, metadata)
+        # Wait for the file question to be processed
+        result = await task
 
         # Send AI response
         await self.send(
-            text_data=json.dumps(
+            text_data=_dumps(
                 {
                     "type": "ai",
                     "message": result["response"],
@@ -220,29 +194,27 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if not query.strip():
             return
 
-        # Echo user query
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": "user",
-                    "message": f"SQL Query: {query}",
-                    "timestamp": self._get_timestamp(),
-                }
-            )
-        )
-
-        # Send processing indicator
-        await self.send(
-            text_data=json.dumps({"type": "typing", "message": "Executing query..."})
+        # Start processing right away so it overlaps with the frames below
+        metadata = {"database_query": True, "connection_id": connection_id}
+        task = asyncio.create_task(self._process_message_async(query, metadata))
+
+        # Echo user query and send processing indicator
+        await self._send_while_running(
+            task,
+            {
+                "type": "user",
+                "message": f"SQL Query: {query}",
+                "timestamp": self._get_timestamp(),
+            },
+            {"type": "typing", "message": "Executing query..."},
         )
 
-        # Process database query
-        metadata = {"database_query": True, "connection_id": connection_id}
-        result = await self._process_message_async(query, metadata)
+        # Wait for the database query to be processed
+        result = await task
 
         # Send AI response
         await self.send(
-            text_data=json.dumps(
+            text_data=_dumps(
                 {
                     "type": "ai",
                     "message": result["response"],
@@ -255,21 +227,34 @@ class ChatConsumer(AsyncWebsocketConsumer):
     async def _handle_ping(self):
         """Handle ping message"""
         await self.send(
-            text_data=json.dumps({"type": "pong", "timestamp": self._get_timestamp()})
+            text_data=_dumps({"type": "pong", "timestamp": self._get_timestamp()})
         )
 
-    async def _process_message_async(self, message: str, metadata=None):
+    async def _send_while_running(self, task: asyncio.Task, *frames: dict):
+        """Send frames while task runs, cancelling the task if a send fails"""
+        try:
+            for frame in frames:
+                await self.send(text_data=_dumps(frame))
+        except BaseException:
+            task.cancel()
+            raise
+
+    async def _send_typing(self, message: str):
+        """Send a typing/status indicator"""
+        await self.send(text_data=_dumps({"type": "typing", "message": message}))
+
+    async def _process_message_async(
+        self, message: str, metadata=None, progress_callback=None
+    ):
         """Async wrapper for message processing"""
         # Set the session_id in the chat processor
         self.chat_processor.session_id = self.session_id
         return await self.chat_processor.process_message(
-            self.session_id, message, "user", metadata
+            self.session_id, message, "user", metadata, progress_callback
         )
 
     def _get_timestamp(self):
         """Get current timestamp"""
-        from django.utils import timezone
-
         return timezone.now().isoformat()
 
     # Handlers for group messages
@@ -279,7 +264,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         # Send message to WebSocket
         await self.send(
-            text_data=json.dumps(
+            text_data=_dumps(
                 {
                     "type": message_type,
                     "message": message,
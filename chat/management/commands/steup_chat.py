@@ -23,7 +23,13 @@ class Command(BaseCommand):
             )
 
         self.stdout.write(self.style.SUCCESS("Setup complete!"))
-        self.stdout.write("Next steps:")
-        self.stdout.write("1. Install Ollama and run: ollama pull llama3")
-        self.stdout.write("2. Start Redis server")
-        self.stdout.write("3. Run: python manage.py runserver")
+        self.stdout.write(
+            "\n".join(
+                [
+                    "Next steps:",
+                    "1. Install Ollama and run: ollama pull llama3",
+                    "2. Start Redis server",
+                    "3. Run: python manage.py runserver",
+                ]
+            )
+        )
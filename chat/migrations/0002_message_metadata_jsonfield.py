@@ -0,0 +1,33 @@
+import json
+
+from django.db import migrations, models
+
+
+def normalize_metadata(apps, schema_editor):
+    """Rewrite empty or malformed metadata text as valid JSON before the type change"""
+    Message = apps.get_model("chat", "Message")
+    for message in Message.objects.only("id", "metadata").iterator():
+        try:
+            data = json.loads(message.metadata) if message.metadata else {}
+        except json.JSONDecodeError:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        text = json.dumps(data)
+        if text != message.metadata:
+            Message.objects.filter(pk=message.pk).update(metadata=text)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_metadata, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="message",
+            name="metadata",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0002_message_metadata_jsonfield"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(fields=["session", "timestamp"], name="msg_sess_ts_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="uploadedfile",
+            index=models.Index(
+                fields=["session", "upload_timestamp"], name="file_sess_upload_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="queryhistory",
+            index=models.Index(
+                fields=["session", "timestamp"], name="query_sess_ts_idx"
+            ),
+        ),
+    ]
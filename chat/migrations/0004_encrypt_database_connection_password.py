@@ -0,0 +1,62 @@
+from cryptography.fernet import Fernet
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import migrations, models
+
+
+def _cipher() -> Fernet:
+    """Fernet for the dedicated credential key; refuses to run without one"""
+    if not settings.DB_CRED_KEY:
+        raise ImproperlyConfigured(
+            "DB_CRED_KEY must be set to migrate stored database passwords"
+        )
+    return Fernet(settings.DB_CRED_KEY.encode())
+
+
+def encrypt_passwords(apps, schema_editor):
+    DatabaseConnection = apps.get_model("chat", "DatabaseConnection")
+    if not DatabaseConnection.objects.exists():
+        return
+    cipher = _cipher()
+    for connection in DatabaseConnection.objects.only("id", "password").iterator():
+        DatabaseConnection.objects.filter(pk=connection.pk).update(
+            password_encrypted=cipher.encrypt(connection.password.encode())
+        )
+
+
+def decrypt_passwords(apps, schema_editor):
+    DatabaseConnection = apps.get_model("chat", "DatabaseConnection")
+    if not DatabaseConnection.objects.exists():
+        return
+    cipher = _cipher()
+    for connection in DatabaseConnection.objects.only(
+        "id", "password_encrypted"
+    ).iterator():
+        DatabaseConnection.objects.filter(pk=connection.pk).update(
+            password=cipher.decrypt(bytes(connection.password_encrypted)).decode()
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0003_session_timestamp_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="databaseconnection",
+            name="password_encrypted",
+            field=models.BinaryField(default=b""),
+            preserve_default=False,
+        ),
+        migrations.RunPython(encrypt_passwords, decrypt_passwords),
+        migrations.RemoveField(
+            model_name="databaseconnection",
+            name="password",
+        ),
+        migrations.RenameField(
+            model_name="databaseconnection",
+            old_name="password_encrypted",
+            new_name="password",
+        ),
+    ]
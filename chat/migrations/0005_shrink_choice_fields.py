@@ -0,0 +1,52 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0004_encrypt_database_connection_password"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="message",
+            name="message_type",
+            field=models.CharField(
+                choices=[
+                    ("user", "User"),
+                    ("ai", "AI Assistant"),
+                    ("system", "System"),
+                    ("file", "File Upload"),
+                    ("db_query", "Database Query"),
+                ],
+                max_length=8,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="uploadedfile",
+            name="file_type",
+            field=models.CharField(
+                choices=[
+                    ("csv", "CSV File"),
+                    ("xlsx", "Excel File"),
+                    ("xls", "Excel 97-2003 File"),
+                    ("txt", "Text File"),
+                    ("pdf", "PDF File"),
+                    ("json", "JSON File"),
+                ],
+                max_length=4,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="databaseconnection",
+            name="connection_type",
+            field=models.CharField(
+                choices=[
+                    ("mssql", "Microsoft SQL Server"),
+                    ("postgresql", "PostgreSQL"),
+                    ("mysql", "MySQL"),
+                    ("sqlite", "SQLite"),
+                ],
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+def backfill_preview(apps, schema_editor):
+    # Intentionally a frozen copy of chat.models.make_preview as of this
+    # migration: migrations must not depend on code that can change later.
+    # A change to make_preview needs its own backfill migration so existing
+    # rows match the previews of new ones.
+    Message = apps.get_model("chat", "Message")
+    for message in Message.objects.only("id", "content").iterator():
+        content = message.content or ""
+        preview = content[:57] + ("…" if len(content) > 57 else "")
+        Message.objects.filter(pk=message.pk).update(preview=preview)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0005_shrink_choice_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="preview",
+            field=models.CharField(blank=True, editable=False, max_length=60),
+        ),
+        migrations.RunPython(backfill_preview, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0006_message_preview"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="queryhistory",
+            index=models.Index(
+                fields=["database_connection", "-timestamp"], name="qh_conn_ts_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="queryhistory",
+            index=models.Index(
+                condition=models.Q(("success", False)),
+                fields=["timestamp"],
+                name="qh_failed_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0007_queryhistory_connection_and_failed_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chatsession",
+            index=models.Index(
+                fields=["user", "is_active"],
+                include=["session_id", "updated_at"],
+                name="cs_user_active_cov",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="databaseconnection",
+            index=models.Index(
+                fields=["user", "is_active"],
+                include=["name", "connection_type", "server"],
+                name="dbc_user_active_cov",
+            ),
+        ),
+    ]
@@ -0,0 +1,14 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chat", "0008_session_and_connection_covering_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="message",
+            options={},
+        ),
+    ]
@@ -1,7 +1,27 @@
 # chat/models.py
+import functools
+from cryptography.fernet import Fernet
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
-import json
+
+
+@functools.lru_cache(maxsize=1)
+def _cipher() -> Fernet:
+    """Shared Fernet instance for settings.DB_CRED_KEY; refuses an empty key"""
+    if not settings.DB_CRED_KEY:
+        raise ImproperlyConfigured(
+            "DB_CRED_KEY must be set to encrypt or decrypt database passwords"
+        )
+    return Fernet(settings.DB_CRED_KEY.encode())
+
+
+def make_preview(content: str, length: int = 57) -> str:
+    """Truncate message content for the denormalized preview column"""
+    content = content or ""
+    return content[:length] + ("…" if len(content) > length else "")
 
 
 class ChatSession(models.Model):
@@ -11,90 +31,144 @@ class ChatSession(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        # include= makes this a covering index on PostgreSQL; other backends
+        # get a plain (user, is_active) index
+        indexes = [
+            models.Index(
+                fields=["user", "is_active"],
+                include=["session_id", "updated_at"],
+                name="cs_user_active_cov",
+            )
+        ]
+
     def __str__(self):
         return f"Session {self.session_id} - {self.user or 'Anonymous'}"
 
 
+class MessageManager(models.Manager):
+    def history(self, session, before=None, limit=50, before_id=None):
+        """
+        Newest-first page of a session's messages, keyset-paginated on timestamp
+
+        Pass the oldest timestamp and id of the previous page as ``before``
+        and ``before_id`` to fetch the next one; every page is a range scan on
+        (session, timestamp). The id breaks ties between messages saved with
+        the same timestamp, such as a bulk_create'd user/ai pair.
+        """
+        messages = self.filter(session=session)
+        if before is not None:
+            if before_id is None:
+                messages = messages.filter(timestamp__lt=before)
+            else:
+                messages = messages.filter(
+                    Q(timestamp__lt=before) | Q(timestamp=before, id__lt=before_id)
+                )
+        messages = messages.select_related("session__user")
+        return messages.order_by("-timestamp", "-id")[:limit]
+
+
 class Message(models.Model):
-    MESSAGE_TYPES = [
-        ("user", "User"),
-        ("ai", "AI Assistant"),
-        ("system", "System"),
-        ("file", "File Upload"),
-        ("db_query", "Database Query"),
-    ]
+    class MessageType(models.TextChoices):
+        USER = "user", "User"
+        AI = "ai", "AI Assistant"
+        SYSTEM = "system", "System"
+        FILE = "file", "File Upload"
+        DB_QUERY = "db_query", "Database Query"
 
     session = models.ForeignKey(
         ChatSession, on_delete=models.CASCADE, related_name="messages"
     )
-    message_type = models.CharField(max_length=20, choices=MESSAGE_TYPES)
+    message_type = models.CharField(max_length=8, choices=MessageType.choices)
     content = models.TextField()
-    metadata = models.TextField(blank=True)  # JSON field for additional data
+    # First characters of content, so list rendering never loads the full text
+    preview = models.CharField(max_length=60, editable=False, blank=True)
+    metadata = models.JSONField(default=dict, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
-    class Meta:
-        ordering = ["timestamp"]
+    objects = MessageManager()
 
-    def set_metadata(self, data):
-        self.metadata = json.dumps(data)
+    # No default ordering: counts and existence checks should not sort.
+    # Queries that render history order by timestamp explicitly
+    class Meta:
+        indexes = [
+            models.Index(fields=["session", "timestamp"], name="msg_sess_ts_idx")
+        ]
 
-    def get_metadata(self):
-        if self.metadata:
-            try:
-                return json.loads(self.metadata)
-            except json.JSONDecodeError:
-                return {}
-        return {}
+    def save(self, *args, **kwargs):
+        self.preview = make_preview(self.content)
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.message_type}: {self.content[:50]}..."
+        return f"{self.message_type}: {self.preview}"
 
 
 class UploadedFile(models.Model):
-    FILE_TYPES = [
-        ("csv", "CSV File"),
-        ("xlsx", "Excel File"),
-        ("txt", "Text File"),
-        ("pdf", "PDF File"),
-        ("json", "JSON File"),
-    ]
+    class FileType(models.TextChoices):
+        CSV = "csv", "CSV File"
+        XLSX = "xlsx", "Excel File"
+        XLS = "xls", "Excel 97-2003 File"
+        TXT = "txt", "Text File"
+        PDF = "pdf", "PDF File"
+        JSON = "json", "JSON File"
 
     session = models.ForeignKey(
         ChatSession, on_delete=models.CASCADE, related_name="files"
     )
     file_name = models.CharField(max_length=255)
-    file_type = models.CharField(max_length=20, choices=FILE_TYPES)
+    file_type = models.CharField(max_length=4, choices=FileType.choices)
     file_path = models.CharField(max_length=500)
     file_size = models.BigIntegerField()
+    # blake2b-256 of the file bytes; file_path is by-hash/<hash[:2]>/<hash><ext>
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
     upload_timestamp = models.DateTimeField(auto_now_add=True)
     processed = models.BooleanField(default=False)
     processing_status = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["session", "upload_timestamp"], name="file_sess_upload_idx"
+            )
+        ]
+
     def __str__(self):
         return f"{self.file_name} ({self.file_type})"
 
 
 class DatabaseConnection(models.Model):
-    CONNECTION_TYPES = [
-        ("mssql", "Microsoft SQL Server"),
-        ("postgresql", "PostgreSQL"),
-        ("mysql", "MySQL"),
-        ("sqlite", "SQLite"),
-    ]
+    class ConnectionType(models.TextChoices):
+        MSSQL = "mssql", "Microsoft SQL Server"
+        POSTGRESQL = "postgresql", "PostgreSQL"
+        MYSQL = "mysql", "MySQL"
+        SQLITE = "sqlite", "SQLite"
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
-    connection_type = models.CharField(max_length=20, choices=CONNECTION_TYPES)
+    connection_type = models.CharField(max_length=10, choices=ConnectionType.choices)
     server = models.CharField(max_length=255)
     database = models.CharField(max_length=100)
     username = models.CharField(max_length=100)
-    password = models.CharField(max_length=255)  # Should be encrypted in production
+    password = models.BinaryField()  # Fernet ciphertext, use get/set_password
     port = models.IntegerField(default=1433)
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
 
     class Meta:
         unique_together = ["user", "name"]
+        indexes = [
+            models.Index(
+                fields=["user", "is_active"],
+                include=["name", "connection_type", "server"],
+                name="dbc_user_active_cov",
+            )
+        ]
+
+    def set_password(self, password: str):
+        self.password = _cipher().encrypt(password.encode())
+
+    def get_password(self) -> str:
+        return _cipher().decrypt(bytes(self.password)).decode()
 
     def __str__(self):
         return f"{self.name} ({self.connection_type})"
@@ -114,5 +188,19 @@ class QueryHistory(models.Model):
     success = models.BooleanField(default=True)
     error_message = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["session", "timestamp"], name="query_sess_ts_idx"),
+            models.Index(
+                fields=["database_connection", "-timestamp"], name="qh_conn_ts_idx"
+            ),
+            # Failed queries are rare, so this stays small as history grows
+            models.Index(
+                fields=["timestamp"],
+                condition=models.Q(success=False),
+                name="qh_failed_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Query at {self.timestamp}: {self.query[:50]}..."
@@ -1 +1,435 @@
-# Create your tests here.
+import asyncio
+import datetime
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+import orjson
+import pandas as pd
+from asgiref.sync import async_to_sync
+from cryptography.fernet import Fernet
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from ai_services.chat_processor import ChatProcessor
+from ai_services.database_service import DatabaseService
+
+from chat.consumers import ChatConsumer
+from chat.models import (
+    ChatSession,
+    DatabaseConnection,
+    Message,
+    _cipher,
+    make_preview,
+)
+from chat.views import _dumps, _get_session_pk
+
+
+class SessionPkTests(TestCase):
+    def test_creates_then_reuses_session(self):
+        pk = _get_session_pk("abc")
+
+        self.assertEqual(ChatSession.objects.get(session_id="abc").pk, pk)
+        self.assertEqual(_get_session_pk("abc"), pk)
+        self.assertEqual(ChatSession.objects.filter(session_id="abc").count(), 1)
+
+    def test_deleted_session_is_recreated(self):
+        pk = _get_session_pk("abc")
+        ChatSession.objects.filter(pk=pk).delete()
+
+        new_pk = _get_session_pk("abc")
+
+        self.assertNotEqual(new_pk, pk)
+        self.assertTrue(ChatSession.objects.filter(pk=new_pk).exists())
+
+
+class DumpsTests(SimpleTestCase):
+    def test_numpy_keys_nan_and_timestamps(self):
+        data = {
+            np.int64(3): {"value": np.float32(1.5), np.int32(2): float("nan")},
+            "when": pd.Timestamp("2024-01-02 03:04:05"),
+            "count": np.int64(7),
+            "values": np.array([1.0, np.nan]),
+        }
+
+        decoded = orjson.loads(_dumps(data))
+
+        self.assertEqual(decoded["3"], {"value": 1.5, "2": None})
+        self.assertEqual(decoded["when"], "2024-01-02T03:04:05")
+        self.assertEqual(decoded["count"], 7)
+        self.assertEqual(decoded["values"], [1.0, None])
+
+    def test_dataframe_with_numpy_column_labels(self):
+        frame = pd.DataFrame({np.int64(1): [np.nan, 2.0]})
+
+        decoded = orjson.loads(_dumps({"frame": frame}))
+
+        self.assertEqual(decoded["frame"], {"1": {"0": None, "1": 2.0}})
+
+
+class ChatConsumerFrameOrderTests(SimpleTestCase):
+    def setUp(self):
+        self.consumer = ChatConsumer()
+        self.frames = []
+
+        async def send(text_data):
+            self.frames.append(orjson.loads(text_data))
+
+        self.consumer.send = send
+
+    def test_progress_frames_follow_echo_and_thinking(self):
+        async def process(message, metadata=None, progress_callback=None):
+            await progress_callback("Reading files")
+            return {"response": "done"}
+
+        self.consumer._process_message_async = process
+
+        asyncio.run(
+            self.consumer._handle_chat_message(
+                {"message": "hi", "attached_files": [{"name": "a.csv"}]}
+            )
+        )
+
+        self.assertEqual(
+            [(f["type"], f["message"].split("\n")[0]) for f in self.frames],
+            [
+                ("user", "hi"),
+                ("typing", "💭 Thinking..."),
+                ("typing", "Reading files"),
+                ("ai", "done"),
+            ],
+        )
+
+    def test_failed_send_cancels_processing(self):
+        started = asyncio.Event()
+        cancelled = []
+
+        async def process(message, metadata=None, progress_callback=None):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def run():
+            task = asyncio.create_task(process("q"))
+            await started.wait()
+            self.consumer.send = mock.AsyncMock(side_effect=ConnectionError)
+            with self.assertRaises(ConnectionError):
+                await self.consumer._send_while_running(task, {"type": "typing"})
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        self.assertEqual(cancelled, [True])
+
+
+class ExecuteQueryViewTests(TestCase):
+    def setUp(self):
+        client_session = self.client.session
+        client_session["chat_session_id"] = "db"
+        client_session.save()
+
+        self.cursor = mock.Mock()
+        self.cursor.description = [("id",)]
+        db_connection = mock.Mock()
+        db_connection.cursor.return_value = self.cursor
+
+        processor = mock.Mock()
+        processor.database_service = DatabaseService()
+        processor.llama_service.explain_query_results = mock.AsyncMock(
+            return_value="One row"
+        )
+        self.processor = processor
+        for patcher in (
+            mock.patch("chat.views._get_chat_processor", return_value=processor),
+            mock.patch.object(
+                DatabaseService, "_live_connection", return_value=db_connection
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self):
+        response = self.client.post(
+            "/database/query/",
+            orjson.dumps({"query": "SELECT id", "connection_id": "c1"}),
+            content_type="application/json",
+        )
+        if not response.streaming:
+            return orjson.loads(response.content)
+
+        async def read():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        return orjson.loads(async_to_sync(read)())
+
+    def test_rows_stream_as_one_json_document(self):
+        self.cursor.fetchmany.side_effect = [[(1,)], [(2,)], []]
+
+        data = self.post()
+
+        self.assertTrue(data["success"])
+        self.assertEqual(data["data"], [{"id": 1}, {"id": 2}])
+        self.assertEqual(data["row_count"], 2)
+        self.cursor.close.assert_called_once()
+
+    def test_failure_before_streaming_closes_cursor(self):
+        self.cursor.fetchmany.return_value = [(1,)]
+        self.processor.llama_service.explain_query_results.side_effect = RuntimeError(
+            "LLM down"
+        )
+
+        data = self.post()
+
+        self.assertEqual(data, {"success": False, "error": "LLM down"})
+        self.cursor.close.assert_called_once()
+
+    def test_failure_mid_stream_keeps_body_valid_json(self):
+        self.cursor.fetchmany.side_effect = [[(1,)], RuntimeError("lost link")]
+
+        data = self.post()
+
+        self.assertFalse(data["success"])
+        self.assertEqual(data["error"], "lost link")
+        self.assertEqual(data["data"], [{"id": 1}])
+        self.cursor.close.assert_called_once()
+
+
+class ChatHistoryPaginationTests(TestCase):
+    def setUp(self):
+        self.session = ChatSession.objects.create(session_id="hist")
+        self.start = timezone.now() - datetime.timedelta(hours=1)
+        for i in range(5):
+            self.add_message(f"m{i}", self.start + datetime.timedelta(minutes=i))
+
+        client_session = self.client.session
+        client_session["chat_session_id"] = "hist"
+        client_session.save()
+
+        # get_session_history needs no service state
+        patcher = mock.patch(
+            "chat.views._get_chat_processor",
+            return_value=ChatProcessor.__new__(ChatProcessor),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add_message(self, content, timestamp, session=None):
+        message = Message.objects.create(
+            session=session or self.session, message_type="user", content=content
+        )
+        Message.objects.filter(pk=message.pk).update(timestamp=timestamp)
+
+    def get(self, session_id="hist", **params):
+        response = self.client.get(f"/history/{session_id}/", params)
+        return orjson.loads(response.content)
+
+    def page(self, **params):
+        data = self.get(**{"limit": 2, **params})
+        self.assertTrue(data["success"], data.get("error"))
+        cursor = {"before": data["next_before"], "before_id": data["next_before_id"]}
+        return [m["content"] for m in data["history"]], cursor
+
+    def test_pages_walk_backwards_in_chronological_order(self):
+        contents, cursor = self.page()
+        self.assertEqual(contents, ["m3", "m4"])
+
+        contents, cursor = self.page(**cursor)
+        self.assertEqual(contents, ["m1", "m2"])
+
+        contents, cursor = self.page(**cursor)
+        self.assertEqual(contents, ["m0"])
+        self.assertIsNone(cursor["before"])
+
+    def test_messages_sharing_a_timestamp_are_neither_skipped_nor_repeated(self):
+        Message.objects.all().delete()
+        for i in range(5):
+            self.add_message(f"t{i}", self.start)
+
+        seen = []
+        cursor = {}
+        while True:
+            contents, cursor = self.page(**cursor)
+            seen = contents + seen
+            if cursor["before"] is None:
+                break
+
+        self.assertEqual(seen, [f"t{i}" for i in range(5)])
+
+    def test_limit_is_clamped(self):
+        for limit in (0, -3):
+            with self.subTest(limit=limit):
+                data = self.get(limit=limit)
+                self.assertTrue(data["success"], data.get("error"))
+                self.assertEqual([m["content"] for m in data["history"]], ["m4"])
+
+        self.assertEqual(len(self.get(limit=1000)["history"]), 5)
+
+    def test_other_sessions_are_rejected(self):
+        other = ChatSession.objects.create(session_id="other")
+        self.add_message("secret", self.start, session=other)
+
+        data = self.get("other")
+
+        self.assertFalse(data["success"])
+        self.assertNotIn("history", data)
+
+    def test_owner_can_read_their_other_sessions(self):
+        owner = User.objects.create(username="owner")
+        other = ChatSession.objects.create(session_id="other", user=owner)
+        self.add_message("mine", self.start, session=other)
+        self.client.force_login(owner)
+
+        data = self.get("other")
+
+        self.assertTrue(data["success"], data.get("error"))
+        self.assertEqual([m["content"] for m in data["history"]], ["mine"])
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertFalse(self.get(before="yesterday")["success"])
+
+
+class DatabaseConnectionPasswordTests(SimpleTestCase):
+    def setUp(self):
+        _cipher.cache_clear()
+        self.addCleanup(_cipher.cache_clear)
+
+    def test_password_round_trips_as_ciphertext(self):
+        key = Fernet.generate_key().decode()
+        db_connection = DatabaseConnection()
+
+        with override_settings(DB_CRED_KEY=key):
+            db_connection.set_password("s3cret")
+            password = db_connection.get_password()
+
+        self.assertEqual(password, "s3cret")
+        self.assertNotIn(b"s3cret", db_connection.password)
+        self.assertEqual(
+            Fernet(key.encode()).decrypt(db_connection.password), b"s3cret"
+        )
+
+    def test_missing_key_is_refused(self):
+        with override_settings(DB_CRED_KEY=""):
+            with self.assertRaises(ImproperlyConfigured):
+                DatabaseConnection().set_password("s3cret")
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Seed rows at migrate_from, then check them after migrating to migrate_to"""
+
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([("chat", self.migrate_from)])
+        self.seed(executor.loader.project_state([("chat", self.migrate_from)]).apps)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        # A throwaway key lets 0004 pass over rows a failed migration left
+        with override_settings(DB_CRED_KEY=Fernet.generate_key().decode()):
+            executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def seed(self, apps):
+        pass
+
+    def migrate_forward(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([("chat", self.migrate_to)])
+        return executor.loader.project_state([("chat", self.migrate_to)]).apps
+
+
+class EncryptPasswordsMigrationTests(MigrationTestCase):
+    migrate_from = "0003_session_timestamp_indexes"
+    migrate_to = "0004_encrypt_database_connection_password"
+
+    def seed(self, apps):
+        User = apps.get_model("auth", "User")
+        apps.get_model("chat", "DatabaseConnection").objects.create(
+            user=User.objects.create(username="owner"),
+            name="warehouse",
+            connection_type="mssql",
+            server="db",
+            database="dw",
+            username="reader",
+            password="s3cret",
+        )
+
+    def test_passwords_are_encrypted(self):
+        key = Fernet.generate_key().decode()
+        with override_settings(DB_CRED_KEY=key):
+            apps = self.migrate_forward()
+
+        stored = apps.get_model("chat", "DatabaseConnection").objects.get().password
+        self.assertEqual(Fernet(key.encode()).decrypt(bytes(stored)), b"s3cret")
+
+    def test_missing_key_is_refused(self):
+        with override_settings(DB_CRED_KEY=""):
+            with self.assertRaises(ImproperlyConfigured):
+                self.migrate_forward()
+
+
+class MessagePreviewMigrationTests(MigrationTestCase):
+    migrate_from = "0005_shrink_choice_fields"
+    migrate_to = "0006_message_preview"
+
+    def seed(self, apps):
+        session = apps.get_model("chat", "ChatSession").objects.create(session_id="old")
+        for content in ("short", "x" * 57, "x" * 80, ""):
+            apps.get_model("chat", "Message").objects.create(
+                session=session, message_type="user", content=content
+            )
+
+    def test_backfill_matches_make_preview(self):
+        apps = self.migrate_forward()
+
+        for message in apps.get_model("chat", "Message").objects.all():
+            with self.subTest(content=message.content):
+                self.assertEqual(message.preview, make_preview(message.content))
+
+
+class MetadataMigrationTests(MigrationTestCase):
+    migrate_from = "0001_initial"
+    migrate_to = "0002_message_metadata_jsonfield"
+
+    def seed(self, apps):
+        session = apps.get_model("chat", "ChatSession").objects.create(session_id="old")
+        Message = apps.get_model("chat", "Message")
+        self.message_ids = {
+            metadata: Message.objects.create(
+                session=session, message_type="user", content="x", metadata=metadata
+            ).pk
+            for metadata in ("", "not json", "[1, 2]", '{"a": 1}')
+        }
+
+    def test_metadata_is_normalized_to_objects(self):
+        Message = self.migrate_forward().get_model("chat", "Message")
+
+        metadata = {
+            raw: Message.objects.get(pk=pk).metadata
+            for raw, pk in self.message_ids.items()
+        }
+        self.assertEqual(
+            metadata, {"": {}, "not json": {}, "[1, 2]": {}, '{"a": 1}': {"a": 1}}
+        )
+
+
+class MigrationStateTests(TestCase):
+    def test_models_match_migrations(self):
+        call_command(
+            "makemigrations", "chat", "--check", "--dry-run", stdout=StringIO()
+        )
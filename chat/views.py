@@ -1,23 +1,125 @@
 # chat/views.py
-import json
+import datetime
+import os
+import traceback
 import uuid
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import orjson
+from asgiref.sync import async_to_sync, sync_to_async
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views.generic import View
 from ai_services.chat_processor import ChatProcessor
+from ai_services.enhanced_llm_service import EnhancedLLMService
+from ai_services.file_service import FileService
+from ai_services.rag_service import RAGService
+from chat.models import ChatSession, Message, UploadedFile
 
 logger = logging.getLogger(__name__)
 
+# A tuple so the check is a single str.endswith call
+_ALLOWED_EXT = (".csv", ".xlsx", ".xls", ".txt", ".json", ".pdf")
+_ALLOWED_EXT_LABEL = ", ".join(_ALLOWED_EXT)
+_MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # 50MB
+_DUMPS_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+# Services set up model and HTTP clients in their constructors, so each worker
+# process builds them once and reuses them across requests
+@lru_cache(maxsize=1)
+def _get_chat_processor() -> ChatProcessor:
+    return ChatProcessor()
+
+
+@lru_cache(maxsize=1)
+def _get_file_service() -> FileService:
+    return FileService()
+
+
+def _validate_upload(uploaded_file) -> str:
+    """Return why an uploaded file is rejected, or an empty string if it is accepted"""
+    if uploaded_file.size == 0:
+        return "File is empty"
+    if uploaded_file.size > _MAX_UPLOAD_SIZE:
+        return "File too large (max 50MB)"
+    if not uploaded_file.name.lower().endswith(_ALLOWED_EXT):
+        return f"File type not supported. Allowed: {_ALLOWED_EXT_LABEL}"
+    return ""
+
+
+def _get_session_pk(session_id: str) -> int:
+    """
+    Primary key of the ChatSession for session_id, creating it if needed
+
+    Resolved on the server on every call (a single unique-index lookup once
+    the session exists), so callers can set session_id=pk on related rows.
+    """
+    session, _ = ChatSession.objects.only("id").get_or_create(session_id=session_id)
+    return session.pk
+
+
+def _json_default(obj):
+    """Fallback for values orjson cannot serialize natively (pandas objects etc.)"""
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if hasattr(obj, "to_dict"):  # pandas Series/DataFrame
+        return _str_keys(obj.to_dict())
+    if hasattr(obj, "tolist"):  # numpy/pandas arrays
+        return obj.tolist()
+    if hasattr(obj, "item"):  # numpy scalars
+        return obj.item()
+    return str(obj)
+
+
+def _str_keys(obj):
+    """Copy nested dicts/lists, converting every non-str dict key with str()"""
+    if isinstance(obj, dict):
+        return {
+            key if isinstance(key, str) else str(key): _str_keys(value)
+            for key, value in obj.items()
+        }
+    if isinstance(obj, (list, tuple)):
+        return [_str_keys(item) for item in obj]
+    return obj
+
+
+def _dumps(data) -> bytes:
+    """
+    Encode data as JSON with orjson, including numpy values
+
+    orjson rejects some dict keys even with OPT_NON_STR_KEYS (numpy scalars,
+    for one); those are converted with str() and the data encoded again.
+    """
+    try:
+        return orjson.dumps(data, default=_json_default, option=_DUMPS_OPTIONS)
+    except orjson.JSONEncodeError:
+        return orjson.dumps(
+            _str_keys(data), default=_json_default, option=_DUMPS_OPTIONS
+        )
+
+
+class OrjsonResponse(HttpResponse):
+    """JsonResponse equivalent that encodes with orjson, including numpy values"""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=_dumps(data), **kwargs)
+
 
 class ChatView(View):
     def get(self, request):
         """Render chat interface"""
         session_id = request.session.get("chat_session_id")
         if not session_id:
-            session_id = str(uuid.uuid4())
+            session_id = uuid.uuid4().hex
             request.session["chat_session_id"] = session_id
 
         context = {
@@ -37,162 +139,69 @@ class FileUploadView(View):
             session_id = request.session.get("chat_session_id")
             if not session_id:
                 logger.error("No session found")
-                return JsonResponse({"success": False, "error": "No session found"})
+                return OrjsonResponse({"success": False, "error": "No session found"})
 
             if "file" not in request.FILES:
                 logger.error("No file provided in request")
-                return JsonResponse({"success": False, "error": "No file provided"})
+                return OrjsonResponse({"success": False, "error": "No file provided"})
 
             uploaded_file = request.FILES["file"]
 
             # Validate file
-            if uploaded_file.size == 0:
-                return JsonResponse({"success": False, "error": "File is empty"})
-
-            if uploaded_file.size > 50 * 1024 * 1024:  # 50MB limit
-                return JsonResponse(
-                    {"success": False, "error": "File too large (max 50MB)"}
-                )
-
-            # Check file extension
-            import os
-
-            allowed_extensions = [".csv", ".xlsx", ".xls", ".txt", ".json", ".pdf"]
-            file_extension = os.path.splitext(uploaded_file.name)[1].lower()
-            if file_extension not in allowed_extensions:
-                return JsonResponse(
-                    {
-                        "success": False,
-                        "error": f"File type not supported. Allowed: {', '.join(allowed_extensions)}",
-                    }
-                )
+            error = _validate_upload(uploaded_file)
+            if error:
+                return OrjsonResponse({"success": False, "error": error})
 
             user_question = request.POST.get("question", "")
             logger.info(
-                f"Processing file: {uploaded_file.name}, size: {uploaded_file.size}, question: {user_question}"
+                "Processing file: %s, size: %d, question: %s",
+                uploaded_file.name,
+                uploaded_file.size,
+                user_question,
             )
 
             # Use synchronous file processing for now
             logger.info("Using synchronous file processing...")
-            result = self._process_file_sync(session_id, uploaded_file, user_question)
-            logger.info(f"File processing completed, result type: {type(result)}")
+            result = self._process_file_sync(
+                session_id,
+                _get_session_pk(session_id),
+                uploaded_file,
+                user_question,
+            )
 
             # Log success for debugging
             if result.get("success"):
                 logger.info(
-                    f"File upload successful: {result.get('file_info', {}).get('filename', 'Unknown')}"
+                    "File upload successful: %s",
+                    result.get("file_info", {}).get("filename", "Unknown"),
                 )
             else:
                 logger.error(
-                    f"File upload failed: {result.get('error', 'Unknown error')}"
+                    "File upload failed: %s", result.get("error", "Unknown error")
                 )
 
-            # Ensure result is JSON serializable
-            result = self._ensure_json_serializable(result)
-
-            # Final JSON validation with detailed error logging
-            try:
-                import json
-
-                json.dumps(result)
-                logger.info("Final JSON validation passed")
-            except Exception as e:
-                logger.error(f"Final JSON serialization error: {e}")
-                logger.error(f"Result type: {type(result)}")
-                if isinstance(result, dict):
-                    for key, value in result.items():
-                        logger.error(f"Key: {key}, Type: {type(value)}")
-                        try:
-                            # Try to serialize individual values to identify the problem
-                            json.dumps(value)
-                        except Exception as val_error:
-                            logger.error(f"  Value for key '{key}' failed: {val_error}")
-
-                # Return a simplified success response instead of error
-                return JsonResponse(
-                    {
-                        "success": True,
-                        "file_info": {
-                            "filename": uploaded_file.name,
-                            "file_type": os.path.splitext(uploaded_file.name)[
-                                1
-                            ].lower()[1:],
-                            "file_size": uploaded_file.size,
-                        },
-                        "analysis": "File uploaded successfully. Data analysis completed with simplified output.",
-                        "message": "File processed successfully (some data complexity required simplified output)",
-                        "data": [],  # Empty data to avoid serialization issues
-                    }
-                )
-
-            return JsonResponse(result)
+            return OrjsonResponse(result)
 
         except Exception as e:
             logger.error(f"File upload error: {e}")
-            import traceback
-
             logger.error(traceback.format_exc())
-            return JsonResponse({"success": False, "error": str(e)})
-
-    def _ensure_json_serializable(self, obj):
-        """Ensure object is JSON serializable"""
-        try:
-            if isinstance(obj, dict):
-                return {
-                    str(key): self._ensure_json_serializable(value)
-                    for key, value in obj.items()
-                }
-            elif isinstance(obj, list):
-                return [self._ensure_json_serializable(item) for item in obj]
-            elif isinstance(obj, (int, float, str, bool, type(None))):
-                # Handle NaN and infinity values
-                if isinstance(obj, float):
-                    import math
-
-                    if math.isnan(obj) or math.isinf(obj):
-                        return None
-                return obj
-            elif hasattr(obj, "dtype"):  # Handle numpy/pandas objects
-                if hasattr(obj, "item"):  # numpy scalar
-                    item_val = obj.item()
-                    if isinstance(item_val, float) and (
-                        math.isnan(item_val) or math.isinf(item_val)
-                    ):
-                        return None
-                    return item_val
-                return str(obj)
-            elif hasattr(obj, "to_dict"):  # Handle pandas Series/DataFrame
-                try:
-                    return self._ensure_json_serializable(obj.to_dict())
-                except (AttributeError, TypeError, ValueError) as e:
-                    logger.debug(f"Failed to convert pandas object to dict: {e}")
-                    return str(obj)
-            elif hasattr(obj, "tolist"):  # Handle numpy arrays
-                return self._ensure_json_serializable(obj.tolist())
-            else:
-                # Convert any other objects to string
-                return str(obj)
-        except Exception as e:
-            logger.error(f"Error in JSON serialization: {e}")
-            return str(obj)
+            return OrjsonResponse({"success": False, "error": str(e)})
 
     def _process_file_sync(
-        self, session_id: str, uploaded_file, user_question: str = ""
+        self, session_id: str, session_pk: int, uploaded_file, user_question: str = ""
     ):
         """Synchronous file processing without async operations"""
         try:
             logger.info("Starting synchronous file processing...")
 
             # Save file
-            from ai_services.file_service import FileService
-
-            file_service = FileService()
+            file_service = _get_file_service()
             file_info = file_service.save_uploaded_file(uploaded_file, session_id)
 
             if not file_info["success"]:
                 return {"success": False, "error": file_info["error"]}
 
-            logger.info(f"File saved: {file_info['filename']}")
+            logger.info("File saved: %s", file_info["filename"])
 
             # Process file
             processed_file = file_service.process_file(
@@ -205,16 +214,13 @@ class FileUploadView(View):
             logger.info("File processed successfully")
 
             # Save to database first to get file ID
-            from chat.models import ChatSession, UploadedFile
-
-            session, created = ChatSession.objects.get_or_create(session_id=session_id)
-
             uploaded_file_record = UploadedFile.objects.create(
-                session=session,
+                session_id=session_pk,
                 file_name=file_info["filename"],
                 file_type=file_info["file_type"],
                 file_path=file_info["file_path"],
                 file_size=file_info["file_size"],
+                content_hash=file_info["content_hash"],
                 processed=False,  # Will be set to True after RAG processing
             )
 
@@ -231,23 +237,23 @@ class FileUploadView(View):
 
             if rag_result["success"]:
                 logger.info(
-                    f"File processed for RAG: {rag_result['chunks_created']} chunks created"
+                    "File processed for RAG: %d chunks created",
+                    rag_result["chunks_created"],
                 )
                 uploaded_file_record.processed = True
                 uploaded_file_record.processing_status = "RAG processed"
                 uploaded_file_record.save()
             else:
                 logger.warning(
-                    f"RAG processing failed: {rag_result.get('error', 'Unknown error')}"
+                    "RAG processing failed: %s",
+                    rag_result.get("error", "Unknown error"),
                 )
                 uploaded_file_record.processed = True
                 uploaded_file_record.processing_status = "RAG failed"
                 uploaded_file_record.save()
 
             # Generate fallback analysis (no AI service)
-            from ai_services.chat_processor import ChatProcessor
-
-            chat_processor = ChatProcessor()
+            chat_processor = _get_chat_processor()
             analysis_response = chat_processor._generate_fallback_analysis(
                 processed_file, file_info, user_question
             )
@@ -269,8 +275,6 @@ class FileUploadView(View):
 
         except Exception as e:
             logger.error(f"Error in synchronous file processing: {e}")
-            import traceback
-
             logger.error(traceback.format_exc())
             return {"success": False, "error": str(e)}
 
@@ -282,23 +286,23 @@ class FolderPathView(View):
         try:
             session_id = request.session.get("chat_session_id")
             if not session_id:
-                return JsonResponse({"success": False, "error": "No session found"})
+                return OrjsonResponse({"success": False, "error": "No session found"})
 
-            data = json.loads(request.body)
+            data = orjson.loads(request.body)
             folder_path = data.get("folder_path", "")
 
             if not folder_path:
-                return JsonResponse(
+                return OrjsonResponse(
                     {"success": False, "error": "No folder path provided"}
                 )
 
-            chat_processor = ChatProcessor()
+            chat_processor = _get_chat_processor()
             result = chat_processor.process_folder_path(session_id, folder_path)
 
-            return JsonResponse(result)
+            return OrjsonResponse(result)
 
         except Exception as e:
-            return JsonResponse({"success": False, "error": str(e)})
+            return OrjsonResponse({"success": False, "error": str(e)})
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -308,9 +312,9 @@ class DatabaseConnectionView(View):
         try:
             session_id = request.session.get("chat_session_id")
             if not session_id:
-                return JsonResponse({"success": False, "error": "No session found"})
+                return OrjsonResponse({"success": False, "error": "No session found"})
 
-            data = json.loads(request.body)
+            data = orjson.loads(request.body)
             connection_config = {
                 "type": data.get("type", "mssql"),
                 "server": data.get("server", ""),
@@ -323,38 +327,74 @@ class DatabaseConnectionView(View):
             # Validate required fields
             required_fields = ["server", "database", "username", "password"]
             if not all(connection_config.get(field) for field in required_fields):
-                return JsonResponse(
+                return OrjsonResponse(
                     {"success": False, "error": "Missing required connection details"}
                 )
 
-            chat_processor = ChatProcessor()
+            chat_processor = _get_chat_processor()
             result = chat_processor.process_database_connection(
                 session_id, connection_config
             )
 
-            return JsonResponse(result)
+            return OrjsonResponse(result)
 
         except Exception as e:
-            return JsonResponse({"success": False, "error": str(e)})
+            return OrjsonResponse({"success": False, "error": str(e)})
 
 
 class ChatHistoryView(View):
-    def get(self, request):
-        """Get chat session history"""
+    def get(self, request, session_id=None):
+        """
+        Get chat session history, one page at a time
+
+        Query params: ``limit`` (1-200, default 50) and ``before`` and
+        ``before_id``, the ``next_before`` and ``next_before_id`` cursor from
+        the previous page.
+        """
         try:
-            session_id = request.session.get("chat_session_id")
+            own_session_id = request.session.get("chat_session_id")
+            session_id = session_id or own_session_id
             if not session_id:
-                return JsonResponse({"success": False, "error": "No session found"})
+                return OrjsonResponse({"success": False, "error": "No session found"})
+
+            # Only the browser session's own chat, or one owned by the user
+            if session_id != own_session_id and not (
+                request.user.is_authenticated
+                and ChatSession.objects.filter(
+                    session_id=session_id, user=request.user
+                ).exists()
+            ):
+                return OrjsonResponse({"success": False, "error": "No session found"})
+
+            limit = max(1, min(int(request.GET.get("limit", 50)), 200))
+            before = request.GET.get("before")
+            before_id = request.GET.get("before_id")
+            if before:
+                before = parse_datetime(before)
+                if before is None:
+                    return OrjsonResponse(
+                        {"success": False, "error": "Invalid 'before' timestamp"}
+                    )
+            before_id = int(before_id) if before_id else None
 
-            chat_processor = ChatProcessor()
-            history = chat_processor.get_session_history(session_id)
+            chat_processor = _get_chat_processor()
+            history = async_to_sync(chat_processor.get_session_history)(
+                session_id, limit, before or None, before_id
+            )
 
-            return JsonResponse(
-                {"success": True, "history": history, "session_id": session_id}
+            more = len(history) == limit
+            return OrjsonResponse(
+                {
+                    "success": True,
+                    "history": history,
+                    "session_id": session_id,
+                    "next_before": history[0]["timestamp"] if more else None,
+                    "next_before_id": history[0]["id"] if more else None,
+                }
             )
 
         except Exception as e:
-            return JsonResponse({"success": False, "error": str(e)})
+            return OrjsonResponse({"success": False, "error": str(e)})
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -364,54 +404,51 @@ class UploadedFilesView(View):
         try:
             session_id = request.session.get("chat_session_id")
             if not session_id:
-                return JsonResponse({"success": False, "error": "No session found"})
-
-            from chat.models import ChatSession, UploadedFile
-
-            try:
-                session = ChatSession.objects.get(session_id=session_id)
-                files = UploadedFile.objects.filter(session=session).order_by(
-                    "-upload_timestamp"
+                return OrjsonResponse({"success": False, "error": "No session found"})
+
+            # One query selecting only the listed columns; orjson writes the
+            # upload timestamps in ISO 8601 directly
+            files = (
+                UploadedFile.objects.filter(session__session_id=session_id)
+                .order_by("-upload_timestamp")
+                .values(
+                    "id",
+                    "processed",
+                    name=F("file_name"),
+                    type=F("file_type"),
+                    size=F("file_size"),
+                    uploaded_at=F("upload_timestamp"),
                 )
+            )
 
-                file_list = []
-                for file in files:
-                    file_list.append(
-                        {
-                            "id": file.id,
-                            "name": file.file_name,
-                            "type": file.file_type,
-                            "size": file.file_size,
-                            "uploaded_at": file.upload_timestamp.isoformat(),
-                            "processed": file.processed,
-                        }
-                    )
-
-                return JsonResponse({"success": True, "files": file_list})
-
-            except ChatSession.DoesNotExist:
-                return JsonResponse({"success": True, "files": []})
+            return OrjsonResponse({"success": True, "files": list(files)})
 
         except Exception as e:
-            return JsonResponse({"success": False, "error": str(e)})
+            return OrjsonResponse({"success": False, "error": str(e)})
 
     def delete(self, request, file_id):
         """Delete uploaded file"""
         try:
             session_id = request.session.get("chat_session_id")
             if not session_id:
-                return JsonResponse({"success": False, "error": "No session found"})
-
-            from chat.models import ChatSession, UploadedFile
-            from django.core.files.storage import default_storage
+                return OrjsonResponse({"success": False, "error": "No session found"})
 
             try:
-                session = ChatSession.objects.get(session_id=session_id)
-                file_obj = UploadedFile.objects.get(id=file_id, session=session)
+                file_obj = UploadedFile.objects.get(
+                    id=file_id, session_id=_get_session_pk(session_id)
+                )
 
-                # Delete the physical file
-                if default_storage.exists(file_obj.file_path):
-                    default_storage.delete(file_obj.file_path)
+                # Delete the physical file unless another upload shares it
+                shared = (
+                    UploadedFile.objects.filter(file_path=file_obj.file_path)
+                    .exclude(id=file_obj.id)
+                    .exists()
+                )
+                if not shared:
+                    try:
+                        os.unlink(default_storage.path(file_obj.file_path))
+                    except FileNotFoundError:
+                        pass
 
                 # Delete the database record
                 file_name = file_obj.file_name
@@ -419,7 +456,7 @@ class UploadedFilesView(View):
 
                 logger.info(f"File deleted: {file_name} (ID: {file_id})")
 
-                return JsonResponse(
+                return OrjsonResponse(
                     {
                         "success": True,
                         "message": f'File "{file_name}" deleted successfully',
@@ -427,13 +464,11 @@ class UploadedFilesView(View):
                 )
 
             except UploadedFile.DoesNotExist:
-                return JsonResponse({"success": False, "error": "File not found"})
-            except ChatSession.DoesNotExist:
-                return JsonResponse({"success": False, "error": "Session not found"})
+                return OrjsonResponse({"success": False, "error": "File not found"})
 
         except Exception as e:
             logger.error(f"Error deleting file: {e}")
-            return JsonResponse({"success": False, "error": str(e)})
+            return OrjsonResponse({"success": False, "error": str(e)})
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -443,63 +478,88 @@ class ExecuteQueryView(View):
         try:
             session_id = request.session.get("chat_session_id")
             if not session_id:
-                return JsonResponse({"success": False, "error": "No session found"})
+                return OrjsonResponse({"success": False, "error": "No session found"})
 
-            data = json.loads(request.body)
+            data = orjson.loads(request.body)
             query = data.get("query", "")
             connection_id = data.get("connection_id", "")
 
             if not query or not connection_id:
-                return JsonResponse(
+                return OrjsonResponse(
                     {"success": False, "error": "Missing query or connection"}
                 )
 
-            chat_processor = ChatProcessor()
+            chat_processor = _get_chat_processor()
 
-            # Execute query through database service
-            result = chat_processor.database_service.execute_query(
+            # Execute query through database service; rows are fetched lazily
+            result = chat_processor.database_service.stream_query(
                 connection_id, query, session_id
             )
 
-            if result["success"]:
-                # Get AI explanation of results
-                explanation = chat_processor.llama_service.explain_query_results(
-                    query, result["data"]
-                )
+            if not result["success"]:
+                return OrjsonResponse({"success": False, "error": result["error"]})
 
-                # Save query and response
-                from chat.models import ChatSession, Message
+            batches = result["batches"]
+            try:
+                # Explain from the first rows so the result is never loaded whole
+                explanation = async_to_sync(
+                    chat_processor.llama_service.explain_query_results
+                )(query, result["head"])
 
-                session_obj = ChatSession.objects.get(session_id=session_id)
+                # Save query and response
+                session_pk = _get_session_pk(session_id)
 
                 Message.objects.create(
-                    session=session_obj,
+                    session_id=session_pk,
                     message_type="db_query",
                     content=query,
                     metadata={"connection_id": connection_id},
                 )
+            except Exception:
+                # Nothing will stream, so close the cursor and log the query now
+                batches.close()
+                raise
 
-                Message.objects.create(
-                    session=session_obj,
-                    message_type="ai",
-                    content=explanation,
-                    metadata={"query_result": True, "row_count": result["row_count"]},
-                )
+            # An async iterator so the ASGI handler sends each batch as it is
+            # fetched; a sync one would be collected into a list first
+            next_batch = sync_to_async(next)
 
-                return JsonResponse(
-                    {
-                        "success": True,
-                        "data": result["data"],
-                        "explanation": explanation,
-                        "row_count": result["row_count"],
-                        "execution_time": result["execution_time"],
-                    }
-                )
-            else:
-                return JsonResponse({"success": False, "error": result["error"]})
+            async def stream():
+                row_count = 0
+                try:
+                    header = {"success": True, "explanation": explanation}
+                    yield _dumps(header)[:-1] + b',"data":['
+                    try:
+                        while True:
+                            rows = await next_batch(batches, None)
+                            if rows is None:
+                                break
+                            if row_count:
+                                yield b","
+                            row_count += len(rows)
+                            yield _dumps(rows)[1:-1]
+                    except Exception as e:
+                        # The 200 status is already sent; end the body as
+                        # valid JSON that reports the failure instead
+                        logger.error(f"Query streaming failed: {e}")
+                        yield b'],"success":false,"error":' + _dumps(str(e)) + b"}"
+                        return
+                    # Exhausting batches filled in the totals
+                    yield b"]," + _dumps(result["stats"])[1:]
+                finally:
+                    # Closes the cursor if the client went away mid-stream
+                    await sync_to_async(batches.close)()
+                    await sync_to_async(Message.objects.create)(
+                        session_id=session_pk,
+                        message_type="ai",
+                        content=explanation,
+                        metadata={"query_result": True, "row_count": row_count},
+                    )
+
+            return StreamingHttpResponse(stream(), content_type="application/json")
 
         except Exception as e:
-            return JsonResponse({"success": False, "error": str(e)})
+            return OrjsonResponse({"success": False, "error": str(e)})
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -509,68 +569,71 @@ class ProcessAttachmentsView(View):
         try:
             session_id = request.session.get("chat_session_id")
             if not session_id:
-                return JsonResponse({"success": False, "error": "No session found"})
+                return OrjsonResponse({"success": False, "error": "No session found"})
 
             if "files" not in request.FILES:
-                return JsonResponse({"success": False, "error": "No files provided"})
+                return OrjsonResponse({"success": False, "error": "No files provided"})
 
             uploaded_files = request.FILES.getlist("files")
             results = []
+            accepted = []  # (position in results, uploaded file) for valid files
 
             for uploaded_file in uploaded_files:
                 # Validate file
-                if uploaded_file.size == 0:
+                error = _validate_upload(uploaded_file)
+                if error:
                     results.append(
                         {
                             "success": False,
                             "filename": uploaded_file.name,
-                            "error": "File is empty",
+                            "error": error,
                         }
                     )
                     continue
 
-                if uploaded_file.size > 50 * 1024 * 1024:  # 50MB limit
-                    results.append(
-                        {
-                            "success": False,
-                            "filename": uploaded_file.name,
-                            "error": "File too large (max 50MB)",
-                        }
+                accepted.append((len(results), uploaded_file))
+                results.append(None)
+
+            # Saving and parsing are disk I/O and pandas C code that releases
+            # the GIL, so the files are processed in parallel
+            pending = []  # (result, unsaved UploadedFile) for processed files
+            if accepted:
+                with ThreadPoolExecutor(max_workers=min(8, len(accepted))) as executor:
+                    processed = executor.map(
+                        lambda item: self._process_attachment_sync(session_id, item[1]),
+                        accepted,
                     )
-                    continue
-
-                # Check file extension
-                import os
-
-                allowed_extensions = [".csv", ".xlsx", ".xls", ".txt", ".json", ".pdf"]
-                file_extension = os.path.splitext(uploaded_file.name)[1].lower()
-                if file_extension not in allowed_extensions:
-                    results.append(
-                        {
-                            "success": False,
-                            "filename": uploaded_file.name,
-                            "error": f"File type not supported. Allowed: {', '.join(allowed_extensions)}",
-                        }
-                    )
-                    continue
-
-                # Process file
-                result = self._process_attachment_sync(session_id, uploaded_file)
-                results.append(result)
-
-            return JsonResponse({"success": True, "results": results})
+                    for (position, _), (result, record) in zip(accepted, processed):
+                        results[position] = result
+                        if record is not None:
+                            pending.append((result, record))
+
+            # Save all records in one transaction instead of one commit per file
+            if pending:
+                session_pk = _get_session_pk(session_id)
+                with transaction.atomic():
+                    for _, record in pending:
+                        record.session_id = session_pk
+                    UploadedFile.objects.bulk_create([record for _, record in pending])
+                for result, record in pending:
+                    result["file_id"] = record.id
+
+            return OrjsonResponse({"success": True, "results": results})
 
         except Exception as e:
             logger.error(f"Error processing attachments: {e}")
-            return JsonResponse({"success": False, "error": str(e)})
+            return OrjsonResponse({"success": False, "error": str(e)})
 
     def _process_attachment_sync(self, session_id: str, uploaded_file):
-        """Synchronous attachment processing"""
+        """
+        Save and process one attachment
+
+        Returns the per-file result and an unsaved UploadedFile (None on
+        failure); the caller assigns the session and bulk-inserts the records.
+        """
         try:
             # Save file
-            from ai_services.file_service import FileService
-
-            file_service = FileService()
+            file_service = _get_file_service()
             file_info = file_service.save_uploaded_file(uploaded_file, session_id)
 
             if not file_info["success"]:
@@ -578,7 +641,7 @@ class ProcessAttachmentsView(View):
                     "success": False,
                     "filename": uploaded_file.name,
                     "error": file_info["error"],
-                }
+                }, None
 
             # Process file
             processed_file = file_service.process_file(
@@ -590,34 +653,33 @@ class ProcessAttachmentsView(View):
                     "success": False,
                     "filename": uploaded_file.name,
                     "error": processed_file["error"],
-                }
+                }, None
 
-            # Save to database
-            from chat.models import ChatSession, UploadedFile
-
-            session, created = ChatSession.objects.get_or_create(session_id=session_id)
-
-            uploaded_file_record = UploadedFile.objects.create(
-                session=session,
+            record = UploadedFile(
                 file_name=file_info["filename"],
                 file_type=file_info["file_type"],
                 file_path=file_info["file_path"],
                 file_size=file_info["file_size"],
+                content_hash=file_info["content_hash"],
                 processed=True,
             )
 
             return {
                 "success": True,
                 "filename": uploaded_file.name,
-                "file_id": uploaded_file_record.id,
+                "file_id": None,
                 "file_type": file_info["file_type"],
                 "file_size": file_info["file_size"],
                 "processed_data": processed_file.get("data", []),
-            }
+            }, record
 
         except Exception as e:
             logger.error(f"Error in attachment processing: {e}")
-            return {"success": False, "filename": uploaded_file.name, "error": str(e)}
+            return {
+                "success": False,
+                "filename": uploaded_file.name,
+                "error": str(e),
+            }, None
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -627,27 +689,25 @@ class RAGQueryView(View):
     def post(self, request):
         """Handle RAG query"""
         try:
-            data = json.loads(request.body)
+            data = orjson.loads(request.body)
             session_id = data.get("session_id", "default")
             question = data.get("question", "")
 
             if not question:
-                return JsonResponse({"success": False, "error": "Question is required"})
+                return OrjsonResponse(
+                    {"success": False, "error": "Question is required"}
+                )
 
             # Get RAG context
-            from ai_services.rag_service import RAGService
-
             rag_service = RAGService()
 
             # Get all files in session for context
-            from chat.models import ChatSession, UploadedFile
-
             session = ChatSession.objects.get(session_id=session_id)
             uploaded_files = UploadedFile.objects.filter(session=session)
             file_names = [file.file_name for file in uploaded_files]
 
             if not file_names:
-                return JsonResponse(
+                return OrjsonResponse(
                     {"success": False, "error": "No files found in session"}
                 )
 
@@ -657,11 +717,11 @@ class RAGQueryView(View):
             )
 
             if not rag_context["success"]:
-                return JsonResponse({"success": False, "error": rag_context["message"]})
+                return OrjsonResponse(
+                    {"success": False, "error": rag_context["message"]}
+                )
 
             # Generate AI response using RAG context
-            from ai_services.enhanced_llm_service import EnhancedLLMService
-
             llm_service = EnhancedLLMService()
 
             # Create a mock attached_files structure for the LLM service
@@ -672,8 +732,6 @@ class RAGQueryView(View):
             )
 
             # Save the question and response to chat
-            from chat.models import Message
-
             question_message = Message.objects.create(
                 session=session,
                 content=question,
@@ -691,7 +749,7 @@ class RAGQueryView(View):
             ai_message.save()
             question_message.save()
 
-            return JsonResponse(
+            return OrjsonResponse(
                 {
                     "success": True,
                     "question": question,
@@ -702,7 +760,7 @@ class RAGQueryView(View):
             )
 
         except ChatSession.DoesNotExist:
-            return JsonResponse({"success": False, "error": "Session not found"})
+            return OrjsonResponse({"success": False, "error": "Session not found"})
         except Exception as e:
             logger.error(f"RAG query error: {e}")
-            return JsonResponse({"success": False, "error": str(e)})
+            return OrjsonResponse({"success": False, "error": str(e)})
@@ -4,11 +4,17 @@ AI Service Setup Script
 This script helps you set up the AI service for the chat application.
 """
 
+import re
 import sys
 import subprocess
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# settings.py and the AI_CONFIG block in it that the setup steps rewrite
+SETTINGS_FILE = Path("chat_project/settings.py")
+AI_CONFIG_PATTERN = re.compile(r"# AI Configuration\s+AI_CONFIG = \{.*?\}", re.DOTALL)
+
 
 def check_python_version():
     """Check if Python version is compatible"""
@@ -34,29 +40,36 @@ def check_dependencies():
         return False
 
 
-def test_ai_service_connection():
-    """Test connection to AI service"""
+def probe_ai_service():
+    """Query the AI service without printing; returns (ok, message)"""
     try:
         response = requests.get("http://localhost:8080/v1/models", timeout=5)
         if response.status_code == 200:
-            print("✅ AI service is running and accessible")
-            return True
+            return True, "✅ AI service is running and accessible"
         else:
-            print(f"⚠️  AI service responded with status {response.status_code}")
-            return False
+            return False, f"⚠️  AI service responded with status {response.status_code}"
     except requests.exceptions.ConnectionError:
-        print("❌ Cannot connect to AI service at localhost:8080")
-        return False
+        return False, "❌ Cannot connect to AI service at localhost:8080"
     except Exception as e:
-        print(f"❌ Error testing AI service: {e}")
-        return False
+        return False, f"❌ Error testing AI service: {e}"
+
+
+def test_ai_service_connection(probe=None):
+    """Test connection to AI service, using an already started probe if given"""
+    ok, message = probe.result() if probe else probe_ai_service()
+    print(message)
+    return ok
 
 
 def check_ollama():
     """Check if Ollama is available"""
     try:
+        # Only the exit status matters, so don't buffer the output
         result = subprocess.run(
-            ["ollama", "--version"], capture_output=True, text=True, timeout=5
+            ["ollama", "--version"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=5,
         )
         if result.returncode == 0:
             print("✅ Ollama is installed")
@@ -87,10 +100,20 @@ def setup_ollama():
     except Exception:
         pass
 
-    # Pull llama2 model
+    # Pull llama2 model, echoing progress as it arrives
     print("📥 Pulling llama2 model (this may take a while)...")
     try:
-        subprocess.run(["ollama", "pull", "llama2"], check=True)
+        with subprocess.Popen(
+            ["ollama", "pull", "llama2"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        ) as process:
+            for line in process.stdout:
+                print(line, end="")
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, process.args)
         print("✅ Llama2 model downloaded successfully")
         return True
     except subprocess.CalledProcessError as e:
@@ -98,17 +121,24 @@ def setup_ollama():
         return False
 
 
+def rewrite_ai_config(new_config):
+    """Replace the AI_CONFIG block in settings.py; False if the block is missing"""
+    content = SETTINGS_FILE.read_text()
+    # A function replacement keeps backslashes in the block literal
+    content, count = AI_CONFIG_PATTERN.subn(lambda match: new_config, content)
+    if not count:
+        return False
+    SETTINGS_FILE.write_text(content)
+    return True
+
+
 def update_settings_for_ollama():
     """Update settings.py to use Ollama"""
-    settings_file = Path("chat_project/settings.py")
-
-    if not settings_file.exists():
+    if not SETTINGS_FILE.exists():
         print("❌ settings.py not found")
         return False
 
     try:
-        content = settings_file.read_text()
-
         # Update AI_CONFIG for Ollama
         ollama_config = """# AI Configuration
 AI_CONFIG = {
@@ -116,15 +146,11 @@ AI_CONFIG = {
     'MODEL_NAME': 'llama2',
     'MAX_TOKENS': 2048,
     'TEMPERATURE': 0.7,
+    'RESPONSE_TIMEOUT': 120,
 }"""
 
         # Replace the existing AI_CONFIG
-        import re
-
-        pattern = r"# AI Configuration\s+AI_CONFIG = \{.*?\}"
-        if re.search(pattern, content, re.DOTALL):
-            content = re.sub(pattern, ollama_config, content, flags=re.DOTALL)
-            settings_file.write_text(content)
+        if rewrite_ai_config(ollama_config):
             print("✅ Updated settings.py for Ollama")
             return True
         else:
@@ -141,6 +167,11 @@ def main():
     print("🤖 AI Service Setup for Chat Application")
     print("=" * 50)
 
+    # Start the network probe first so its timeout overlaps the local checks
+    executor = ThreadPoolExecutor(max_workers=1)
+    ai_probe = executor.submit(probe_ai_service)
+    executor.shutdown(wait=False)
+
     # Check prerequisites
     if not check_python_version():
         return False
@@ -151,7 +182,7 @@ def main():
     print("\n🔍 Checking AI service availability...")
 
     # Test current AI service
-    if test_ai_service_connection():
+    if test_ai_service_connection(ai_probe):
         print("\n🎉 AI service is already working!")
         return True
 
@@ -192,24 +223,17 @@ def main():
         api_key = input("Enter your OpenAI API key: ").strip()
         if api_key:
             # Update settings for OpenAI
-            settings_file = Path("chat_project/settings.py")
-            content = settings_file.read_text()
-
             openai_config = f"""# AI Configuration
 AI_CONFIG = {{
     'LLAMA_API_URL': 'https://api.openai.com/v1/chat/completions',
     'MODEL_NAME': 'gpt-3.5-turbo',
     'MAX_TOKENS': 2048,
     'TEMPERATURE': 0.7,
+    'RESPONSE_TIMEOUT': 120,
     'API_KEY': '{api_key}',
 }}"""
 
-            import re
-
-            pattern = r"# AI Configuration\s+AI_CONFIG = \{.*?\}"
-            if re.search(pattern, content, re.DOTALL):
-                content = re.sub(pattern, openai_config, content, flags=re.DOTALL)
-                settings_file.write_text(content)
+            if rewrite_ai_config(openai_config):
                 print("✅ Updated settings.py for OpenAI API")
                 return True
 
@@ -221,24 +245,17 @@ AI_CONFIG = {{
         api_key = input("Enter your Google AI Studio API key: ").strip()
         if api_key:
             # Update settings for Google AI Studio
-            settings_file = Path("chat_project/settings.py")
-            content = settings_file.read_text()
-
             google_ai_config = f"""# AI Configuration
 AI_CONFIG = {{
     'LLAMA_API_URL': 'https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:streamGenerateContent',
     'MODEL_NAME': 'gemini-pro',
     'MAX_TOKENS': 2048,
     'TEMPERATURE': 0.7,
+    'RESPONSE_TIMEOUT': 120,
     'API_KEY': '{api_key}',
 }}"""
 
-            import re
-
-            pattern = r"# AI Configuration\s+AI_CONFIG = \{.*?\}"
-            if re.search(pattern, content, re.DOTALL):
-                content = re.sub(pattern, google_ai_config, content, flags=re.DOTALL)
-                settings_file.write_text(content)
+            if rewrite_ai_config(google_ai_config):
                 print("✅ Updated settings.py for Google AI Studio")
                 return True
 